@@ -6,6 +6,12 @@
 """
 
 from __future__ import unicode_literals
+import os
+try:
+    from shlex import quote as _shell_quote
+except ImportError:
+    from pipes import quote as _shell_quote
+from phoneauto.helpers.wait_policy import FixedWaitPolicy
 
 
 class DeviceWrapper(object):
@@ -13,108 +19,183 @@ class DeviceWrapper(object):
 
     Calls wait.idle before click, press, etc.
     Calls wait.update after click, press, etc.
+    How long it waits is decided by the wait policy.
     """
 
     def __init__(self,
                  uiauto_device,
                  idle_timeout=5000,
-                 update_timeout=1000):
+                 update_timeout=1000,
+                 wait_policy=None):
         """Initialization
 
         Args:
             uiauto_device (object): uiautomator.Device instance
             idle_timeout (integer): timeout for wait.idle in milliseconds
             update_timeout (integer): timeout for wait.update in milliseconds
+            wait_policy (object):
+                Wait policy object such as AdaptiveWaitPolicy.
+                FixedWaitPolicy with idle_timeout and update_timeout
+                is used if None.
         """
         self.__dict__['_device'] = uiauto_device
-        self.__dict__['_wait_idle_timeout'] = idle_timeout
-        self.__dict__['_wait_update_timeout'] = update_timeout
+        self.__dict__['_wait_policy'] = wait_policy or FixedWaitPolicy(
+            idle_timeout=idle_timeout, update_timeout=update_timeout)
 
-    def pre_exec(self):
+    @property
+    def wait_policy(self):
+        """Wait policy object in use"""
+        return self._wait_policy
+
+    def pre_exec(self, action=None):
         """Procedure before click/press etc"""
-        self._device.wait.idle(timeout=self._wait_idle_timeout)
+        self._wait_policy.pre_exec(self._device.wait, action)
 
-    def post_exec(self):
+    def post_exec(self, action=None):
         """Procedure after click/press etc"""
-        self._device.wait.update(timeout=self._wait_update_timeout)
-        self._device.wait.idle(timeout=self._wait_idle_timeout)
+        self._wait_policy.post_exec(self._device.wait, action)
+
+    def input_text(self, text):
+        """Types text into the focused view at once
+        by 'adb shell input text', which is much faster than
+        pressing keys one by one
+
+        Args:
+            text (text): Text to be typed.
+                '%' and non-ASCII characters are not supported.
+        """
+        self.pre_exec('input_text')
+        self._device.server.adb.cmd(
+            'shell', 'input', 'text', _quote_input_text(text)).wait()
+        self.post_exec('input_text')
 
     def __call__(self, **kwargs):
         """Delegates to uiautomator.Device.__call__"""
+        # Actions performed on the selected UI object are not
+        # under control of the wrapper.
+        self._wait_policy.invalidate()
         return self._device.__call__(**kwargs)
 
     def __getattr__(self, name):
         """Replaces return value of attribute get
-        to wrapper objects for some attributes"""
-        attr = getattr(self._device, name)
+        to wrapper objects for some attributes
+
+        Wrapped methods are created on first access and cached
+        in the instance dictionary, so that subsequent accesses
+        are resolved without calling __getattr__.
+        Property wrappers are cached too, but they get the property
+        object from the device on every access because uiautomator
+        returns a new, stateful object each time (e.g. press.home
+        stores 'home' into the object until it is called).
+        """
+        if name in _WRAP_METHODS:
+            wrapped = _wrap_action(self, name, getattr(self._device, name))
+        elif name in _WRAP_PROPERTIES:
+            wrapped = _PropertyWrapper(self, self._device, name)
+        else:
+            return getattr(self._device, name)
+
+        self.__dict__[name] = wrapped
+        return wrapped
+
+    def __setattr__(self, name, value):
+        """Inserts pre_exec/post_exec precedures before/after
+        attributes set call for some attributes"""
 
-        wrap_methods = [
-            'click', 'long_click', 'swipe', 'swipePoints',
-            'drag', 'clear_traversed_text', 'wakeup', 'sleep']
+        if name in _WRAP_ATTRS:
+            self.pre_exec(name)
+            setattr(self._device, name, value)
+            self.post_exec(name)
+        else:
+            setattr(self._device, name, value)
 
-        def _wrap_exec(*args, **kwargs):
-            """wrap function for click/long_click/etc"""
-            self.pre_exec()
-            attr(*args, **kwargs)
-            self.post_exec()
 
-        if name in wrap_methods:
-            return _wrap_exec
+# Methods of uiautomator.Device which are wrapped by pre_exec/post_exec
+_WRAP_METHODS = frozenset([
+    'click', 'long_click', 'swipe', 'swipePoints',
+    'drag', 'clear_traversed_text', 'wakeup', 'sleep'])
 
-        wrap_properties = [
-            'open', 'press', 'screen'
-        ]
+# Properties of uiautomator.Device of which calls are wrapped
+_WRAP_PROPERTIES = frozenset(['open', 'press', 'screen'])
 
-        class _Wrap(object):
-            """property wrapper"""
-            # pylint: disable=no-self-argument
-            # pylint: disable=too-few-public-methods
+# Attributes of uiautomator.Device of which assignments are wrapped
+_WRAP_ATTRS = frozenset(['orientation'])
 
-            def __init__(wrap_self, prop_inst):
-                """Initialization"""
-                wrap_self._prop_inst = prop_inst
 
-            def __call__(wrap_self, *args, **kwargs):
-                """Delegation method __call__"""
-                self.pre_exec()
-                wrap_self._prop_inst.__call__(*args, **kwargs)
-                self.post_exec()
+# Characters which are special to the shell on the device
+_SHELL_SPECIAL_CHARS = frozenset('\\\'"`$&|;<>()*~!#?[]{}^')
 
-            def __eq__(wrap_self, value):
-                """Delegation method __eq__"""
-                return wrap_self._prop_inst.__eq__(value)
 
-            def __ne__(wrap_self, value):
-                """Delegation method __ne__"""
-                return wrap_self._prop_inst.__ne__(value)
+def _escape_input_text(text):
+    """Escapes text for 'adb shell input text'"""
+    return ''.join(
+        '%s' if c == ' ' else '\\' + c if c in _SHELL_SPECIAL_CHARS else c
+        for c in text)
 
-            def __getattr__(wrap_self, name):
-                """Replaces return value of some attribute get
-                to wrapper function"""
-                attr = getattr(wrap_self._prop_inst, name)
 
-                def _wrap_exec(*args, **kwargs):
-                    """wrapper function for screen.on/off etc"""
-                    self.pre_exec()
-                    attr(*args, **kwargs)
-                    self.post_exec()
+def _quote_input_text(text):
+    """Quotes text for 'adb shell input text' so that it reaches
+    the device shell as is
 
-                return _wrap_exec
+    adb command line is parsed by the host shell on POSIX
+    (uiautomator's Adb.raw_cmd runs it with shell=True),
+    then by the shell on the device.
+    """
+    escaped = _escape_input_text(text)
+    if os.name == 'nt':
+        return escaped
+    return _shell_quote(escaped)
 
-        if name in wrap_properties:
-            return _Wrap(attr)
 
-        return attr
+def _wrap_action(device_wrapper, action, func):
+    """Returns a function which calls func between pre_exec and post_exec"""
+    pre_exec = device_wrapper.pre_exec
+    post_exec = device_wrapper.post_exec
 
-    def __setattr__(self, name, value):
-        """Inserts pre_exec/post_exec precedures before/after
-        attributes set call for some attributes"""
+    def _wrap_exec(*args, **kwargs):
+        """wrap function for click/long_click/etc"""
+        pre_exec(action)
+        func(*args, **kwargs)
+        post_exec(action)
+    return _wrap_exec
 
-        wrap_attrs = ['orientation']
 
-        if name in wrap_attrs:
-            self.pre_exec()
-            setattr(self._device, name, value)
-            self.post_exec()
-        else:
-            setattr(self._device, name, value)
+class _PropertyWrapper(object):
+    """property wrapper
+
+    The property object is got from the device on every access,
+    since it is not reusable.
+    """
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, device_wrapper, device, name):
+        """Initialization"""
+        self._device_wrapper = device_wrapper
+        self._device = device
+        self._name = name
+
+    def _prop_inst(self):
+        """Gets the property object from the device"""
+        return getattr(self._device, self._name)
+
+    def __call__(self, *args, **kwargs):
+        """Delegation method __call__"""
+        prop_inst = self._prop_inst()
+        self._device_wrapper.pre_exec(self._name)
+        prop_inst.__call__(*args, **kwargs)
+        self._device_wrapper.post_exec(self._name)
+
+    def __eq__(self, value):
+        """Delegation method __eq__"""
+        return self._prop_inst().__eq__(value)
+
+    def __ne__(self, value):
+        """Delegation method __ne__"""
+        return self._prop_inst().__ne__(value)
+
+    def __getattr__(self, sub_name):
+        """Replaces return value of some attribute get
+        to wrapper function (e.g. screen.on/off)"""
+        attr = getattr(self._prop_inst(), sub_name)
+        return _wrap_action(
+            self._device_wrapper, '{0}.{1}'.format(self._name, sub_name), attr)
@@ -6,6 +6,7 @@
 """
 
 from __future__ import unicode_literals
+from uiautomator import JsonRPCError
 
 
 class UnexpectedUIStateException(Exception):
@@ -55,3 +56,134 @@ def install_standard_handlers(device):
     """Installs standard handlers for Unexpected UI State exceptions"""
     device.handlers.on(handle_anr)
     device.handlers.on(handle_appcrash)
+
+
+# Selector of the message on system dialogs such as ANR and App Crash
+_SYSTEM_MESSAGE_SELECTOR = {
+    'packageName': 'android', 'resourceId': 'android:id/message'}
+
+# (text in the system message, exception class, exception message)
+STANDARD_PATTERNS = (
+    ('isn\'t responding', ANRException, 'ANR occurred'),
+    ('Unfortunately', AppCrashException, 'App Crash occurred'))
+
+
+class UnexpectedUIStateWatcher(object):
+    """Handler which checks all unexpected UI state patterns at once
+
+    The system dialog message is queried once per invocation
+    and then matched against every registered pattern, instead of
+    one query per handler as handle_anr/handle_appcrash do.
+
+    When installed with device_side=True, each pattern is also
+    registered as a uiautomator watcher. The device then checks
+    the patterns by itself while it retries a selector, and the
+    handler only asks whether any watcher has triggered.
+    """
+
+    _WATCHER_NAME_PREFIX = 'phoneauto_unexpected_ui_state_'
+
+    def __init__(self, patterns=STANDARD_PATTERNS):
+        """Initialization
+
+        Args:
+            patterns (iterable): (text, exception class, message) tuples
+        """
+        self._patterns = list(patterns)
+        self._device_side = False
+
+    @property
+    def patterns(self):
+        """Registered (text, exception class, message) tuples"""
+        return tuple(self._patterns)
+
+    def register(self, text,
+                 exception_class=UnexpectedUIStateException,
+                 message=None):
+        """Registers an additional pattern
+
+        Must be called before install() when device-side watchers are used.
+
+        Args:
+            text (text): text contained in the system dialog message
+            exception_class (class):
+                UnexpectedUIStateException or its subclass to be raised
+            message (text): exception message. text is used if None.
+        """
+        self._patterns.append((text, exception_class, message or text))
+
+    def _watcher_name(self, index):
+        """Name of the device-side watcher for the index-th pattern"""
+        return '{0}{1}'.format(self._WATCHER_NAME_PREFIX, index)
+
+    def install(self, device, device_side=False, dismiss_key='back'):
+        """Installs the watcher to the device
+
+        Args:
+            device (object): uiautomator.Device (or DeviceWrapper) instance
+            device_side (bool):
+                Registers patterns as device-side uiautomator watchers
+                if True.
+            dismiss_key (text):
+                Key which device-side watchers press to dismiss
+                the system dialog.
+        """
+        if device_side:
+            for i, pattern in enumerate(self._patterns):
+                watcher = device.watcher(self._watcher_name(i)).when(
+                    textContains=pattern[0], **_SYSTEM_MESSAGE_SELECTOR)
+                getattr(watcher.press, dismiss_key)()
+        self._device_side = device_side
+        device.handlers.on(self)
+
+    def _check_device_side(self, device):
+        """Raises exception for the pattern of which watcher triggered"""
+        if not device.watchers.triggered:
+            return
+        for i, pattern in enumerate(self._patterns):
+            if device.watcher(self._watcher_name(i)).triggered:
+                device.watchers.reset()
+                raise pattern[1](pattern[2])
+
+    def _check_host_side(self, device):
+        """Raises exception for the pattern which the message contains"""
+        try:
+            text = device(**_SYSTEM_MESSAGE_SELECTOR).info['text']
+        except JsonRPCError:
+            # No system dialog is displayed
+            return
+        for pattern_text, exception_class, message in self._patterns:
+            if pattern_text in text:
+                raise exception_class(message)
+
+    def __call__(self, device):
+        """Handler function invoked when a UI object is not found
+
+        Args:
+            device (object): uiautomator.Device instance
+        Returns:
+            bool: False so that other handlers are invoked
+        """
+        if self._device_side:
+            self._check_device_side(device)
+        else:
+            self._check_host_side(device)
+        return False
+
+
+def install_unexpected_ui_state_watcher(device, watcher=None,
+                                        device_side=False):
+    """Installs a watcher for Unexpected UI State exceptions
+
+    Args:
+        device (object): uiautomator.Device (or DeviceWrapper) instance
+        watcher (object):
+            UnexpectedUIStateWatcher instance. A watcher with
+            the standard patterns is created if None.
+        device_side (bool): Uses device-side uiautomator watchers if True.
+    Returns:
+        object: installed watcher
+    """
+    watcher = watcher or UnexpectedUIStateWatcher()
+    watcher.install(device, device_side=device_side)
+    return watcher
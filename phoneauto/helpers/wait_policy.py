@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Wait policies which decide how DeviceWrapper waits around actions
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import time
+
+
+class FixedWaitPolicy(object):
+    """Waits with fixed timeouts
+
+    Calls wait.idle before an action, and wait.update + wait.idle after it.
+    This is the original behaviour of DeviceWrapper.
+    """
+
+    def __init__(self, idle_timeout=5000, update_timeout=1000):
+        """Initialization
+
+        Args:
+            idle_timeout (integer): timeout for wait.idle in milliseconds
+            update_timeout (integer): timeout for wait.update in milliseconds
+        """
+        self.idle_timeout = idle_timeout
+        self.update_timeout = update_timeout
+
+    def pre_exec(self, wait, action=None):
+        """Procedure before click/press etc
+
+        Args:
+            wait (object): wait object of uiautomator.Device
+            action (text): name of the action which is about to be executed
+        """
+        # pylint: disable=unused-argument
+        wait.idle(timeout=self.idle_timeout)
+
+    def post_exec(self, wait, action=None):
+        """Procedure after click/press etc
+
+        Args:
+            wait (object): wait object of uiautomator.Device
+            action (text): name of the action which has been executed
+        """
+        # pylint: disable=unused-argument
+        wait.update(timeout=self.update_timeout)
+        wait.idle(timeout=self.idle_timeout)
+
+    def invalidate(self):
+        """Notifies the screen may have changed outside of the policy"""
+        pass
+
+
+class WaitStats(object):
+    """Statistics of waits performed by AdaptiveWaitPolicy"""
+
+    def __init__(self):
+        """Initialization"""
+        self.actions = 0
+        self.pre_idle_skipped = 0
+        self.post_idle_skipped = 0
+        self.idle_waits = 0
+        self.idle_wait_ms = 0.0
+        self.update_waits = 0
+        self.update_wait_ms = 0.0
+        self.update_timeout_saved_ms = 0.0
+
+    @property
+    def waited_ms(self):
+        """Total time spent in wait.idle and wait.update"""
+        return self.idle_wait_ms + self.update_wait_ms
+
+    @property
+    def estimated_saved_ms(self):
+        """Estimated time saved compared with FixedWaitPolicy
+
+        Each skipped wait.idle is accounted with the average duration
+        of the wait.idle calls actually performed. Each wait.update which
+        timed out is accounted with the difference between
+        the fixed and the adaptive timeout.
+        """
+        avg_idle_ms = (self.idle_wait_ms / self.idle_waits
+                       if self.idle_waits else 0.0)
+        skipped = self.pre_idle_skipped + self.post_idle_skipped
+        return skipped * avg_idle_ms + self.update_timeout_saved_ms
+
+    def as_dict(self):
+        """Returns statistics as a dictionary"""
+        return {
+            'actions': self.actions,
+            'pre_idle_skipped': self.pre_idle_skipped,
+            'post_idle_skipped': self.post_idle_skipped,
+            'idle_waits': self.idle_waits,
+            'update_waits': self.update_waits,
+            'waited_ms': self.waited_ms,
+            'estimated_saved_ms': self.estimated_saved_ms
+        }
+
+
+class AdaptiveWaitPolicy(object):
+    """Waits with timeouts learned from previous actions
+
+    - wait.update timeout of each action type is derived from
+      the settle time observed for the same action type before.
+    - wait.idle after an action is skipped when wait.update
+      reported that the screen did not change.
+    - wait.idle before an action is skipped when the previous
+      post-action wait has proved idleness a short while ago.
+    """
+
+    def __init__(self,
+                 idle_timeout=5000,
+                 update_timeout=1000,
+                 min_update_timeout=100,
+                 margin=2.0,
+                 smoothing=0.3,
+                 idle_validity=1000,
+                 clock=time.time):
+        """Initialization
+
+        Args:
+            idle_timeout (integer): timeout for wait.idle in milliseconds
+            update_timeout (integer):
+                upper limit of wait.update timeout in milliseconds,
+                which is also used for unknown action types
+            min_update_timeout (integer):
+                lower limit of wait.update timeout in milliseconds
+            margin (float):
+                wait.update timeout is the learned settle time
+                multiplied by this value
+            smoothing (float):
+                weight of the latest sample in the moving average
+                of the settle time
+            idle_validity (integer):
+                duration in milliseconds during which idleness
+                proved after an action is trusted
+            clock (callable): returns current time in seconds
+        """
+        self.idle_timeout = idle_timeout
+        self.update_timeout = update_timeout
+        self.min_update_timeout = min_update_timeout
+        self.margin = margin
+        self.smoothing = smoothing
+        self.idle_validity = idle_validity
+        self.stats = WaitStats()
+        self._clock = clock
+        self._settle_ms = {}
+        self._idle_proven_at = None
+
+    def settle_time(self, action):
+        """Learned settle time of the action in milliseconds,
+        or None if the action type has not been observed yet"""
+        return self._settle_ms.get(action)
+
+    def update_timeout_for(self, action):
+        """Returns wait.update timeout to be used after the action"""
+        settle_ms = self._settle_ms.get(action)
+        if settle_ms is None:
+            return self.update_timeout
+        timeout = int(settle_ms * self.margin)
+        return max(self.min_update_timeout, min(self.update_timeout, timeout))
+
+    def _learn(self, action, sample_ms):
+        """Folds a settle time sample into the moving average"""
+        settle_ms = self._settle_ms.get(action)
+        if settle_ms is None:
+            self._settle_ms[action] = sample_ms
+        else:
+            self._settle_ms[action] = (
+                self.smoothing * sample_ms +
+                (1.0 - self.smoothing) * settle_ms)
+
+    def _timed(self, func, **kwargs):
+        """Calls func and returns (return value, elapsed milliseconds)"""
+        start = self._clock()
+        retval = func(**kwargs)
+        return retval, (self._clock() - start) * 1000.0
+
+    def _wait_idle(self, wait):
+        """Calls wait.idle and records its duration"""
+        _, elapsed_ms = self._timed(wait.idle, timeout=self.idle_timeout)
+        self.stats.idle_waits += 1
+        self.stats.idle_wait_ms += elapsed_ms
+
+    def _idle_is_proven(self):
+        """Checks if idleness has been proved recently"""
+        if self._idle_proven_at is None:
+            return False
+        age_ms = (self._clock() - self._idle_proven_at) * 1000.0
+        return age_ms <= self.idle_validity
+
+    def pre_exec(self, wait, action=None):
+        """Procedure before click/press etc
+
+        Args:
+            wait (object): wait object of uiautomator.Device
+            action (text): name of the action which is about to be executed
+        """
+        # pylint: disable=unused-argument
+        self.stats.actions += 1
+        if self._idle_is_proven():
+            self.stats.pre_idle_skipped += 1
+        else:
+            self._wait_idle(wait)
+        self._idle_proven_at = None
+
+    def post_exec(self, wait, action=None):
+        """Procedure after click/press etc
+
+        Args:
+            wait (object): wait object of uiautomator.Device
+            action (text): name of the action which has been executed
+        """
+        timeout = self.update_timeout_for(action)
+        updated, elapsed_ms = self._timed(wait.update, timeout=timeout)
+        self.stats.update_waits += 1
+        self.stats.update_wait_ms += elapsed_ms
+        if updated:
+            self._learn(action, elapsed_ms)
+            self._wait_idle(wait)
+        else:
+            # Nothing has changed within the timeout,
+            # the screen is regarded as settled.
+            # The settle time is not learned from it, since the action
+            # may be a no-op this time and a slow transition next time.
+            self.stats.update_timeout_saved_ms += (
+                self.update_timeout - timeout)
+            self.stats.post_idle_skipped += 1
+        self._idle_proven_at = self._clock()
+
+    def invalidate(self):
+        """Notifies the screen may have changed outside of the policy"""
+        self._idle_proven_at = None
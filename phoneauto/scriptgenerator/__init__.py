@@ -6,4 +6,4 @@
 """
 
 from __future__ import unicode_literals
-from .main import scriptgenerator_main
+from .main import scriptgenerator_main, headless_main, replay_main
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""Intermediate representation of recorded actions
+
+ScriptGenerator records each action as an Action, a coder operation
+name and its arguments, instead of a code string. Code generation is
+a separate pass (CodeRenderer), so that a recording kept in an
+ActionLog can be analyzed, saved as JSON lines, and rendered again
+with another coder and writer.
+
+An action is serialized as a JSON line such as:
+
+    {"op": "click_object", "device": 0,
+     "args": {"locator": {"$locator": {"filters": {"text": "OK"},
+                                       "index": null}},
+              "wait": null}}
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import json
+import numbers
+
+from .uiobjectfinder import UiObjectLocator
+
+_LOCATOR_KEY = '$locator'
+
+# Types of argument values
+_LOCATOR = (UiObjectLocator,)
+_TEXT = (type(''), type(b''))
+_NUMBER = (numbers.Real,)
+_OPTIONAL_NUMBER = (numbers.Real, type(None))
+_COORD = (tuple, list)
+_OPTIONS = (dict,)
+
+# Arguments of each operation, (name, allowed types) pairs
+# in the order of the coder's get_code_<op> parameters
+ACTION_FIELDS = {
+    'set_text': (('locator', _LOCATOR), ('text', _TEXT)),
+    'clear_text': (('locator', _LOCATOR),),
+    'click_object': (('locator', _LOCATOR), ('wait', _OPTIONAL_NUMBER)),
+    'long_click_object': (('locator', _LOCATOR),),
+    'drag_object_to_xy': (
+        ('locator', _LOCATOR), ('coord', _COORD), ('options', _OPTIONS)),
+    'drag_object_to_object': (
+        ('locator', _LOCATOR), ('other_locator', _LOCATOR),
+        ('options', _OPTIONS)),
+    'swipe_object': (
+        ('locator', _LOCATOR), ('direction', _TEXT), ('options', _OPTIONS)),
+    'pinch': (
+        ('locator', _LOCATOR), ('in_or_out', _TEXT), ('options', _OPTIONS)),
+    'fling': (
+        ('locator', _LOCATOR), ('orientation', _TEXT), ('action', _TEXT),
+        ('options', _OPTIONS)),
+    'scroll': (
+        ('locator', _LOCATOR), ('orientation', _TEXT), ('action', _TEXT),
+        ('options', _OPTIONS + (type(None),))),
+    'press_key': (('key_name', _TEXT), ('meta', _OPTIONAL_NUMBER)),
+    'input_text': (('text', _TEXT),),
+    'open_notification': (),
+    'open_quick_settings': (),
+    'click_xy': (('coord', _COORD),),
+    'long_click_xy': (('coord', _COORD),),
+    'drag_xy_to_xy': (
+        ('start', _COORD), ('end', _COORD), ('options', _OPTIONS)),
+    'swipe': (('start', _COORD), ('end', _COORD), ('options', _OPTIONS)),
+    'set_orientation': (('orientation', _TEXT),),
+    'screenshot': (('file', _TEXT),),
+    'wait': (('for_what', _TEXT), ('timeout', _OPTIONAL_NUMBER)),
+    'wait_object': (
+        ('locator', _LOCATOR), ('for_what', _TEXT),
+        ('timeout', _OPTIONAL_NUMBER)),
+}
+
+
+def _check_args(op, args):
+    """Checks arguments of an operation against ACTION_FIELDS
+
+    Raises:
+        ValueError: if op is not a known operation
+        TypeError: if an argument is missing, unexpected,
+            or of a wrong type
+    """
+    fields = ACTION_FIELDS.get(op)
+    if fields is None:
+        raise ValueError('unknown action operation: {0!r}'.format(op))
+    if len(args) != len(fields):
+        names = set(name for name, _ in fields)
+        unexpected = sorted(set(args) - names)
+        if unexpected:
+            raise TypeError('{0}: unexpected arguments {1}'.format(
+                op, ', '.join(unexpected)))
+    for name, types in fields:
+        try:
+            value = args[name]
+        except KeyError:
+            raise TypeError('{0}: missing argument {1}'.format(op, name))
+        if not isinstance(value, types):
+            raise TypeError('{0}: argument {1} must be {2}, not {3}'.format(
+                op, name, ' or '.join(t.__name__ for t in types),
+                type(value).__name__))
+
+
+class Action(object):
+    """Recorded action
+
+    op is the name of the coder operation, which is rendered by
+    coder's get_code_<op> method with args as keyword arguments.
+    args are checked against the fields of op in ACTION_FIELDS,
+    so that a wrong argument fails when it is recorded rather than
+    when it is rendered.
+    """
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('op', 'args', 'device_index')
+
+    def __init__(self, op, args, device_index=0):
+        """Initialization
+
+        Args:
+            op (text): operation name such as 'click_object'
+            args (dict): keyword arguments to the coder method
+            device_index (integer): index of the device
+        Raises:
+            ValueError: if op is not a known operation
+            TypeError: if args do not match the fields of op
+        """
+        _check_args(op, args)
+        self.op = op
+        self.args = args
+        self.device_index = device_index
+
+    def __eq__(self, other):
+        return (isinstance(other, Action) and
+                self.op == other.op and
+                self.device_index == other.device_index and
+                _freeze(self.args) == _freeze(other.args))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Action({0!r}, {1!r}, {2!r})'.format(
+            self.op, self.args, self.device_index)
+
+    def to_json(self):
+        """Returns JSON text of the action"""
+        return json.dumps({
+            'op': self.op,
+            'device': self.device_index,
+            'args': _encode(self.args)
+        }, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text):
+        """Creates an action from JSON text made by to_json"""
+        obj = json.loads(text)
+        return cls(obj['op'], _decode(obj['args']), obj.get('device', 0))
+
+
+def _encode(value):
+    """Converts a value into JSON compatible one"""
+    if isinstance(value, UiObjectLocator):
+        locator = {'filters': _encode(value.filters), 'index': value.index}
+        if value.relation is not None:
+            locator['relation'] = _encode(value.relation)
+        return {_LOCATOR_KEY: locator}
+    if isinstance(value, dict):
+        return dict((k, _encode(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value):
+    """Converts a value made by _encode back.
+    Arrays become tuples, which is what coordinates are."""
+    if isinstance(value, dict):
+        if _LOCATOR_KEY in value:
+            locator = value[_LOCATOR_KEY]
+            relation = locator.get('relation')
+            return UiObjectLocator(
+                filters=_decode(locator['filters']), index=locator['index'],
+                relation=None if relation is None else _decode(relation))
+        return dict((k, _decode(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_decode(v) for v in value)
+    return value
+
+
+def _freeze(value):
+    """Converts a value into hashable one which identifies the value"""
+    if isinstance(value, UiObjectLocator):
+        return (_LOCATOR_KEY, _freeze(value.filters), value.index,
+                _freeze(value.relation))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class CodeRenderer(object):
+    """Renders actions into code fragments with a coder
+
+    Rendered code fragments are cached, because the same actions
+    (key presses, waits, clicks on the same object) are recorded
+    again and again. The cache is cleared when it becomes full.
+    """
+
+    def __init__(self, coder, maxsize=1024):
+        """Initialization
+
+        Args:
+            coder (object): coder object such as UiautomatorCoder
+            maxsize (integer): maximum number of cached fragments
+        """
+        self._coder = coder
+        self._maxsize = maxsize
+        self._cache = {}
+
+    @property
+    def coder(self):
+        """Coder object"""
+        return self._coder
+
+    def render(self, action):
+        """Renders an action
+
+        Args:
+            action (object): Action
+        Returns:
+            text: code fragment, of which device instance is
+                the placeholder {instance}
+        """
+        try:
+            key = (action.op, _freeze(action.args))
+            code = self._cache.get(key)
+        except TypeError:
+            # Arguments which are not hashable are not cached
+            key = code = None
+        if code is None:
+            code = getattr(self._coder, 'get_code_' + action.op)(
+                **action.args)
+            if key is not None:
+                if len(self._cache) >= self._maxsize:
+                    self._cache.clear()
+                self._cache[key] = code
+        return code
+
+
+class ActionLog(object):
+    """Sequence of recorded actions
+
+    If out_file is given, each action is also written to it
+    as a JSON line on append.
+    """
+
+    def __init__(self, out_file=None):
+        """Initialization
+
+        Args:
+            out_file (file): text file to which actions are written
+        """
+        self._actions = []
+        self._out_file = out_file
+
+    def append(self, action):
+        """Appends an action"""
+        self._actions.append(action)
+        if self._out_file is not None:
+            self._out_file.write(action.to_json() + '\n')
+            self._out_file.flush()
+
+    def __iter__(self):
+        return iter(self._actions)
+
+    def __len__(self):
+        return len(self._actions)
+
+    def __getitem__(self, index):
+        return self._actions[index]
+
+    def dump(self, out_file):
+        """Writes all actions as JSON lines"""
+        for action in self._actions:
+            out_file.write(action.to_json() + '\n')
+
+    @classmethod
+    def load(cls, lines):
+        """Creates an action log from JSON lines
+
+        Args:
+            lines (iterable): text lines. Blank lines are ignored.
+        Returns:
+            ActionLog: loaded actions
+        """
+        log = cls()
+        for line in lines:
+            if line.strip():
+                log.append(Action.from_json(line))
+        return log
+
+    def replay(self, writer, coder):
+        """Renders all actions with a coder and records them
+        to a writer, e.g. to generate a script for another backend
+
+        Args:
+            writer (object): writer such as PytestScriptWriter
+            coder (object): coder which renders the actions
+        """
+        renderer = CodeRenderer(coder)
+        recorders = {}
+        for action in self._actions:
+            recorder = recorders.get(action.device_index)
+            if recorder is None:
+                recorder = writer.get_recorder(action.device_index)
+                recorders[action.device_index] = recorder
+            recorder(renderer.render(action), action=action)
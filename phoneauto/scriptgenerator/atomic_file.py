@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Text file which replaces its destination atomically on commit
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import io
+import os
+import stat
+import tempfile
+
+
+def _get_umask():
+    """Returns the umask of the process"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once, since reading the umask sets it temporarily
+_UMASK = _get_umask()
+
+try:
+    _replace = os.replace
+except AttributeError:
+    def _replace(src, dst):
+        """os.replace for Python 2, of which os.rename does not
+        overwrite dst on Windows"""
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+class AtomicFile(object):
+    """Text file written to a temporary file next to the destination,
+    which is renamed to the destination on commit
+
+    Until commit() is called the destination is left untouched,
+    so that a crash never leaves a half-written file behind.
+    The temporary file holds what has been written until the last
+    checkpoint(), and can be used to recover from the crash.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        """Initialization
+
+        Args:
+            path (text): destination file path
+            encoding (text): text encoding
+        """
+        self._path = os.path.abspath(path)
+        dirname, basename = os.path.split(self._path)
+        fd, self._tmp_path = tempfile.mkstemp(
+            prefix='.{0}.'.format(basename), suffix='.tmp', dir=dirname)
+        self._file = io.open(fd, 'w', encoding=encoding, newline='')
+
+    @property
+    def path(self):
+        """Destination file path"""
+        return self._path
+
+    @property
+    def tmp_path(self):
+        """Temporary file path"""
+        return self._tmp_path
+
+    @property
+    def closed(self):
+        """True if committed or discarded"""
+        return self._file.closed
+
+    def write(self, text):
+        """Writes text to the temporary file"""
+        return self._file.write(text)
+
+    def flush(self):
+        """Flushes the internal buffer"""
+        self._file.flush()
+
+    def checkpoint(self):
+        """Makes what has been written durable in the temporary file"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def commit(self):
+        """Closes the temporary file and renames it to the destination
+
+        The destination gets the mode of the file it replaces,
+        or the default mode of a new file, instead of the private mode
+        of the temporary file.
+        """
+        self.checkpoint()
+        self._file.close()
+        try:
+            mode = stat.S_IMODE(os.stat(self._path).st_mode)
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(self._tmp_path, mode)
+        _replace(self._tmp_path, self._path)
+
+    def close(self):
+        """Closes the temporary file without committing.
+        The temporary file is kept and the destination is left untouched."""
+        self._file.close()
+
+    def discard(self):
+        """Closes and removes the temporary file.
+        The destination is left untouched."""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.closed:
+            return False
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
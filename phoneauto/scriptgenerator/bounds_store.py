@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Vectorized store of view bounds, requires numpy
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+# Boolean attributes held in the flags bitmask.
+# Names are the same in search criteria and in object attributes.
+FLAG_NAMES = ('checkable', 'checked', 'clickable', 'enabled', 'focusable',
+              'focused', 'scrollable', 'longClickable', 'selected')
+
+_FLAG_BITS = dict((name, 1 << i) for i, name in enumerate(FLAG_NAMES))
+
+# Column positions in the bounds array
+_L, _T, _R, _B = range(4)
+
+
+def available():
+    """Checks if numpy, which BoundsStore depends on, is available"""
+    return numpy is not None
+
+
+def _flag_value(value):
+    """Converts criteria value of a boolean attribute into bool,
+    or None if it never matches a boolean attribute"""
+    if isinstance(value, bool):
+        return value
+    if value in ('true', 'false'):
+        return value == 'true'
+    return None
+
+
+class BoundsStore(object):
+    """visibleBounds and boolean attributes of all objects in a dump
+
+    Bounds are held in an (N, 4) int array of (left, top, right, bottom),
+    boolean attributes in an (N,) bitmask array, so that containment
+    tests and the smallest object selection run as vectorized operations.
+    """
+
+    def __init__(self, objects):
+        """Initialization
+
+        Args:
+            objects (list): attributes of all objects in document order
+        """
+        self._bounds = numpy.array(
+            [(o['visibleBounds']['left'], o['visibleBounds']['top'],
+              o['visibleBounds']['right'], o['visibleBounds']['bottom'])
+             for o in objects],
+            dtype=numpy.int64).reshape(-1, 4)
+        self._flags = numpy.array(
+            [sum(bit for name, bit in _FLAG_BITS.items() if o[name])
+             for o in objects],
+            dtype=numpy.uint16)
+        bounds = self._bounds
+        self._areas = ((bounds[:, _B] - bounds[:, _T]) *
+                       (bounds[:, _R] - bounds[:, _L]))
+        self._centers = numpy.column_stack((
+            bounds[:, _L] + (bounds[:, _R] - bounds[:, _L]) / 2.0,
+            bounds[:, _T] + (bounds[:, _B] - bounds[:, _T]) / 2.0))
+
+    def __len__(self):
+        """Number of objects"""
+        return len(self._flags)
+
+    @property
+    def bounds(self):
+        """(N, 4) array of (left, top, right, bottom)"""
+        return self._bounds
+
+    @property
+    def flags(self):
+        """(N,) bitmask array of boolean attributes"""
+        return self._flags
+
+    @property
+    def areas(self):
+        """(N,) array of bounds areas"""
+        return self._areas
+
+    @property
+    def centers(self):
+        """(N, 2) array of bounds centers (x, y)"""
+        return self._centers
+
+    def flag_mask(self, flag_criteria):
+        """Returns boolean mask of objects which meet flag criteria
+
+        Args:
+            flag_criteria (dict):
+                criteria of which names are in FLAG_NAMES,
+                such as {'clickable': True}
+        """
+        care_bits = value_bits = 0
+        for name, value in flag_criteria.items():
+            expected = _flag_value(value)
+            if expected is None:
+                return numpy.zeros(len(self), dtype=bool)
+            care_bits |= _FLAG_BITS[name]
+            if expected:
+                value_bits |= _FLAG_BITS[name]
+        return (self._flags & care_bits) == value_bits
+
+    def select(self, flag_criteria, node_filter=None, nodes=None):
+        """Returns boolean mask of objects which meet criteria
+
+        Args:
+            flag_criteria (dict): criteria on boolean attributes
+            node_filter (callable):
+                predicate on dump node, applied to objects which meet
+                flag_criteria. Used for criteria which are not vectorized.
+            nodes (list): dump nodes in document order
+        """
+        mask = self.flag_mask(flag_criteria)
+        if node_filter is not None:
+            positions = numpy.flatnonzero(mask)
+            rejected = [i for i in positions if not node_filter(nodes[i])]
+            mask[rejected] = False
+        return mask
+
+    def find_smallest_containing(self, coord, mask, distance_thresh=None):
+        """Finds the smallest object of which bounds contain coord
+
+        Args:
+            coord (tuple): coordinates (x, y)
+            mask (array): boolean mask of candidate objects
+            distance_thresh (float):
+                Objects of which center is not closer than this value
+                to coord are ignored. No distance check if None.
+        Returns:
+            tuple: (index among candidates, position in document order),
+                or None if no object is found.
+        """
+        x, y = coord
+        bounds = self._bounds
+        hit = (mask &
+               (bounds[:, _L] <= x) & (x < bounds[:, _R]) &
+               (bounds[:, _T] <= y) & (y < bounds[:, _B]))
+        if distance_thresh is not None:
+            distance = numpy.hypot(
+                x - self._centers[:, 0], y - self._centers[:, 1])
+            hit &= distance < distance_thresh
+        positions = numpy.flatnonzero(hit)
+        if len(positions) == 0:
+            return None
+        position = positions[numpy.argmin(self._areas[positions])]
+        index = int(numpy.count_nonzero(mask[:position]))
+        return index, int(position)
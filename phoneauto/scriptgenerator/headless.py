@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""Headless driver which records actions without GUI
+
+Actions are given through the Python API (HeadlessDriver.perform)
+or as JSON lines, one action per line, such as:
+
+    {"command": "click_object", "args": {"start": [540, 960]}}
+    {"command": "press_key", "args": {"key_name": "HOME"}}
+    {"command": "insert_wait", "args": {"for_what": "idle", "timeout": 5000}}
+
+"command" and "args" are the same as the arguments of
+ScriptGenerator.execute. Optional "device" is the device index.
+Blank lines and lines starting with '#' are ignored.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import json
+import logging
+
+from phoneauto.scriptgenerator.exception import (
+    UiInconsitencyError, UiObjectNotFound)
+
+
+# Commands which do not use the hierarchy dump
+_DUMP_FREE_COMMANDS = frozenset([
+    'update_view_dump', 'get_screenshot', 'get_screen_size',
+    'press_key', 'open_notification', 'open_quick_settings',
+    'click_xy', 'long_click_xy', 'drag_xy_to_xy', 'swipe_xy_to_xy',
+    'set_orientation', 'insert_screenshot_capture', 'insert_wait',
+    'get_session_dumps', 'restore_view_dump'])
+
+# Commands which do not change the screen
+_READ_ONLY_COMMANDS = frozenset([
+    'update_view_dump', 'get_screenshot', 'get_screen_size',
+    'get_hierarchy_view_object_info', 'get_hierarchy_view_objects',
+    'insert_screenshot_capture', 'insert_wait', 'insert_wait_object',
+    'get_session_dumps'])
+
+# Commands after which the dump is up to date
+_DUMP_SETTING_COMMANDS = frozenset(['update_view_dump', 'restore_view_dump'])
+
+
+class ActionError(Exception):
+    """Raised when an action can not be parsed or performed"""
+
+    def __init__(self, message, line_number=None):
+        """Initialization
+
+        Args:
+            message (text): error description
+            line_number (integer): line number of the action if known
+        """
+        if line_number is not None:
+            message = 'line {0}: {1}'.format(line_number, message)
+        super(ActionError, self).__init__(message)
+        self.line_number = line_number
+
+
+class HeadlessDriver(object):
+    """Performs actions through ScriptGenerator without GUI
+
+    The hierarchy dump is updated automatically: after an action
+    which may have changed the screen, the dump is updated before
+    the next action which needs it.
+    """
+
+    def __init__(self, controller, auto_update=True):
+        """Initialization
+
+        Args:
+            controller (object): ScriptGenerator object
+            auto_update (bool):
+                Updates the hierarchy dump automatically if True.
+                Otherwise, the dump is updated only by
+                explicit 'update_view_dump' actions.
+        """
+        self._controller = controller
+        self._auto_update = auto_update
+        self._dump_is_stale = True
+
+    def perform(self, command_name, command_args=None, device_index=0):
+        """Performs an action
+
+        Args:
+            command_name (text): name of the command
+            command_args (dict): arguments to the command
+            device_index (integer): index of the device
+        Returns:
+            object: return value of the command
+        """
+        if (self._auto_update and self._dump_is_stale and
+                command_name not in _DUMP_FREE_COMMANDS):
+            self._controller.execute(
+                'update_view_dump', device_index=device_index)
+            self._dump_is_stale = False
+        try:
+            return self._controller.execute(
+                command_name, command_args, device_index=device_index)
+        finally:
+            if command_name in _DUMP_SETTING_COMMANDS:
+                self._dump_is_stale = False
+            elif command_name not in _READ_ONLY_COMMANDS:
+                self._dump_is_stale = True
+
+    def perform_all(self, actions, keep_going=False):
+        """Performs actions
+
+        Args:
+            actions (iterable):
+                (line number, command name, command args, device index)
+                tuples such as what parse_actions yields
+            keep_going (bool):
+                Skips actions of which target object is not found
+                if True. Otherwise ActionError is raised.
+        Returns:
+            integer: number of skipped actions
+        """
+        logger = logging.getLogger(__name__)
+        skipped = 0
+        for line_number, command_name, command_args, device_index in actions:
+            try:
+                self.perform(command_name, command_args, device_index)
+            except (UiObjectNotFound, UiInconsitencyError) as exc:
+                if not keep_going:
+                    raise ActionError(
+                        '{0} failed: {1!r}'.format(command_name, exc),
+                        line_number)
+                logger.warning('line %s: %s skipped: %r',
+                               line_number, command_name, exc)
+                skipped += 1
+        return skipped
+
+
+def _tuplify(value):
+    """Converts JSON arrays (coordinates) into tuples"""
+    if isinstance(value, list):
+        return tuple(_tuplify(v) for v in value)
+    if isinstance(value, dict):
+        return dict((k, _tuplify(v)) for k, v in value.items())
+    return value
+
+
+def parse_actions(lines, known_commands=None):
+    """Parses JSON lines of actions
+
+    Args:
+        lines (iterable): text lines
+        known_commands (container):
+            Names of valid commands. Not checked if None.
+    Yields:
+        tuple: (line number, command name, command args, device index)
+    Raises:
+        ActionError: if a line is not a valid action
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            action = json.loads(line)
+        except ValueError as exc:
+            raise ActionError('invalid JSON: {0}'.format(exc), line_number)
+        if not isinstance(action, dict) or 'command' not in action:
+            raise ActionError('"command" is missing', line_number)
+        command_name = action['command']
+        if known_commands is not None and command_name not in known_commands:
+            raise ActionError(
+                'unknown command "{0}"'.format(command_name), line_number)
+        command_args = _tuplify(action.get('args') or {})
+        yield line_number, command_name, command_args, action.get('device', 0)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Hit map which answers hover lookups by a single array index,
+requires numpy
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import threading
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from . import bounds_store
+
+
+def available():
+    """Checks if numpy, which hit maps depend on, is available"""
+    return numpy is not None
+
+
+class HitMap(object):
+    """Label raster at canvas resolution
+
+    Each pixel holds the position of the object which
+    UiObjectFinder.find_object_contains without criteria returns
+    for the pixel, or -1 if there is no such object.
+    """
+
+    def __init__(self, labels, objects):
+        """Initialization
+
+        Args:
+            labels (array): (height, width) array of object positions
+            objects (list): attributes of all objects in document order
+        """
+        self._labels = labels
+        self._objects = objects
+
+    @property
+    def labels(self):
+        """(height, width) array of object positions"""
+        return self._labels
+
+    def lookup(self, position):
+        """Returns attributes of the object at the canvas position
+
+        Args:
+            position (tuple): canvas coordinates (x, y)
+        Returns:
+            dict: attributes of the object, or None if there is no object
+        """
+        x, y = position
+        height, width = self._labels.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        label = self._labels[y, x]
+        if label < 0:
+            return None
+        return self._objects[label]
+
+
+def build_hit_map(objects, canvas_size, scale, distance_thresh=None):
+    """Builds hit map
+
+    Canvas pixel (x, y) corresponds to the device screen coordinates
+    (int(x / scale[0]), int(y / scale[1])), the same conversion the UI
+    applies before asking the controller. Objects are painted
+    from the largest to the smallest, so that each pixel ends up with
+    the smallest object containing it. Among objects of the same area,
+    the first one in document order wins, as in UiObjectFinder.
+
+    Args:
+        objects (list): attributes of all objects in document order
+        canvas_size (tuple): (width, height) of the canvas
+        scale (tuple): (x, y) scale from device screen to canvas
+        distance_thresh (float):
+            Objects of which center is not closer than this value
+            to the device coordinates are ignored. No distance check if None.
+    Returns:
+        HitMap: hit map
+    """
+    store = bounds_store.BoundsStore(objects)
+    width, height = canvas_size
+    device_x = (numpy.arange(width) / scale[0]).astype(numpy.int64)
+    device_y = (numpy.arange(height) / scale[1]).astype(numpy.int64)
+    labels = numpy.full((height, width), -1, dtype=numpy.int32)
+
+    positions = numpy.arange(len(store))
+    order = numpy.lexsort((-positions, -store.areas))
+    bounds, centers = store.bounds, store.centers
+    for position in order:
+        left, top, right, bottom = bounds[position]
+        col0, col1 = numpy.searchsorted(device_x, (left, right))
+        row0, row1 = numpy.searchsorted(device_y, (top, bottom))
+        if col0 >= col1 or row0 >= row1:
+            continue
+        region = labels[row0:row1, col0:col1]
+        if distance_thresh is None:
+            region[...] = position
+        else:
+            center_x, center_y = centers[position]
+            distance = numpy.hypot(
+                device_x[col0:col1][numpy.newaxis, :] - center_x,
+                device_y[row0:row1][:, numpy.newaxis] - center_y)
+            region[distance < distance_thresh] = position
+    return HitMap(labels, objects)
+
+
+class HitMapBuilder(threading.Thread):
+    """Builds a hit map in background"""
+
+    def __init__(self, objects, canvas_size, scale,
+                 distance_thresh=None, on_built=None):
+        """Initialization
+
+        Args:
+            objects, canvas_size, scale, distance_thresh:
+                see build_hit_map
+            on_built (callable):
+                Called with the hit map in the builder thread
+                when it has been built
+        """
+        super(HitMapBuilder, self).__init__(name='hitmap')
+        self.daemon = True
+        self._args = (objects, canvas_size, scale, distance_thresh)
+        self._on_built = on_built
+        self.hit_map = None
+
+    def run(self):
+        """Builds the hit map"""
+        self.hit_map = build_hit_map(*self._args)
+        if self._on_built:
+            self._on_built(self.hit_map)
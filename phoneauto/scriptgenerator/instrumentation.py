@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Latency instrumentation of ScriptGenerator commands
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import collections
+import json
+import time
+
+from .atomic_file import AtomicFile
+
+
+# Phases of a command execution which are measured as spans.
+# 'kwargs' includes 'finder' because locators are resolved
+# while keyword arguments are transformed.
+PHASES = ('total', 'kwargs', 'finder', 'coder', 'record', 'device',
+          'parse')
+
+
+class Histogram(object):
+    """Latency histogram of the most recent samples"""
+
+    def __init__(self, maxlen=1024):
+        """Initialization
+
+        Args:
+            maxlen (integer):
+                Number of most recent samples percentiles are computed from
+        """
+        self._samples = collections.deque(maxlen=maxlen)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, duration_ms):
+        """Adds a sample in milliseconds"""
+        self._samples.append(duration_ms)
+        self.count += 1
+        self.total_ms += duration_ms
+
+    def percentile(self, percent):
+        """Returns the percentile of recent samples in milliseconds
+        (nearest-rank method), or None if there is no sample"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = int(round(percent / 100.0 * (len(ordered) - 1)))
+        return ordered[rank]
+
+    @property
+    def p50(self):
+        """Median of recent samples in milliseconds"""
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        """95th percentile of recent samples in milliseconds"""
+        return self.percentile(95)
+
+
+class _Span(object):
+    """Context manager which measures a span"""
+
+    __slots__ = ('_instrumentation', '_command_name', '_phase', '_start')
+
+    def __init__(self, instrumentation, command_name, phase):
+        """Initialization"""
+        self._instrumentation = instrumentation
+        self._command_name = command_name
+        self._phase = phase
+        self._start = None
+
+    def __enter__(self):
+        self._start = self._instrumentation.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = self._instrumentation.clock()
+        self._instrumentation.add_sample(
+            self._command_name, self._phase, (end - self._start) * 1000.0,
+            error=exc_type is not None)
+        return False
+
+
+class Instrumentation(object):
+    """Collects durations of spans of command executions
+
+    Spans are identified by (command name, phase).
+    Each finished span is added to the histogram of the span
+    and passed to exporters.
+    """
+
+    def __init__(self, maxlen=1024, exporters=None, clock=time.time):
+        """Initialization
+
+        Args:
+            maxlen (integer):
+                Number of most recent samples kept per span
+            exporters (list):
+                Callables which are called with (instrumentation, record)
+                when a span finishes. record is a dict which has
+                'command', 'phase', 'duration_ms', 'error' and 'timestamp'.
+                Exporters which have close(instrumentation) method
+                are closed by close().
+            clock (callable): returns current time in seconds
+        """
+        self.clock = clock
+        self._maxlen = maxlen
+        self._exporters = list(exporters or [])
+        self._histograms = {}
+
+    @property
+    def enabled(self):
+        """True if spans are measured"""
+        return True
+
+    @property
+    def histograms(self):
+        """Dictionary of {(command name, phase): Histogram}"""
+        return self._histograms
+
+    def add_exporter(self, exporter):
+        """Adds an exporter, see __init__ for the interface"""
+        self._exporters.append(exporter)
+
+    def span(self, command_name, phase):
+        """Returns a context manager which measures a span
+
+        Args:
+            command_name (text): name of the command
+            phase (text): one of PHASES
+        """
+        return _Span(self, command_name, phase)
+
+    def add_sample(self, command_name, phase, duration_ms, error=False):
+        """Adds a measured span duration in milliseconds"""
+        key = (command_name, phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self._maxlen)
+        histogram.add(duration_ms)
+        if self._exporters:
+            record = {
+                'command': command_name,
+                'phase': phase,
+                'duration_ms': duration_ms,
+                'error': error,
+                'timestamp': self.clock()
+            }
+            for exporter in self._exporters:
+                exporter(self, record)
+
+    def close(self):
+        """Closes exporters, which write what they have not written"""
+        for exporter in self._exporters:
+            close = getattr(exporter, 'close', None)
+            if close is not None:
+                close(self)
+
+    def summary(self, phase=None):
+        """Returns statistics of spans sorted by command name and phase
+
+        Args:
+            phase (text): Only spans of the phase are returned if given
+        Returns:
+            list: dicts which have 'command', 'phase', 'count',
+                'p50_ms' and 'p95_ms'
+        """
+        return [
+            {'command': command_name, 'phase': span_phase,
+             'count': histogram.count,
+             'p50_ms': histogram.p50, 'p95_ms': histogram.p95}
+            for (command_name, span_phase), histogram
+            in sorted(self._histograms.items())
+            if phase is None or span_phase == phase]
+
+
+class _NullSpan(object):
+    """Context manager which does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# Span of disabled instrumentation and profiling, shared as it's stateless
+NULL_SPAN = _NullSpan()
+
+
+class NullInstrumentation(object):
+    """Instrumentation which measures nothing, used when disabled"""
+
+    @property
+    def enabled(self):
+        """True if spans are measured"""
+        return False
+
+    @property
+    def histograms(self):
+        """Always empty"""
+        return {}
+
+    def span(self, command_name, phase):
+        """Returns a context manager which does nothing"""
+        # pylint: disable=unused-argument
+        return NULL_SPAN
+
+    def close(self):
+        """Does nothing"""
+        pass
+
+    def summary(self, phase=None):
+        """Always empty"""
+        # pylint: disable=unused-argument
+        return []
+
+
+class JsonLinesExporter(object):
+    """Exporter which writes each finished span as a JSON line"""
+
+    def __init__(self, out_file):
+        """Initialization
+
+        Args:
+            out_file (file): text file object to which lines are written
+        """
+        self._out_file = out_file
+
+    def __call__(self, instrumentation, record):
+        """Writes record"""
+        self._out_file.write(json.dumps(record, sort_keys=True) + '\n')
+        self._out_file.flush()
+
+    def close(self, instrumentation):
+        """Closes the file"""
+        # pylint: disable=unused-argument
+        self._out_file.close()
+
+
+def format_prometheus_text(instrumentation, metric='scriptgenerator_span'):
+    """Formats span statistics in Prometheus text exposition format
+
+    Args:
+        instrumentation (Instrumentation): statistics source
+        metric (text): metric name prefix
+    Returns:
+        text: exposition text
+    """
+    lines = [
+        '# HELP {0}_milliseconds Duration of command spans'.format(metric),
+        '# TYPE {0}_milliseconds summary'.format(metric)]
+    for (command_name, phase), histogram in sorted(
+            instrumentation.histograms.items()):
+        labels = 'command="{0}",phase="{1}"'.format(command_name, phase)
+        for quantile, value in (('0.5', histogram.p50),
+                                ('0.95', histogram.p95)):
+            lines.append('{0}_milliseconds{{{1},quantile="{2}"}} {3}'.format(
+                metric, labels, quantile, value))
+        lines.append('{0}_milliseconds_sum{{{1}}} {2}'.format(
+            metric, labels, histogram.total_ms))
+        lines.append('{0}_milliseconds_count{{{1}}} {2}'.format(
+            metric, labels, histogram.count))
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusTextExporter(object):
+    """Exporter which rewrites a Prometheus text file,
+    for example the one read by node_exporter's textfile collector
+
+    The file is rewritten at most once per interval,
+    and replaced atomically so that readers never see partial content.
+    Spans finished since the last rewrite are written by close().
+    """
+
+    def __init__(self, path, interval=5.0):
+        """Initialization
+
+        Args:
+            path (text): path of the file to be written
+            interval (float): minimum interval of rewrites in seconds
+        """
+        self._path = path
+        self._interval = interval
+        self._last_written = None
+        self._pending = False
+
+    def __call__(self, instrumentation, record):
+        """Rewrites the file if interval has passed"""
+        now = record['timestamp']
+        if (self._last_written is not None and
+                now - self._last_written < self._interval):
+            self._pending = True
+            return
+        self._last_written = now
+        self.write(instrumentation)
+
+    def close(self, instrumentation):
+        """Rewrites the file if there are spans not written yet"""
+        if self._pending:
+            self.write(instrumentation)
+
+    def write(self, instrumentation):
+        """Rewrites the file immediately"""
+        with AtomicFile(self._path) as out_file:
+            out_file.write(format_prometheus_text(instrumentation))
+        self._pending = False
@@ -47,6 +47,30 @@ def chars_to_keys_us(chars):
         yield char_to_key_us(char)
 
 
+def key_to_char_us(key_name, meta=None):
+    """Converts key name on US keyboard to character,
+    the inverse of char_to_key_us
+
+    Args:
+        key_name (text): key name such as 'a' and '1'
+        meta (integer): meta key
+    Returns:
+        text: character, or None if the key does not type a character
+    Example:
+        >>> key_to_char_us('a', 1) == 'A'  # True
+    """
+    if len(key_name) != 1:
+        return None
+    found_i = _CHARS_PRIMARY.find(key_name)
+    if found_i < 0:
+        return None
+    if meta is None:
+        return key_name
+    if meta == _META_SHIFT_ON and found_i < len(_CHARS_SECONDARY):
+        return _CHARS_SECONDARY[found_i]
+    return None
+
+
 _ALPHA = _ALPHA_LOWERCASE
 _ALPHA_START = 29
 _ALPHA_KEYCODE = range(_ALPHA_START, _ALPHA_START + len(_ALPHA))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Stability of locators across successive hierarchy dumps
+
+A locator filter such as text='Inbox (12)' may identify one single
+object now, and nothing or several objects after the screen is updated.
+LocatorStabilityScorer counts, for each filter, in how many of the
+last N dumps it identified one single object.
+The counts are updated when a dump is observed, so that a locator is
+chosen at click time with dictionary lookups only.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+from collections import Counter, deque
+
+# Filter name -> dump node attribute name of scored filters
+SCORED_ATTRIBUTES = (
+    ('resourceId', 'resource-id'),
+    ('description', 'content-desc'),
+    ('text', 'text'),
+    ('className', 'class'))
+
+
+def _unique_filters(dump):
+    """Returns the set of (filter name, value) which match
+    one single node of the dump"""
+    counts = Counter()
+    for node in dump.nodes:
+        for name, attr_name in SCORED_ATTRIBUTES:
+            value = node.get(attr_name, '')
+            if value:
+                counts[(name, value)] += 1
+    return frozenset(key for key, count in counts.items() if count == 1)
+
+
+class LocatorStabilityScorer(object):
+    """Scores locator filters by how many recent dumps they identify
+    one single object in"""
+
+    def __init__(self, history=5):
+        """Initialization
+
+        Args:
+            history (integer): number of recent dumps to score over
+        """
+        self._window = deque()
+        self._history = history
+        # (filter name, value) -> number of dumps in the window
+        # in which the filter matches one single node
+        self._scores = Counter()
+        self._latest = None
+
+    def __len__(self):
+        """Number of dumps in the window"""
+        return len(self._window)
+
+    @property
+    def latest(self):
+        """The dump observed last, None if nothing is observed"""
+        return self._latest
+
+    def observe(self, dump):
+        """Adds a dump to the window, the oldest one is dropped
+        if the window is full
+
+        Args:
+            dump (ViewHierarchyDump): dump of the updated screen
+        """
+        unique_filters = _unique_filters(dump)
+        self._window.append(unique_filters)
+        self._scores.update(unique_filters)
+        if len(self._window) > self._history:
+            for key in self._window.popleft():
+                self._scores[key] -= 1
+                if not self._scores[key]:
+                    del self._scores[key]
+        self._latest = dump
+
+    def is_unique(self, name, value):
+        """Checks if the filter matches one single node
+        of the latest dump"""
+        return bool(self._window) and (name, value) in self._window[-1]
+
+    def score(self, name, value):
+        """Number of dumps in the window in which
+        the filter matches one single node"""
+        return self._scores[(name, value)]
+
+    def rank(self, candidates):
+        """Orders filters which match one single node of the latest dump,
+        the most stable one first
+
+        Args:
+            candidates (list):
+                (filter name, value) pairs in order of preference,
+                which is kept among filters of the same score
+        Returns:
+            list: (filter name, value) pairs
+        """
+        unique = [c for c in candidates if self.is_unique(*c)]
+        return sorted(unique, key=lambda c: -self.score(*c))
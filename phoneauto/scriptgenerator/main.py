@@ -6,7 +6,7 @@
 """
 # pylint: disable=invalid-name
 
-from __future__ import unicode_literals
+from __future__ import unicode_literals, print_function
 import argparse
 import codecs
 import io
@@ -14,12 +14,67 @@ import logging
 import os
 import sys
 
+from phoneauto.scriptgenerator import action_ir
+from phoneauto.scriptgenerator import atomic_file
+from phoneauto.scriptgenerator import headless
+from phoneauto.scriptgenerator import instrumentation
+from phoneauto.scriptgenerator import profiler
+from phoneauto.scriptgenerator import replay
 from phoneauto.scriptgenerator import pytest_script_writer
+from phoneauto.scriptgenerator import script_optimizer
 from phoneauto.scriptgenerator import scriptgenerator_ui
 from phoneauto.scriptgenerator import scriptgenerator
+from phoneauto.scriptgenerator import session_store
 from phoneauto.scriptgenerator import uiautomator_device
 from phoneauto.scriptgenerator import uiautomator_coder
 from phoneauto.scriptgenerator import screenrecord
+from phoneauto.helpers import wait_policy
+
+
+def _get_outfile(result_out):
+    """Returns text file object to which automation script is written"""
+    if result_out is None:
+        if sys.version_info[0] >= 3:
+            return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        else:
+            return codecs.getwriter('utf-8')(sys.stdout)
+    return codecs.getwriter('utf-8')(result_out)
+
+
+def _create_writer(options, coder):
+    """Creates script writer and returns it with its output file
+
+    If options['result_path'] is given, the script is buffered and
+    written to an AtomicFile, which replaces the destination only when
+    recording finishes. Otherwise the script is written to
+    options['result_out'] line by line. If options['optimize'] is True,
+    recorded actions are rewritten by ScriptOptimizer in batches.
+    """
+    result_path = options.get('result_path')
+    if result_path:
+        outfile = atomic_file.AtomicFile(result_path)
+        buffered = True
+    else:
+        outfile = _get_outfile(options.get('result_out', None))
+        buffered = False
+    optimizer = None
+    if options.get('optimize'):
+        optimizer = script_optimizer.ScriptOptimizer(
+            coder, dedupe_clicks=options.get('dedupe_clicks', False))
+    writer = pytest_script_writer.PytestScriptWriter(
+        outfile, [coder], buffered=buffered, optimizer=optimizer)
+    return writer, outfile
+
+
+def _keep_partial_result(writer, outfile):
+    """Keeps what has been recorded after recording failed"""
+    if not isinstance(outfile, atomic_file.AtomicFile) or outfile.closed:
+        return
+    writer.checkpoint()
+    outfile.close()
+    logging.getLogger(__name__).warning(
+        'Recording failed. %s is left untouched and '
+        'the partial script is kept in %s', outfile.path, outfile.tmp_path)
 
 
 def scriptgenerator_main(options):
@@ -29,41 +84,168 @@ def scriptgenerator_main(options):
         options['result_out'] (file):
             A file object to which automation script is written.
             Defaults to sys.stdout if result_out is None.
+        options['result_path'] (text):
+            A file path to which automation script is written atomically.
+            result_out is ignored if result_path is given.
+        options['optimize'] (bool):
+            Optimizes recorded actions, such as merging key presses
+            into text input, if True.
+        options['dedupe_clicks'] (bool):
+            Removes repeated identical clicks when optimize is True.
         options['platform'] (text):
             A string which specifies platform such as 'Darwin' etc.
             see sys.platform
+        options['instrumentation'] (object):
+            Instrumentation object which measures command latencies.
+            Latencies are not measured if None.
+        options['action_log'] (object):
+            ActionLog object to which recorded actions are appended.
+        options['session_store'] (object):
+            SessionStore object to which dumps, thumbnails and actions
+            of the session are appended.
+        options['warn_ambiguous_locators'] (bool):
+            Warns when a text or description locator is similar to
+            other texts on the screen, which may be confused after
+            the screen changes, if True.
+        options['profile'] (text):
+            File path to which a trace of the UI event loop
+            and background threads is saved. No profiling if None.
     """
-    result_out = options.get('result_out', None)
-    if result_out is None:
-        if sys.version_info[0] >= 3:
-            outfile = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-        else:
-            outfile = codecs.getwriter('utf-8')(sys.stdout)
-    else:
-        outfile = codecs.getwriter('utf-8')(result_out)
+    profile_path = options.get('profile')
+    ui_profiler = profiler.Profiler() if profile_path else None
 
     ui = scriptgenerator_ui.ScriptGeneratorUI(
         screen_size=options.get('screen_size', (480, 800)),
         platform_sys=options.get('platform', None),
-        timeouts=options.get('timeouts'))
+        timeouts=options.get('timeouts'),
+        profiler=ui_profiler)
 
     device = uiautomator_device.UiautomatorDevice()
     coder = uiautomator_coder.UiautomatorCoder()
-    writer = pytest_script_writer.PytestScriptWriter(outfile, [coder])
+    writer, outfile = _create_writer(options, coder)
 
     writer.start()
     conf = {
         'devices': [device],
         'coder': uiautomator_coder.UiautomatorCoder(),
-        'writer': writer
+        'writer': writer,
+        'instrumentation': options.get('instrumentation'),
+        'action_log': options.get('action_log'),
+        'session_store': options.get('session_store'),
+        'warn_ambiguous_locators': options.get(
+            'warn_ambiguous_locators', False)
     }
     controller = scriptgenerator.ScriptGenerator(conf)
-    ui.run(controller)
+    try:
+        ui.run(controller)
+    except BaseException:
+        _keep_partial_result(writer, outfile)
+        raise
+    finally:
+        if ui_profiler:
+            ui_profiler.save(profile_path)
     writer.finish()
 
     device.close()
 
 
+def headless_main(options):
+    """Records actions without GUI
+
+    Args:
+        options['result_out'] (file):
+            A file object to which automation script is written.
+            Defaults to sys.stdout if result_out is None.
+        options['result_path'] (text):
+            A file path to which automation script is written atomically.
+            result_out is ignored if result_path is given.
+        options['optimize'] (bool):
+            Optimizes recorded actions, such as merging key presses
+            into text input, if True.
+        options['dedupe_clicks'] (bool):
+            Removes repeated identical clicks when optimize is True.
+        options['actions'] (file):
+            A text file object from which actions are read as JSON lines.
+            Defaults to sys.stdin if actions is None.
+        options['keep_going'] (bool):
+            Skips actions of which target object is not found if True.
+        options['instrumentation'] (object):
+            Instrumentation object which measures command latencies.
+            Latencies are not measured if None.
+        options['action_log'] (object):
+            ActionLog object to which recorded actions are appended.
+        options['session_store'] (object):
+            SessionStore object to which dumps, thumbnails and actions
+            of the session are appended.
+        options['warn_ambiguous_locators'] (bool):
+            Warns when a text or description locator is similar to
+            other texts on the screen, which may be confused after
+            the screen changes, if True.
+    Returns:
+        integer: number of skipped actions
+    """
+    actions = options.get('actions') or sys.stdin
+
+    device = uiautomator_device.UiautomatorDevice()
+    coder = uiautomator_coder.UiautomatorCoder()
+    writer, outfile = _create_writer(options, coder)
+
+    writer.start()
+    conf = {
+        'devices': [device],
+        'coder': coder,
+        'writer': writer,
+        'instrumentation': options.get('instrumentation'),
+        'action_log': options.get('action_log'),
+        'session_store': options.get('session_store'),
+        'warn_ambiguous_locators': options.get(
+            'warn_ambiguous_locators', False)
+    }
+    controller = scriptgenerator.ScriptGenerator(conf)
+    driver = headless.HeadlessDriver(controller)
+    try:
+        skipped = driver.perform_all(
+            headless.parse_actions(
+                actions, scriptgenerator.get_command_names()),
+            keep_going=options.get('keep_going', False))
+    except BaseException:
+        _keep_partial_result(writer, outfile)
+        raise
+    finally:
+        if not outfile.closed:
+            writer.finish()
+        device.close()
+    return skipped
+
+
+def replay_main(options):
+    """Replays recorded actions on the device without GUI
+
+    Args:
+        options['action_lines'] (iterable):
+            JSON lines of actions saved with --action_log
+        options['wait_policy'] (object):
+            Wait policy object. FixedWaitPolicy is used if None.
+        options['pipeline'] (bool):
+            Skips waits between consecutive key presses if True.
+        options['keep_going'] (bool):
+            Continues after a failed step if True.
+    Returns:
+        object: ReplayReport
+    """
+    actions = action_ir.ActionLog.load(options['action_lines'])
+    device = uiautomator_device.UiautomatorDevice()
+    try:
+        engine = replay.ReplayEngine(
+            [device],
+            wait_policy=options.get('wait_policy'),
+            pipeline=options.get('pipeline', False))
+        return engine.run(
+            actions, stop_on_error=not options.get('keep_going', False))
+    finally:
+        device.close()
+
+
 def parse_options():
     """Parse options"""
     parser = argparse.ArgumentParser(
@@ -86,9 +268,81 @@ def parse_options():
     parser.add_argument(
         '--wait_gone_timeout', default=5000, type=int,
         help='default timeout for wait.gone in milliseconds')
+    parser.add_argument(
+        '--instrument', action='store_true',
+        help='measure command latencies and show them in the UI')
+    parser.add_argument(
+        '--metrics_out', default='',
+        help='file path to which command latencies are exported '
+             '(implies --instrument)')
+    parser.add_argument(
+        '--metrics_format', default='jsonl', choices=('jsonl', 'prom'),
+        help='format of --metrics_out, JSON lines of each span '
+             'or Prometheus text')
+    parser.add_argument(
+        '--profile', default='',
+        help='file path to which a trace of UI callbacks, event loop lag '
+             'and screenrecord thread is saved (Trace Event Format)')
+    parser.add_argument(
+        '--headless', action='store_true',
+        help='record actions read as JSON lines without GUI')
+    parser.add_argument(
+        '--actions', default='',
+        help='file path of JSON lines actions for --headless. '
+             'Stdin if omitted')
+    parser.add_argument(
+        '--keep_going', action='store_true',
+        help='skip actions of which target object is not found '
+             'in --headless mode, or continue after failed steps '
+             'in --replay')
+    parser.add_argument(
+        '--optimize', action='store_true',
+        help='optimize recorded script: merge key presses into text input, '
+             'collapse redundant waits and hoist repeated selectors')
+    parser.add_argument(
+        '--dedupe_clicks', action='store_true',
+        help='remove repeated identical clicks (with --optimize)')
+    parser.add_argument(
+        '--warn_ambiguous', action='store_true',
+        help='warn when a text or description locator is similar to '
+             'other texts on the screen')
+    parser.add_argument(
+        '--action_log', default='',
+        help='file path to which recorded actions are saved as JSON lines')
+    parser.add_argument(
+        '--session_dir', default='',
+        help='directory in which dumps, screen thumbnails and actions '
+             'of the session are stored, so that past screens can be '
+             'restored to pick locators')
+    parser.add_argument(
+        '--replay', default='',
+        help='replay actions saved with --action_log on the device, '
+             'and print latency of each step')
+    parser.add_argument(
+        '--replay_wait', default='fixed', choices=('fixed', 'adaptive'),
+        help='wait policy used between steps in --replay')
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help='skip waits between consecutive key presses in --replay')
     return parser.parse_args()
 
 
+def create_instrumentation(cmd_options):
+    """Creates Instrumentation object from command line options,
+    or returns None if instrumentation is not enabled"""
+    if not (cmd_options.instrument or cmd_options.metrics_out):
+        return None
+    inst = instrumentation.Instrumentation()
+    if cmd_options.metrics_out:
+        outpath = os.path.abspath(cmd_options.metrics_out)
+        if cmd_options.metrics_format == 'prom':
+            inst.add_exporter(instrumentation.PrometheusTextExporter(outpath))
+        else:
+            inst.add_exporter(instrumentation.JsonLinesExporter(
+                io.open(outpath, 'w', encoding='utf-8')))
+    return inst
+
+
 def main():
     """Entry point"""
     logging.basicConfig(level=logging.INFO)
@@ -96,8 +350,7 @@ def main():
 
     options = {}
     if cmd_options.output:
-        outpath = os.path.abspath(cmd_options.output)
-        options['result_out'] = io.open(outpath, 'wb')
+        options['result_path'] = os.path.abspath(cmd_options.output)
     options['screen_size'] = tuple(
         int(s) for s in cmd_options.screen_size.split('x'))
     options['timeout'] = {
@@ -106,10 +359,60 @@ def main():
         'exists': cmd_options.wait_exists_timeout,
         'gone': cmd_options.wait_gone_timeout
     }
+    options['instrumentation'] = create_instrumentation(cmd_options)
+    options['optimize'] = cmd_options.optimize
+    options['dedupe_clicks'] = cmd_options.dedupe_clicks
+    options['warn_ambiguous_locators'] = cmd_options.warn_ambiguous
+    if cmd_options.action_log:
+        options['action_log'] = action_ir.ActionLog(io.open(
+            os.path.abspath(cmd_options.action_log), 'w', encoding='utf-8'))
+    if cmd_options.profile:
+        options['profile'] = os.path.abspath(cmd_options.profile)
+
+    try:
+        if cmd_options.replay:
+            with io.open(os.path.abspath(cmd_options.replay),
+                         encoding='utf-8') as action_lines:
+                report = replay_main({
+                    'action_lines': action_lines,
+                    'wait_policy': (
+                        wait_policy.AdaptiveWaitPolicy(
+                            idle_timeout=cmd_options.wait_idle_timeout,
+                            update_timeout=cmd_options.wait_update_timeout)
+                        if cmd_options.replay_wait == 'adaptive' else
+                        wait_policy.FixedWaitPolicy(
+                            idle_timeout=cmd_options.wait_idle_timeout,
+                            update_timeout=cmd_options.wait_update_timeout)),
+                    'pipeline': cmd_options.pipeline,
+                    'keep_going': cmd_options.keep_going
+                })
+            print(report.format())
+            if not report.succeeded:
+                sys.exit(1)
+            return
+
+        if cmd_options.session_dir:
+            options['session_store'] = session_store.SessionStore(
+                os.path.abspath(cmd_options.session_dir))
+        if cmd_options.headless:
+            if cmd_options.actions:
+                options['actions'] = io.open(
+                    os.path.abspath(cmd_options.actions), encoding='utf-8')
+            options['keep_going'] = cmd_options.keep_going
+            try:
+                headless_main(options)
+            except headless.ActionError as exc:
+                sys.exit('error: {0}'.format(exc))
+            return
 
-    screenrecord.check_prerequisites()
+        screenrecord.check_prerequisites()
 
-    scriptgenerator_main(options)
+        scriptgenerator_main(options)
+    finally:
+        if options.get('session_store') is not None:
+            options['session_store'].close()
+        if options['instrumentation'] is not None:
+            options['instrumentation'].close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Profiler of the UI event loop and background threads
+
+Records callback durations, event loop lag, queue depths and
+thread CPU time, and saves them in Trace Event Format which is
+viewable in chrome://tracing, Perfetto UI, etc.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import collections
+import contextlib
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+from .instrumentation import NULL_SPAN
+
+
+def _thread_time():
+    """CPU time of the current thread in seconds,
+    or None if the platform does not support it"""
+    thread_time = getattr(time, 'thread_time', None)
+    if thread_time is None:
+        return None
+    try:
+        return thread_time()
+    except OSError:
+        return None
+
+
+class Profiler(object):
+    """Trace event recorder
+
+    All methods are thread safe. Events are recorded in memory
+    until save() is called; the oldest events are dropped
+    when max_events is exceeded.
+    """
+
+    def __init__(self, max_events=1000000, clock=time.time):
+        """Initialization
+
+        Args:
+            max_events (integer): maximum number of events kept in memory
+            clock (callable): returns current time in seconds
+        """
+        self._clock = clock
+        self._pid = os.getpid()
+        self._events = collections.deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._thread_names = {}
+
+    @property
+    def enabled(self):
+        """True if events are recorded"""
+        return True
+
+    def _append(self, event):
+        """Adds an event recorded on the current thread"""
+        thread = threading.current_thread()
+        event['pid'] = self._pid
+        event['tid'] = thread.ident
+        with self._lock:
+            if thread.ident not in self._thread_names:
+                self._thread_names[thread.ident] = thread.name
+            self._events.append(event)
+
+    @staticmethod
+    def _to_us(seconds):
+        """Converts seconds into integer microseconds"""
+        return int(round(seconds * 1000000))
+
+    @contextlib.contextmanager
+    def span(self, name, category='callback'):
+        """Context manager which records duration of the block
+        and CPU time consumed by the current thread meanwhile
+
+        Args:
+            name (text): event name
+            category (text): event category
+        """
+        start = self._clock()
+        start_cpu = _thread_time()
+        try:
+            yield
+        finally:
+            end = self._clock()
+            args = {}
+            if start_cpu is not None:
+                args['thread_cpu_ms'] = (_thread_time() - start_cpu) * 1000.0
+            self._append({
+                'name': name, 'cat': category, 'ph': 'X',
+                'ts': self._to_us(start),
+                'dur': self._to_us(end - start),
+                'args': args})
+
+    def wrap(self, name, func, category='callback'):
+        """Returns a function which calls func within a span"""
+        @functools.wraps(func)
+        def _wrapped(*args, **kwargs):
+            """Calls func within a span"""
+            with self.span(name, category):
+                return func(*args, **kwargs)
+        return _wrapped
+
+    def scheduled(self, name, delay_ms, func):
+        """Returns a function which is to be scheduled after delay_ms,
+        for example with Tk's after()
+
+        When the returned function is called, how late it was called
+        compared with the schedule is recorded as event loop lag,
+        then func is called within a span.
+        """
+        due = self._clock() + delay_ms / 1000.0
+        wrapped = self.wrap(name, func)
+
+        def _scheduled(*args, **kwargs):
+            """Records lag and calls func"""
+            lag_ms = max(0.0, (self._clock() - due) * 1000.0)
+            self.counter('event_loop_lag_ms', {name: lag_ms})
+            return wrapped(*args, **kwargs)
+        return _scheduled
+
+    def counter(self, name, values):
+        """Records counter values such as a queue depth
+
+        Args:
+            name (text): counter name
+            values (dict): {series name: number}
+        """
+        self._append({
+            'name': name, 'cat': 'counter', 'ph': 'C',
+            'ts': self._to_us(self._clock()),
+            'args': dict(values)})
+
+    def instant(self, name, args=None):
+        """Records an instant event"""
+        self._append({
+            'name': name, 'cat': 'instant', 'ph': 'i', 's': 't',
+            'ts': self._to_us(self._clock()),
+            'args': dict(args or {})})
+
+    def events(self):
+        """Returns recorded events including thread name metadata"""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid,
+             'tid': tid, 'args': {'name': thread_name}}
+            for tid, thread_name in sorted(thread_names.items())]
+        return metadata + events
+
+    def save(self, path):
+        """Saves recorded events to a trace file
+
+        Args:
+            path (text): output file path
+        """
+        document = {
+            'traceEvents': self.events(),
+            'displayTimeUnit': 'ms'
+        }
+        # json.dumps returns a byte string on Python 2
+        with io.open(path, 'wb') as trace_file:
+            trace_file.write(json.dumps(document).encode('utf-8'))
+
+
+class NullProfiler(object):
+    """Profiler which records nothing, used when profiling is disabled"""
+
+    @property
+    def enabled(self):
+        """True if events are recorded"""
+        return False
+
+    def span(self, name, category='callback'):
+        """Returns a context manager which does nothing"""
+        # pylint: disable=unused-argument
+        return NULL_SPAN
+
+    def wrap(self, name, func, category='callback'):
+        """Returns func as it is"""
+        # pylint: disable=unused-argument
+        return func
+
+    def scheduled(self, name, delay_ms, func):
+        """Returns func as it is"""
+        # pylint: disable=unused-argument
+        return func
+
+    def counter(self, name, values):
+        """Does nothing"""
+        pass
+
+    def instant(self, name, args=None):
+        """Does nothing"""
+        pass
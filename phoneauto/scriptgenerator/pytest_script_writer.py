@@ -8,10 +8,16 @@
 from __future__ import unicode_literals
 
 
+def _instance_name(device_index):
+    """Name of the device instance in the script"""
+    return '_s.devices[{0}]'.format(device_index)
+
+
 class PytestScriptWriter(object):
     """Automation script writer which uses pytest as tests runner"""
 
-    def __init__(self, file_obj, devices):
+    def __init__(self, file_obj, devices, buffered=False,
+                 checkpoint_lines=50, optimizer=None):
         """Initialization
 
         Args:
@@ -20,9 +26,73 @@ class PytestScriptWriter(object):
                 an automation script is written
             devices (iterable):
                 An iterable object which contains device object instances.
+            buffered (bool):
+                If True, recorded lines are kept in memory and written
+                in batches of checkpoint_lines lines. Each batch is
+                followed by file_obj.checkpoint() if file_obj has it
+                (e.g. AtomicFile). finish() writes the rest and calls
+                file_obj.commit() if file_obj has it.
+                If False, each recorded line is written immediately.
+            checkpoint_lines (integer):
+                Number of lines written at once in buffered mode
+            optimizer (object):
+                ScriptOptimizer which rewrites each batch of recorded
+                actions before they are rendered and written.
+                Statements recorded without an action are written as is.
+                Implies buffered.
         """
         self.file = file_obj
         self.devices = devices
+        self._buffered = buffered or optimizer is not None
+        self._checkpoint_lines = checkpoint_lines
+        self._optimizer = optimizer
+        self._pending = []
+        self._actions = []
+
+    def _write(self, text):
+        """Writes text, or keeps it until the next checkpoint
+        in buffered mode"""
+        if self._actions:
+            self._optimize_actions()
+        if not self._buffered:
+            self.file.write(text)
+            return
+        self._pending.append(text)
+        if len(self._pending) >= self._checkpoint_lines:
+            self.checkpoint()
+
+    def _record(self, statement, end, action):
+        """Writes a recorded statement, or keeps its action until
+        the next checkpoint to optimize"""
+        if self._optimizer is None or action is None or end != '\n':
+            self._write('    {0}{1}'.format(statement, end))
+            return
+        self._actions.append(action)
+        if len(self._actions) >= self._checkpoint_lines:
+            self.checkpoint()
+
+    def _optimize_actions(self):
+        """Optimizes and renders kept actions,
+        and moves them to pending lines"""
+        statements = self._optimizer.process(self._actions)
+        self._actions = []
+        self._pending.extend(
+            '    {0}\n'.format(code.format(
+                instance=_instance_name(device_index)))
+            for device_index, code in statements)
+
+    def checkpoint(self):
+        """Writes pending lines and makes them durable if possible"""
+        if self._actions:
+            self._optimize_actions()
+        if self._pending:
+            self.file.write(''.join(self._pending))
+            del self._pending[:]
+        checkpoint = getattr(self.file, 'checkpoint', None)
+        if checkpoint is not None:
+            checkpoint()
+        else:
+            self.file.flush()
 
     def start(self):
         """Writes beginning part of the script
@@ -93,18 +163,33 @@ class PytestScriptWriter(object):
             'def test_run(_s):',
             ''))
 
-        self.file.write('\n'.join(lines))
+        self._write('\n'.join(lines))
 
     def finish(self):
-        """Writes ending part of the script"""
-        self.file.write('\n')
+        """Writes ending part of the script
+
+        In buffered mode, pending lines are written and the file is
+        committed if it supports commit (e.g. AtomicFile).
+        """
+        self._write('\n')
+        if not self._buffered:
+            self.file.flush()
+            return
+        self.checkpoint()
+        commit = getattr(self.file, 'commit', None)
+        if commit is not None:
+            commit()
 
     def get_recorder(self, device_index=0):
         """Returns recorder function"""
 
-        def recorder(written_text_template, end='\n'):
-            """Creates string from given template string and record it"""
-            instance_name = '_s.devices[{0}]'.format(device_index)
-            text = written_text_template.format(instance=instance_name)
-            self.file.write('    {0}{1}'.format(text, end))
+        def recorder(written_text_template, end='\n', action=None):
+            """Creates string from given template string and record it
+
+            action is the Action which the template is rendered from,
+            which is optimized instead if the writer has an optimizer.
+            """
+            text = written_text_template.format(
+                instance=_instance_name(device_index))
+            self._record(text, end, action)
         return recorder
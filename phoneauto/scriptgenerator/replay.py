@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""Replay engine which executes recorded actions directly on devices
+
+Actions in an ActionLog (see action_ir.py) are executed through
+UiautomatorDevice without generating and running a script:
+
+- Locators are pre-resolved before replay starts, so that a UI object
+  is selected by its instance index without counting matching objects.
+- Waits around each step are decided by a wait policy of
+  phoneauto.helpers.wait_policy (FixedWaitPolicy by default).
+- With pipelining, waits between consecutive blind steps
+  (key presses which do not depend on the screen) are skipped.
+- Latency of each step is measured and reported.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import logging
+import os
+import time
+
+from phoneauto.helpers.wait_policy import FixedWaitPolicy
+from .uiobjectfinder import UiObjectLocator
+
+# Operations of which device method name differs from the op name
+_DEVICE_METHODS = {'screenshot': None}
+
+# Operations which do their own waiting
+_WAIT_OPS = frozenset(['wait', 'wait_object'])
+
+# Operations which do not depend on what is on the screen
+_BLIND_OPS = frozenset(['press_key'])
+
+
+class PreresolvedLocator(UiObjectLocator):
+    """Locator of which uiautomator selector is built beforehand
+
+    UiautomatorDevice selects the UI object with instance index
+    given in the selector, instead of counting matching objects
+    and indexing them.
+    """
+
+    def __init__(self, filters, index=None, relation=None):
+        """Initialization, see UiObjectLocator"""
+        super(PreresolvedLocator, self).__init__(filters, index, relation)
+        self._selector_kwargs = None
+        if relation is None:
+            self._selector_kwargs = dict(filters)
+            if index:
+                self._selector_kwargs['instance'] = index
+
+    @property
+    def selector_kwargs(self):
+        """Keyword arguments to uiautomator.Device.__call__,
+        None for child and sibling locators which are selected
+        in relation to their anchors"""
+        return self._selector_kwargs
+
+
+def _preresolve(value):
+    """Replaces locators in action arguments with PreresolvedLocator"""
+    if isinstance(value, UiObjectLocator):
+        return PreresolvedLocator(
+            value.filters, value.index, value.relation)
+    return value
+
+
+class _Step(object):
+    """Action prepared for replay"""
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('number', 'op', 'method_name', 'kwargs',
+                 'device_index', 'blind')
+
+    def __init__(self, number, action):
+        """Initialization"""
+        self.number = number
+        self.op = action.op
+        self.method_name = _DEVICE_METHODS.get(action.op, action.op)
+        self.kwargs = dict(
+            (k, _preresolve(v)) for k, v in action.args.items())
+        self.device_index = action.device_index
+        self.blind = action.op in _BLIND_OPS
+
+
+class StepResult(object):
+    """Result of a replayed step"""
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('number', 'op', 'elapsed_ms', 'error', 'skipped')
+
+    def __init__(self, number, op, elapsed_ms, error=None, skipped=False):
+        """Initialization
+
+        Args:
+            number (integer): step number starting from 1
+            op (text): operation name
+            elapsed_ms (float): elapsed time including waits
+            error (Exception): error raised by the step if any
+            skipped (bool): True if the step was not executed
+        """
+        self.number = number
+        self.op = op
+        self.elapsed_ms = elapsed_ms
+        self.error = error
+        self.skipped = skipped
+
+
+class ReplayReport(object):
+    """Results of replayed steps"""
+
+    def __init__(self, steps, total_ms):
+        """Initialization
+
+        Args:
+            steps (list): StepResult objects
+            total_ms (float): elapsed time of the whole replay
+        """
+        self.steps = steps
+        self.total_ms = total_ms
+
+    @property
+    def failed(self):
+        """Steps which raised an error"""
+        return [s for s in self.steps if s.error is not None]
+
+    @property
+    def succeeded(self):
+        """True if no step failed"""
+        return not self.failed
+
+    def format(self):
+        """Returns human readable text of the report"""
+        lines = ['{0:>4}  {1:<24} {2:>10}'.format('step', 'op', 'ms')]
+        for step in self.steps:
+            status = ('skipped' if step.skipped else
+                      'FAILED: {0!r}'.format(step.error) if step.error else '')
+            lines.append('{0:>4}  {1:<24} {2:>10.1f}  {3}'.format(
+                step.number, step.op, step.elapsed_ms, status).rstrip())
+        lines.append('{0} steps, {1} failed, {2:.1f} ms'.format(
+            len(self.steps), len(self.failed), self.total_ms))
+        return '\n'.join(lines)
+
+
+class _DeviceWait(object):
+    """Adapter which gives a wait policy uiautomator's wait interface
+    on top of UiautomatorDevice.wait"""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, device):
+        """Initialization"""
+        self._device = device
+
+    def idle(self, timeout=None):
+        """wait.idle"""
+        return self._device.wait('idle', timeout)
+
+    def update(self, timeout=None):
+        """wait.update"""
+        return self._device.wait('update', timeout)
+
+
+class ReplayEngine(object):
+    """Executes recorded actions on devices"""
+
+    def __init__(self,
+                 devices,
+                 wait_policy=None,
+                 pipeline=False,
+                 screenshot_dir=None,
+                 clock=time.time):
+        """Initialization
+
+        Args:
+            devices (list): UiautomatorDevice objects
+            wait_policy (object):
+                Wait policy such as AdaptiveWaitPolicy, which decides
+                waits before and after each step.
+                FixedWaitPolicy is used if None.
+            pipeline (bool):
+                Skips waits between consecutive blind steps if True
+            screenshot_dir (text):
+                Directory to which screenshots recorded in the actions
+                are saved. Screenshot steps are skipped if None.
+            clock (callable): returns current time in seconds
+        """
+        self._devices = devices
+        self._waits = [_DeviceWait(d) for d in devices]
+        self._wait_policy = wait_policy or FixedWaitPolicy()
+        self._pipeline = pipeline
+        self._screenshot_dir = screenshot_dir
+        self._clock = clock
+
+    @property
+    def wait_policy(self):
+        """Wait policy in use"""
+        return self._wait_policy
+
+    @staticmethod
+    def prepare(actions):
+        """Prepares actions for replay, pre-resolving their locators
+
+        Args:
+            actions (iterable): Action objects
+        Returns:
+            list: prepared steps
+        """
+        return [_Step(i, a) for i, a in enumerate(actions, 1)]
+
+    def run(self, actions, stop_on_error=True):
+        """Replays actions
+
+        All the actions are prepared before the first step is executed.
+
+        Args:
+            actions (iterable): Action objects such as an ActionLog
+            stop_on_error (bool):
+                Stops at the first failed step if True.
+                Otherwise continues with the next step.
+        Returns:
+            ReplayReport: result of each step
+        """
+        steps = self.prepare(actions)
+        logger = logging.getLogger(__name__)
+        clock = self._clock
+        results = []
+        start = clock()
+        prev_step = None
+        for i, step in enumerate(steps):
+            next_step = steps[i + 1] if i + 1 < len(steps) else None
+            step_start = clock()
+            error = None
+            skipped = False
+            try:
+                skipped = not self._execute(step, prev_step, next_step)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning('step %s: %s failed: %r',
+                               step.number, step.op, exc)
+                error = exc
+            results.append(StepResult(
+                step.number, step.op, (clock() - step_start) * 1000.0,
+                error, skipped))
+            if error is not None and stop_on_error:
+                break
+            # The wait after a failed step has not been done
+            prev_step = step if error is None else None
+        return ReplayReport(results, (clock() - start) * 1000.0)
+
+    def _pipelined(self, step, other):
+        """Checks if the wait between two steps can be skipped"""
+        return (self._pipeline and other is not None and
+                step.blind and other.blind and
+                step.device_index == other.device_index)
+
+    def _execute(self, step, prev_step, next_step):
+        """Executes a step with waits around it
+
+        Returns:
+            bool: False if the step was skipped
+        """
+        device = self._devices[step.device_index]
+        if step.op in _WAIT_OPS:
+            getattr(device, step.method_name)(**step.kwargs)
+            return True
+        if step.method_name is None:
+            return self._save_screenshot(device, step)
+
+        wait = self._waits[step.device_index]
+        if not self._pipelined(step, prev_step):
+            self._wait_policy.pre_exec(wait, step.op)
+        getattr(device, step.method_name)(**step.kwargs)
+        if not self._pipelined(step, next_step):
+            self._wait_policy.post_exec(wait, step.op)
+        return True
+
+    def _save_screenshot(self, device, step):
+        """Saves a screenshot if screenshot_dir is given
+
+        Returns:
+            bool: False if the step was skipped
+        """
+        if self._screenshot_dir is None:
+            return False
+        file_path = os.path.join(
+            self._screenshot_dir, 'step_{0:04}.png'.format(step.number))
+        device.get_screenshot_as_file(file_path)
+        return True
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 """screenrecord thread
 
+Frames are read from a stream source:
+
+- AdbStreamSource: screen of the device (adb screenrecord | ffmpeg)
+- FileStreamSource: recorded video file replayed by ffmpeg
+- SyntheticStreamSource: generated pattern, needs neither adb nor ffmpeg
+
 :copyright: (c) 2016 by tksn
 :license: MIT
 """
@@ -8,6 +14,7 @@
 from distutils.spawn import find_executable
 import io
 import logging
+import os
 from queue import Queue
 import subprocess
 from subprocess import Popen, PIPE
@@ -15,6 +22,8 @@ from threading import Thread
 import time
 from PIL import Image
 
+from phoneauto.scriptgenerator.profiler import NullProfiler
+
 
 def check_prerequisites():
     if not find_executable('ffmpeg'):
@@ -34,9 +43,9 @@ _FFMPEG_COMMAND = [_FFMPEG_EXE,
                    '-']
 
 
-def get_adb_command(width, height):
+def get_adb_command(width, height, adb_exe=_ADB_EXE):
     return [
-        _ADB_EXE,
+        adb_exe,
         'exec-out',
         'screenrecord',
         '--output-format=h264',
@@ -44,22 +53,188 @@ def get_adb_command(width, height):
         '-']
 
 
-def get_adb_keysend_command(keycode_str):
+def decode_frame(frame_data, size):
+    return Image.frombytes(mode='RGB', size=size, data=frame_data)
+
+
+def get_adb_keysend_command(keycode_str, adb_exe=_ADB_EXE):
     return [
-        _ADB_EXE,
+        adb_exe,
         'shell',
         'input',
         'keyevent',
         keycode_str]
 
 
+class AdbStreamSource(object):
+    """Screen of the device, recorded by adb screenrecord
+    and decoded by ffmpeg"""
+
+    def __init__(self, adb_exe=_ADB_EXE):
+        self.__adb_exe = adb_exe
+        self.__procs = {}
+
+    def screencap(self):
+        command = [self.__adb_exe, 'exec-out', 'screencap', '-p']
+        png_data, _ = Popen(command, stdout=PIPE).communicate()
+        return png_data
+
+    def open(self, width, height, buf_size):
+        procs = self.__procs
+        procs['adb'] = Popen(
+            get_adb_command(width, height, self.__adb_exe),
+            stdout=PIPE, bufsize=buf_size)
+        procs['ffmpeg'] = Popen(
+            _FFMPEG_COMMAND,
+            stdin=procs['adb'].stdout,
+            stdout=PIPE, bufsize=buf_size)
+        return procs['ffmpeg'].stdout
+
+    def close(self):
+        for name in ('adb', 'ffmpeg'):
+            self.__procs[name].kill()
+            self.__procs[name].communicate()
+        self.__procs.clear()
+
+    def kick(self):
+        for i in range(3):
+            subprocess.call(get_adb_keysend_command(
+                'KEYCODE_APP_SWITCH', self.__adb_exe))
+            time.sleep(0.5)
+            subprocess.call(get_adb_keysend_command(
+                'KEYCODE_APP_SWITCH', self.__adb_exe))
+            time.sleep(0.5)
+
+
+class FileStreamSource(object):
+    """Video file such as a recorded h264 stream, decoded by ffmpeg
+
+    The file is read at its native frame rate (ffmpeg -re) and looped,
+    as if it were being recorded from a device.
+    """
+
+    def __init__(self, path, fps=None, loop=True, realtime=True):
+        self.__path = path
+        self.__fps = fps
+        self.__loop = loop
+        self.__realtime = realtime
+        self.__proc = None
+
+    def get_command(self, width, height):
+        command = [_FFMPEG_EXE]
+        if self.__realtime:
+            command.append('-re')
+        if self.__loop:
+            command.extend(['-stream_loop', '-1'])
+        command.extend(['-i', self.__path])
+        filters = ['scale={0}:{1}'.format(width, height)]
+        if self.__fps:
+            filters.insert(0, 'fps={0}'.format(self.__fps))
+        command.extend(['-vf', ','.join(filters)])
+        # Output options are the same as the device stream's
+        return command + _FFMPEG_COMMAND[3:]
+
+    def screencap(self):
+        command = [_FFMPEG_EXE, '-i', self.__path, '-frames:v', '1',
+                   '-f', 'image2pipe', '-vcodec', 'png', '-']
+        png_data, _ = Popen(command, stdout=PIPE).communicate()
+        return png_data
+
+    def open(self, width, height, buf_size):
+        self.__proc = Popen(
+            self.get_command(width, height), stdout=PIPE, bufsize=buf_size)
+        return self.__proc.stdout
+
+    def close(self):
+        self.__proc.kill()
+        self.__proc.communicate()
+        self.__proc = None
+
+    def kick(self):
+        pass
+
+
+class SyntheticStreamSource(object):
+    """Raw frames of a moving bar pattern
+
+    Frames are written to a pipe at the given frame rate,
+    or as fast as they are read if fps is None.
+    """
+
+    def __init__(self, fps=30, screen_size=(1080, 1920), num_patterns=30):
+        self.__fps = fps
+        self.__screen_size = screen_size
+        self.__num_patterns = num_patterns
+        self.__alive = False
+        self.__stream = None
+        self.__thread = None
+
+    def screencap(self):
+        out = io.BytesIO()
+        Image.new('RGB', self.__screen_size).save(out, format='PNG')
+        return out.getvalue()
+
+    def get_patterns(self, width, height):
+        bar_height = max(1, height // self.__num_patterns)
+        patterns = []
+        for i in range(self.__num_patterns):
+            image = Image.new('RGB', (width, height), (32, 32, 32))
+            image.paste((255, 255, 255),
+                        (0, i * bar_height, width, (i + 1) * bar_height))
+            patterns.append(image.tobytes())
+        return patterns
+
+    def open(self, width, height, buf_size):
+        read_fd, write_fd = os.pipe()
+        self.__stream = io.open(read_fd, 'rb', buffering=buf_size)
+        self.__alive = True
+        self.__thread = Thread(
+            target=self.__write,
+            args=(io.open(write_fd, 'wb', buffering=0),
+                  self.get_patterns(width, height)),
+            name='synthetic_stream')
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self.__stream
+
+    def __write(self, out, patterns):
+        interval = 1.0 / self.__fps if self.__fps else 0.0
+        due = time.time()
+        count = 0
+        try:
+            with out:
+                while self.__alive:
+                    out.write(patterns[count % len(patterns)])
+                    count += 1
+                    if interval:
+                        due += interval
+                        delay = due - time.time()
+                        if delay > 0:
+                            time.sleep(delay)
+        except (IOError, OSError):
+            # The reading end has been closed
+            pass
+
+    def close(self):
+        self.__alive = False
+        self.__stream.close()
+        self.__thread.join()
+        self.__stream = None
+        self.__thread = None
+
+    def kick(self):
+        pass
+
+
 class Screenrecord(Thread):
 
-    def __init__(self, width=540, height=960):
-        super(Screenrecord, self).__init__()
+    def __init__(self, width=540, height=960, profiler=None, source=None):
+        super(Screenrecord, self).__init__(name='screenrecord')
         self.__alive = True
         self.__queue = Queue()
         self.__size = (width, height)
+        self.__profiler = profiler or NullProfiler()
+        self.__source = source or AdbStreamSource()
         self.__orig_size = self._get_screencap()[1]
 
     @property
@@ -80,14 +255,7 @@ class Screenrecord(Thread):
             self.height / self.__orig_size[1])
 
     def _get_screencap(self):
-        command = [
-            _ADB_EXE,
-            'exec-out',
-            'screencap',
-            '-p']
-        buf_size = self.width * self.height * _NUM_COMPONENT
-        adb_proc = Popen(command, stdout=PIPE)
-        png_data, _ = adb_proc.communicate()
+        png_data = self.__source.screencap()
         orig_image = Image.open(io.BytesIO(png_data))
         resized_image = orig_image.resize(self.__size)
         return (resized_image, orig_image.size)
@@ -101,48 +269,42 @@ class Screenrecord(Thread):
         frame_size = self.width * self.height * _NUM_COMPONENT
         buf_size = frame_size * 4
 
-        procs = {}
+        source = self.__source
+        streams = {}
 
         def start_video():
             logger.info('starting video processes')
-            procs['adb'] = Popen(
-                get_adb_command(self.width, self.height),
-                stdout=PIPE, bufsize=buf_size)
-            procs['ffmpeg'] = Popen(
-                _FFMPEG_COMMAND,
-                stdin=procs['adb'].stdout,
-                stdout=PIPE, bufsize=buf_size)
+            streams['video'] = source.open(self.width, self.height, buf_size)
             logger.info('video processes started')
 
         def stop_video():
             logger.info('stopping video processes')
-            procs['adb'].kill()
-            procs['adb'].communicate()
-            procs['ffmpeg'].kill()
-            procs['ffmpeg'].communicate()
-            procs.clear()
+            source.close()
+            streams.clear()
             logger.info('video processes stopped')
 
+        profiler = self.__profiler
         start_video()
         while self.__alive:
-            frame_data = procs['ffmpeg'].stdout.read(frame_size)
+            with profiler.span('screenrecord.read', 'screenrecord'):
+                frame_data = streams['video'].read(frame_size)
             if len(frame_data) == frame_size:
-                frame = Image.frombytes(mode='RGB',
-                                        size=self.__size,
-                                        data=frame_data)
+                with profiler.span('screenrecord.decode', 'screenrecord'):
+                    frame = decode_frame(frame_data, self.__size)
+                # Queued time, from which the consumer knows the latency
+                frame.info['time'] = time.time()
                 self.__queue.put(frame)
+                profiler.counter(
+                    'screenrecord_queue', {'depth': self.__queue.qsize()})
             else:
+                profiler.instant('screenrecord.restart')
                 stop_video()
                 start_video()
         stop_video()
         logger.info('thread stop')
 
     def kick(self):
-        for i in range(3):
-            subprocess.call(get_adb_keysend_command('KEYCODE_APP_SWITCH'))
-            time.sleep(0.5)
-            subprocess.call(get_adb_keysend_command('KEYCODE_APP_SWITCH'))
-            time.sleep(0.5)
+        self.__source.kick()
 
     def join(self, timeout=None):
         self.__alive = False
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""Optimizer of recorded actions
+
+Recording produces redundant sequences, such as a press per character
+when text is entered to the screen, and repeated selector
+constructions. ScriptOptimizer rewrites a batch of recorded actions
+(see action_ir) into equivalent faster ones before they are rendered:
+
+    press_key(key_name='h')
+    press_key(key_name='e')                    input_text(text='hey')
+    press_key(key_name='y')              -->
+    wait(for_what='idle', timeout=100)         wait(for_what='idle',
+    wait(for_what='idle', timeout=500)              timeout=500)
+
+Selectors used more than once are assigned to local variables
+when the actions are rendered.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+
+from . import keycode
+from .action_ir import Action, CodeRenderer
+
+# Operations of which repeated identical actions are clicks
+_CLICK_OPS = frozenset(['click_object', 'click_xy'])
+
+# Characters which are typed by press but not by input_text
+_UNTYPABLE_CHARS = frozenset('%\t\n')
+
+
+def _typed_char(action):
+    """Returns the character if the action presses a key
+    which types a character, otherwise None"""
+    if action.op != 'press_key':
+        return None
+    char = keycode.key_to_char_us(
+        action.args['key_name'], action.args.get('meta'))
+    if char is None or char in _UNTYPABLE_CHARS:
+        return None
+    return char
+
+
+def _is_idle_wait(action):
+    """Checks if the action waits for the device to be idle"""
+    return action.op == 'wait' and action.args['for_what'] == 'idle'
+
+
+class ScriptOptimizer(object):
+    """Rewrites recorded actions into equivalent faster ones
+
+    Hoisted selectors are remembered across batches, because all the
+    statements belong to the same test function. Hoisting a selector
+    means DeviceWrapper.__call__ runs once, so wait policies which
+    depend on its invalidate() (AdaptiveWaitPolicy) should not be used
+    with hoist_selectors.
+    """
+
+    def __init__(self,
+                 coder,
+                 merge_keys=True,
+                 collapse_waits=True,
+                 hoist_selectors=True,
+                 dedupe_clicks=False,
+                 min_key_run=2):
+        """Initialization
+
+        Args:
+            coder (object): Coder which renders optimized actions
+            merge_keys (bool):
+                Merges runs of key presses typing characters
+                into a single input_text
+            collapse_waits (bool):
+                Collapses consecutive idle waits into one
+                with the longest timeout
+            hoist_selectors (bool):
+                Assigns selectors used more than once to local variables.
+                Selectors are rendered by coder's get_code_selector,
+                they are not hoisted if the coder does not have it.
+            dedupe_clicks (bool):
+                Removes a click identical to the preceding action.
+                Off by default because double clicks may be intended.
+            min_key_run (integer):
+                Minimum number of presses which are merged
+        """
+        self._renderer = CodeRenderer(coder)
+        self._get_code_selector = (
+            getattr(coder, 'get_code_selector', None)
+            if hoist_selectors else None)
+        self._merge_keys = merge_keys
+        self._collapse_waits = collapse_waits
+        self._dedupe_clicks = dedupe_clicks
+        self._min_key_run = min_key_run
+        # (device index, selector code) -> variable name
+        self._selector_names = {}
+
+    def process(self, actions):
+        """Optimizes and renders a batch of actions
+
+        Args:
+            actions (list): Action objects in recorded order
+        Returns:
+            list: (device index, code fragment) pairs, see render
+        """
+        return self.render(self.optimize(actions))
+
+    def optimize(self, actions):
+        """Optimizes a batch of actions
+
+        Args:
+            actions (list): Action objects in recorded order
+        Returns:
+            list: optimized Action objects
+        """
+        if self._merge_keys:
+            actions = self._merge_key_runs(actions)
+        if self._collapse_waits:
+            actions = self._collapse_wait_runs(actions)
+        if self._dedupe_clicks:
+            actions = self._remove_duplicate_clicks(actions)
+        return actions
+
+    def render(self, actions):
+        """Renders actions, assigning selectors used more than once
+        to local variables if hoist_selectors is enabled
+
+        Args:
+            actions (list): Action objects
+        Returns:
+            list: (device index, code fragment) pairs. Device instance
+                in code fragments is the placeholder {instance}.
+        """
+        rendered = [(action, self._renderer.render(action))
+                    for action in actions]
+        selectors = [self._hoistable_selector(action, code)
+                     for action, code in rendered]
+        counts = {}
+        for selector in selectors:
+            if selector is not None:
+                counts[selector] = counts.get(selector, 0) + 1
+
+        result = []
+        for (action, code), selector in zip(rendered, selectors):
+            device_index = action.device_index
+            if selector is None:
+                result.append((device_index, code))
+                continue
+            name = self._selector_names.get(selector)
+            if name is None:
+                if counts[selector] < 2:
+                    result.append((device_index, code))
+                    continue
+                name = 'sel_{0}'.format(len(self._selector_names))
+                self._selector_names[selector] = name
+                result.append(
+                    (device_index, '{0} = {1}'.format(name, selector[1])))
+            result.append((device_index, name + code[len(selector[1]):]))
+        return result
+
+    def _hoistable_selector(self, action, code):
+        """Returns (device index, selector code) of the action
+        if its selector can be assigned to a variable, otherwise None"""
+        locator = action.args.get('locator')
+        if self._get_code_selector is None or locator is None:
+            return None
+        if locator.index is not None:
+            # Indexing a selector looks the object up on the screen,
+            # of which result is stale after the screen changes
+            return None
+        selector = self._get_code_selector(locator)
+        if not code.startswith(selector + '.'):
+            return None
+        return action.device_index, selector
+
+    def _merge_key_runs(self, actions):
+        """Merges runs of key presses into input_text"""
+        result = []
+        run = []
+
+        def flush_run():
+            """Emits the current run"""
+            if len(run) >= self._min_key_run:
+                result.append(Action(
+                    'input_text', {'text': ''.join(c for _, c in run)},
+                    run[0][0].device_index))
+            else:
+                result.extend(action for action, _ in run)
+            del run[:]
+
+        for action in actions:
+            char = _typed_char(action)
+            if char is None or (
+                    run and action.device_index != run[0][0].device_index):
+                flush_run()
+            if char is None:
+                result.append(action)
+            else:
+                run.append((action, char))
+        flush_run()
+        return result
+
+    @staticmethod
+    def _collapse_wait_runs(actions):
+        """Collapses consecutive idle waits of the same device
+
+        Only idle waits are collapsed. Each wait.update waits for
+        another window update, thus consecutive ones are not redundant.
+        """
+        result = []
+        last_wait = None
+        for action in actions:
+            if not _is_idle_wait(action):
+                last_wait = None
+                result.append(action)
+                continue
+            timeout = action.args['timeout']
+            if (last_wait is not None and
+                    last_wait.device_index == action.device_index):
+                last_timeout = last_wait.args['timeout']
+                if last_timeout is None or timeout is None:
+                    # uiautomator's default timeout is not known here
+                    if last_timeout == timeout:
+                        continue
+                elif timeout <= last_timeout:
+                    continue
+                else:
+                    result.pop()
+            last_wait = action
+            result.append(action)
+        return result
+
+    @staticmethod
+    def _remove_duplicate_clicks(actions):
+        """Removes clicks identical to the preceding action"""
+        result = []
+        for action in actions:
+            if (result and action.op in _CLICK_OPS and
+                    action == result[-1]):
+                continue
+            result.append(action)
+        return result
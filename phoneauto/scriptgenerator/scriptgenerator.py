@@ -7,6 +7,7 @@
 # pylint: disable=invalid-name
 
 from __future__ import unicode_literals
+import operator
 import os
 import tempfile
 import time
@@ -17,6 +18,10 @@ from PIL import Image
 from . import view_hierarchy_dump
 from . import uiobjectfinder
 from . import keycode
+from . import session_store
+from .locator_stability import LocatorStabilityScorer
+from .action_ir import Action, CodeRenderer
+from .instrumentation import NullInstrumentation
 from phoneauto.scriptgenerator.exception import UiObjectNotFound
 
 
@@ -44,6 +49,28 @@ def command(name):
     return command_decorator
 
 
+class _Kwarg(object):
+    """Keyword argument which is copied from the command arguments"""
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('name', 'to_name', 'default')
+
+    def __init__(self, name, to_name, default):
+        """Initialization, see _kwarg"""
+        self.name = name
+        self.to_name = to_name
+        self.default = default
+
+    def __call__(self, _, command_kwargs):
+        """Extract keyword arguments from command args"""
+        return [(self.to_name, command_kwargs.get(self.name, self.default))]
+
+
+def get_command_names():
+    """Returns names of all registered commands"""
+    return frozenset(_command_table)
+
+
 def _kwarg(name, to_name=None, default=None):
     """Keyword argument object generator
 
@@ -67,26 +94,24 @@ def _kwarg(name, to_name=None, default=None):
     Returns:
         object: keyword argument object
     """
-    to_name = to_name or name
-
-    def transform(_, command_kwargs):
-        """Extract keyword arguments from command args"""
-        return [(to_name, command_kwargs.get(name, default))]
-    return transform
+    return _Kwarg(name, to_name or name, default)
 
 
 def _locator(criteria,
              coord_kwname='start',
              ignore_distant=True,
-             to_name=None):
+             to_name=None,
+             relational=True):
     """Generate locator extractor"""
     to_name = to_name or 'locator'
 
     def transform(objs, command_kwargs):
         """Extract locator from command args"""
         coord = command_kwargs[coord_kwname]
-        locator = objs.finder.find_object_contains(
-            coord=coord, ignore_distant=ignore_distant, **criteria)
+        with objs.span('finder'):
+            locator = objs.finder.find_object_contains(
+                coord=coord, ignore_distant=ignore_distant,
+                relational=relational, **criteria)
         return [(to_name, locator)]
     return transform
 
@@ -108,7 +133,8 @@ def _create_command(command_name,
             Defaults to command_name if None.
         device_code_method_name (string):
             Name of the coder object's method to call.
-            Defaults to device_method_name if None.
+            Defaults to 'get_code_' + device_method_name if None.
+            The recorded action's op is this name without 'get_code_'.
     Returns:
         command function object.
     """
@@ -116,17 +142,42 @@ def _create_command(command_name,
     device_code_method_name = (
         device_code_method_name or 'get_code_' + device_method_name)
 
+    # Call plan, compiled once here rather than on each execution.
+    # Plain keyword arguments are copied in a loop without calls,
+    # only the other transforms (locators, etc) are called.
+    copied_kwargs = tuple(
+        (k.name, k.to_name, k.default)
+        for k in kwarg_list if isinstance(k, _Kwarg))
+    transforms = tuple(k for k in kwarg_list if not isinstance(k, _Kwarg))
+    code_op = device_code_method_name[len('get_code_'):]
+    get_device_method = operator.attrgetter(device_method_name)
+
+    def build_kwargs(objs, command_kwargs):
+        """Builds keyword arguments for the coder and device methods"""
+        method_kwargs = {}
+        for name, to_name, default in copied_kwargs:
+            method_kwargs[to_name] = command_kwargs.get(name, default)
+        for transform in transforms:
+            method_kwargs.update(transform(objs, command_kwargs))
+        return method_kwargs
+
     @command(command_name)
-    def command_func(objs, **command_kwargs):
+    def command_func(objs, command_kwargs):
         """Generic command implementation"""
-        method_kwargs = {}
-        for kwarg_produce in kwarg_list:
-            kwarg = kwarg_produce(objs, command_kwargs)
-            method_kwargs.update(dict(kwarg))
-        coder_method = getattr(objs.coder, device_code_method_name)
-        objs.record(coder_method(**method_kwargs))
-        device_method = getattr(objs.device, device_method_name)
-        return device_method(**method_kwargs)
+        if not objs.instrumentation.enabled:
+            method_kwargs = build_kwargs(objs, command_kwargs)
+            objs.record(Action(code_op, method_kwargs, objs.device_index))
+            return get_device_method(objs.device)(**method_kwargs)
+
+        with objs.span('kwargs'):
+            method_kwargs = build_kwargs(objs, command_kwargs)
+            action = Action(code_op, method_kwargs, objs.device_index)
+        with objs.span('coder'):
+            code = objs.renderer.render(action)
+        with objs.span('record'):
+            objs.record(action, code)
+        with objs.span('device'):
+            return get_device_method(objs.device)(**method_kwargs)
     return command_func
 
 # ====================================================
@@ -135,18 +186,74 @@ def _create_command(command_name,
 
 
 @command('update_view_dump')
-def _update_view_dump(objs, **_):
+def _update_view_dump(objs, command_args):
     """Update hierarchy view dump
     Should be called whenever screen is updated.
+
+    If the session store is enabled, the dump is stored, together with
+    a thumbnail of the screen frame given as optional 'frame' argument.
     """
-    dump_str = objs.device.dump()
-    hierarchy_dump = view_hierarchy_dump.ViewHierarchyDump(
-        objs.device.info, dump_str)
+    with objs.span('device'):
+        dump_str = objs.device.dump()
+        device_info = objs.device.info
+    with objs.span('parse'):
+        hierarchy_dump = view_hierarchy_dump.ViewHierarchyDump(
+            device_info, dump_str)
+    with objs.span('stability'):
+        objs.stability.observe(hierarchy_dump)
+    if objs.warn_ambiguous:
+        # Built here rather than on the first click
+        with objs.span('fuzzy_index'):
+            hierarchy_dump.get_fuzzy_index()
+    objs.finder = uiobjectfinder.UiObjectFinder(
+        hierarchy_dump, stability=objs.stability,
+        warn_ambiguous=objs.warn_ambiguous)
+    if objs.session_store is not None:
+        stored = objs.session_store.add_dump(device_info, dump_str)
+        frame = command_args.get('frame')
+        if stored is not None and frame is not None:
+            objs.session_store.add_thumbnail(frame)
+
+
+@command('get_session_dumps')
+def _get_session_dumps(objs, _):
+    """Get dumps stored in the session store
+
+    Returns:
+        list: (record number, timestamp) of each stored dump,
+            or empty list if the session store is not enabled
+    """
+    if objs.session_store is None:
+        return []
+    return [(r.number, r.timestamp)
+            for r in objs.session_store.records(session_store.KIND_DUMP)]
+
+
+@command('restore_view_dump')
+def _restore_view_dump(objs, command_args):
+    """Restore a hierarchy view dump stored in the session store,
+    so that locators are picked on the past screen
+
+    'index' argument is the index in the stored dumps,
+    e.g. -2 means the dump before the latest one.
+
+    Returns:
+        float: timestamp when the dump was stored
+    """
+    if objs.session_store is None:
+        raise ValueError('Session store is not enabled')
+    record = objs.session_store.records(
+        session_store.KIND_DUMP)[command_args['index']]
+    with objs.span('parse'):
+        hierarchy_dump = objs.session_store.load_dump(record)
+    # The past dump is not observed, since it does not tell
+    # how locators survive screen updates from now on
     objs.finder = uiobjectfinder.UiObjectFinder(hierarchy_dump)
+    return record.timestamp
 
 
 @command('get_screenshot')
-def _get_screenshot(objs, **_):
+def _get_screenshot(objs, _):
     """Get screenshot
 
     Returns:
@@ -161,7 +268,7 @@ def _get_screenshot(objs, **_):
 
 
 @command('enter_text')
-def _send_keys(objs, **command_args):
+def _send_keys(objs, command_args):
     """Send keys to the screen or a target UI object"""
     coord = command_args['start']
     keys = command_args['text']
@@ -170,13 +277,16 @@ def _send_keys(objs, **command_args):
         loc = objs.finder.find_object_contains(
             coord, True, className='android.widget.EditText')
         objs.device.set_text(loc, keys)
-        objs.record(objs.coder.get_code_set_text(loc, keys))
+        objs.record(Action(
+            'set_text', {'locator': loc, 'text': keys}, objs.device_index))
     except uiobjectfinder.UiObjectNotFound:
         # If failed to set text to the target UI object,
         # send each character in text to the screen one by one
         for k in keycode.chars_to_keys_us(keys):
             objs.device.press_key(k[0], meta=k[1])
-            objs.record(objs.coder.get_code_press_key(k[0], meta=k[1]))
+            objs.record(Action(
+                'press_key', {'key_name': k[0], 'meta': k[1]},
+                objs.device_index))
 
 # -------------------------------
 # Commands which require locator
@@ -206,9 +316,11 @@ _create_command(command_name='drag_object_to_xy',
 _create_command(command_name='drag_object_to_object',
                 kwarg_list=(
                     _locator(_CRITERIA_CLICKABLE),
+                    # drag.to takes a plain selector
                     _locator(_CRITERIA_CLICKABLE,
                              coord_kwname='end',
-                             to_name='other_locator'),
+                             to_name='other_locator',
+                             relational=False),
                     _kwarg('options', default={})))
 
 
@@ -334,53 +446,114 @@ _create_command(command_name='set_orientation',
 
 
 @command('get_hierarchy_view_object_info')
-def _get_hierarchy_view_object_info(objs, **command_args):
+def _get_hierarchy_view_object_info(objs, command_args):
     """Get object's inforamtion such as text, contentDescription and boudns"""
     coord = command_args['start']
     options = command_args.get('options', {})
     try:
-        locator = objs.finder.find_object_contains(coord, True, **options)
+        with objs.span('finder'):
+            locator = objs.finder.find_object_contains(
+                coord, True, **options)
     except UiObjectNotFound:
         return None
     return locator.meta
 
 
+@command('get_hierarchy_view_objects')
+def _get_hierarchy_view_objects(objs, _):
+    """Get information of all objects in the hierarchy view,
+    in document order"""
+    return objs.finder.hierarchy_dump.find_objects()
+
+
 @command('get_screen_size')
-def _get_screen_size(objs, **_):
+def _get_screen_size(objs, _):
     """Get screen size"""
     device_info = objs.device.info
     return (device_info['displayWidth'], device_info['displayHeight'])
 
 
 @command('insert_screenshot_capture')
-def _insert_screenshot_capture(objs, **_):
+def _insert_screenshot_capture(objs, _):
     """Insert screenshot capture operation into script"""
     filename = ("datetime.today()"
                 ".strftime('screenshot_%Y%m%d_%H%M%S_%f.png')")
-    objs.record(objs.coder.get_code_screenshot(filename))
+    objs.record(Action('screenshot', {'file': filename}, objs.device_index))
 
 
 @command('insert_wait')
-def _insert_wait(objs, **command_args):
+def _insert_wait(objs, command_args):
     """Insert screen state wait operation into script"""
-    objs.record(objs.coder.get_code_wait(
-        command_args['for_what'], command_args['timeout']))
+    objs.record(Action('wait', {
+        'for_what': command_args['for_what'],
+        'timeout': command_args['timeout']}, objs.device_index))
 
 
 @command('insert_wait_object')
-def _insert_wait_object(objs, **command_args):
+def _insert_wait_object(objs, command_args):
     """Insert object state wait operation into script"""
     coord = command_args['start']
     options = command_args.get('options', {})
     locator = objs.finder.find_object_contains(coord, True, **options)
-    objs.record(objs.coder.get_code_wait_object(
-        locator, command_args['for_what'], command_args['timeout']))
+    objs.record(Action('wait_object', {
+        'locator': locator,
+        'for_what': command_args['for_what'],
+        'timeout': command_args['timeout']}, objs.device_index))
 
 
 # ------------------------------------
 # Generator class definition
 
 
+class _CommandContext(object):
+    """Objects which a command function works with
+
+    One context is kept per device and reused across executions.
+    """
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('device', 'device_index', 'renderer', 'recorder',
+                 'action_log', 'session_store', 'stability',
+                 'warn_ambiguous', 'finder', 'command_name',
+                 'instrumentation')
+
+    def __init__(self, device, device_index, renderer, recorder,
+                 action_log, session_store, stability, warn_ambiguous):
+        """Initialization"""
+        self.device = device
+        self.device_index = device_index
+        self.renderer = renderer
+        self.recorder = recorder
+        self.action_log = action_log
+        self.session_store = session_store
+        self.stability = stability
+        self.warn_ambiguous = warn_ambiguous
+        self.finder = None
+        self.command_name = None
+        self.instrumentation = None
+
+    def record(self, action, code=None):
+        """Records an action to the action log and the session store,
+        if any, and its code to the writer
+
+        Args:
+            action (object): Action
+            code (text): code fragment of the action if already rendered
+        """
+        if self.action_log is not None:
+            self.action_log.append(action)
+        if self.session_store is not None:
+            self.session_store.add_action(action)
+        if code is None:
+            code = self.renderer.render(action)
+        self.recorder(code, action=action)
+
+    def span(self, phase):
+        """Returns a context manager which measures a phase
+        of the command being executed"""
+        return self.instrumentation.span(self.command_name, phase)
+
+
 class ScriptGenerator(object):
     """Script generation controller"""
 
@@ -397,12 +570,30 @@ class ScriptGenerator(object):
                 an automation script.
                 'coder' is an object which is used to generate code fragment
                 which performs device manipulation.
+                Optional 'instrumentation' is an Instrumentation object
+                which measures latencies of command executions.
+                Optional 'action_log' is an ActionLog object
+                to which recorded actions are appended.
+                Optional 'session_store' is a SessionStore object
+                to which dumps, thumbnails and actions are appended.
+                Optional 'locator_history' is the number of recent dumps
+                over which stability of locators is scored, per device.
+                Optional 'warn_ambiguous_locators' enables warnings on
+                text and description locators similar to other objects'.
         """
         self.devices = conf['devices']
         self.coder = conf['coder']
         self.writer = conf['writer']
         # For test purpose, finder can be given by client.
         self.finder = conf.get('finder')
+        self.instrumentation = (
+            conf.get('instrumentation') or NullInstrumentation())
+        self.action_log = conf.get('action_log')
+        self.session_store = conf.get('session_store')
+        self._locator_history = conf.get('locator_history', 5)
+        self._warn_ambiguous = conf.get('warn_ambiguous_locators', False)
+        self._renderer = CodeRenderer(self.coder)
+        self._contexts = {}
 
     def execute(self, command_name, command_args=None, device_index=0):
         """Execute command
@@ -414,20 +605,23 @@ class ScriptGenerator(object):
             device_index (integer):
                 The index of a device object in devices iterable.
         """
-        command_args = command_args or {}
         command_function = _command_table.get(command_name)
-        command_args_copy = dict(command_args)
-
-        class _Container(object):
-
-            def __init__(c_self):
-                c_self.device = self.devices[device_index]
-                c_self.coder = self.coder
-                c_self.finder = self.finder
-                c_self.record = self.writer.get_recorder(device_index)
-
-        objs = _Container()
-        command_return_value = command_function(objs, **command_args_copy)
+        objs = self._contexts.get(device_index)
+        if objs is None:
+            objs = _CommandContext(
+                self.devices[device_index], device_index, self._renderer,
+                self.writer.get_recorder(device_index), self.action_log,
+                self.session_store,
+                LocatorStabilityScorer(self._locator_history),
+                self._warn_ambiguous)
+            self._contexts[device_index] = objs
+        objs.finder = self.finder
+        objs.command_name = command_name
+        objs.instrumentation = instrumentation = self.instrumentation
+
+        with instrumentation.span(command_name, 'total'):
+            command_return_value = command_function(
+                objs, command_args or {})
 
         # finder can be updated by commands.
         self.finder = objs.finder
@@ -19,8 +19,11 @@ from tkinter import ttk
 import time
 from PIL import Image, ImageTk, ImageDraw, ImageFont
 
+from phoneauto.scriptgenerator import hitmap
 from phoneauto.scriptgenerator.exception import (
     UiInconsitencyError, UiObjectNotFound)
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from phoneauto.scriptgenerator.profiler import NullProfiler
 from phoneauto.scriptgenerator.screenrecord import Screenrecord
 
 
@@ -57,25 +60,34 @@ class ScriptGeneratorUI(object):
     _HVIEW_REFRESH_INTERVAL_AFTER_SCR_REFRESH = 1
     _MOUSE_MOVE_THRESH = 20
     _CLICKCIRCLE_RADIUS = 5
+    _HOVER_INTERVAL = 30
+    _LATENCY_REFRESH_INTERVAL = 1
+    _LATENCY_PANEL_ROWS = 8
 
     def __init__(self,
                  screen_size=(480, 800),
                  platform_sys=None,
-                 timeouts=None):
+                 timeouts=None,
+                 profiler=None):
         """Initialization
 
         Args:
             scale (float):
                 magnification scale which is used when screenshot
                 is displayed in this UI
+            profiler (object):
+                Profiler which records callback durations,
+                event loop lag and queue depth. Nothing is recorded if None.
         """
         self.logger = logging.getLogger(__name__)
         self.logger.info('initialization start')
         self._controller = None
         self._scale = None
         self._screenshot = None
+        self._last_frame = None
         self._mouse_action = None
         self.hierarchy_view_timestamp = 0
+        self._latency_timestamp = 0
 
         timeouts = timeouts or {}
         self._wait_timeouts = {}
@@ -85,10 +97,18 @@ class ScriptGeneratorUI(object):
             self._wait_timeouts[name] = timeouts.get(name, default_value)
 
         self._hold_timer_id = None
+        self._hover_timer_id = None
+        self._hover_position = None
+        self._hover_coord = None
+        self._hover_info = None
+        self._hit_map = None
+        self._hit_map_generation = 0
         self._root = None
         self._platform = platform_sys or platform.system()
+        self._profiler = profiler or NullProfiler()
         self._screenrecord = Screenrecord(
-            width=screen_size[0], height=screen_size[1])
+            width=screen_size[0], height=screen_size[1],
+            profiler=profiler)
         self._build_ui()
         self.logger.info('initialization end')
 
@@ -226,11 +246,18 @@ class ScriptGeneratorUI(object):
         text = tkinter.Text(sidebar, width=30, name='infotext')
         text.pack(padx=3, pady=2)
 
+        label(sidebar, {'text': 'Latency p50/p95 (ms):'})
+        latency_text = tkinter.Text(
+            sidebar, width=30,
+            height=ScriptGeneratorUI._LATENCY_PANEL_ROWS,
+            name='latencytext')
+        latency_text.pack(padx=3, pady=2)
+
     def _enable_ui(self):
         """2nd phase initialization - activate UI"""
         self._bind_commands_to_widgets()
-        self._acquire_hierarchy_view()
         self._set_screen_scale()
+        self._acquire_hierarchy_view()
         self._screenrecord.start()
         self._kick_video_update()
         self._refresh_screen()
@@ -323,8 +350,14 @@ class ScriptGeneratorUI(object):
     def _refresh_screen(self):
         from tkinter import NW
         frame = None
+        if self._profiler.enabled:
+            self._profiler.counter(
+                'screenrecord_queue',
+                {'depth': self._screenrecord.queue.qsize()})
         while not self._screenrecord.queue.empty():
             frame = self._screenrecord.queue.get_nowait()
+        if frame:
+            self._last_frame = frame
 
         hierarchy_view_age = time.time() - self.hierarchy_view_timestamp
         if frame:
@@ -340,7 +373,30 @@ class ScriptGeneratorUI(object):
             self._screenshot = {'image': disp_frame, 'id': image_id}
 
         self._refresh_hierarchy_view(frame)
-        self._root.after(self._SCR_REFRESH_INTERVAL, self._refresh_screen)
+        self._refresh_latency_panel()
+        self._root.after(
+            self._SCR_REFRESH_INTERVAL,
+            self._profiler.scheduled(
+                'refresh_screen', self._SCR_REFRESH_INTERVAL,
+                self._refresh_screen))
+
+    def _refresh_latency_panel(self):
+        """Shows live command latencies measured by the controller"""
+        instrumentation = getattr(self._controller, 'instrumentation', None)
+        if instrumentation is None or not instrumentation.enabled:
+            return
+        now = time.time()
+        if now - self._latency_timestamp < self._LATENCY_REFRESH_INTERVAL:
+            return
+        self._latency_timestamp = now
+
+        stats = sorted(instrumentation.summary(phase='total'),
+                       key=lambda s: s['p95_ms'], reverse=True)
+        text = self._root.nametowidget('sidebar.latencytext')
+        text.delete(1.0, tkinter.END)
+        for stat in stats[:self._LATENCY_PANEL_ROWS]:
+            text.insert(tkinter.END, '{0}: {1:.0f}/{2:.0f}\n'.format(
+                stat['command'], stat['p50_ms'], stat['p95_ms']))
 
     def _acquire_hierarchy_view(self):
         """Acquires screenshot from the device, and place it on the UI's canvas
@@ -348,8 +404,47 @@ class ScriptGeneratorUI(object):
         Returns:
             Tkinter.Canvas: canvas object
         """
-        self._controller.execute('update_view_dump')
+        # The frame is kept as a thumbnail if session store is enabled
+        self._controller.execute(
+            'update_view_dump', {'frame': self._last_frame})
         self.hierarchy_view_timestamp = time.time()
+        # The object under the cursor may have changed
+        self._hover_coord = None
+        self._build_hit_map()
+
+    def _build_hit_map(self):
+        """Starts building hit map of the current hierarchy view
+        in background. Until it is built, hover lookups are
+        answered by the controller.
+
+        Returns:
+            HitMapBuilder: builder thread, or None if not started
+        """
+        self._hit_map = None
+        self._hit_map_generation += 1
+        if not hitmap.available() or self._scale is None:
+            return None
+        try:
+            objects = self._controller.execute('get_hierarchy_view_objects')
+        except ValueError:
+            # Invalid dump, hover lookups are answered by the controller
+            return None
+        generation = self._hit_map_generation
+
+        def on_built(hit_map):
+            """Publishes hit_map unless the hierarchy view is obsolete"""
+            if generation == self._hit_map_generation:
+                self._hit_map = hit_map
+
+        # pylint: disable=protected-access
+        builder = hitmap.HitMapBuilder(
+            objects,
+            (self._screenrecord.width, self._screenrecord.height),
+            self._scale,
+            UiObjectFinder._FIND_OBJECT_DISTANCE_THRESH,
+            on_built)
+        builder.start()
+        return builder
 
     def _set_screen_scale(self):
         """Sets screen scale information"""
@@ -370,21 +465,59 @@ class ScriptGeneratorUI(object):
             event (object): event information which is passed by Tk framework
         """
         canvas = self._root.nametowidget('mainframe.canvas')
+        if self._hover_timer_id is not None:
+            canvas.after_cancel(self._hover_timer_id)
+            self._hover_timer_id = None
+        self._hover_coord = None
+        self._hover_info = None
         canvas.delete('object_rect')
 
     def _on_mouse_motion(self, event):
         """Callback for mouse motion event
+
+        Only remembers the position. Motion events which arrive
+        within a hover interval are coalesced, and only the latest
+        position is inspected by _process_hover.
+
         Args:
             event (object): event information which is passed by Tk framework
         """
+        self._hover_position = (event.x, event.y)
+        if self._hover_timer_id is None:
+            canvas = self._root.nametowidget('mainframe.canvas')
+            self._hover_timer_id = canvas.after(
+                self._HOVER_INTERVAL,
+                self._profiler.scheduled(
+                    'process_hover', self._HOVER_INTERVAL,
+                    self._process_hover))
+
+    def _process_hover(self):
+        """Highlights the object under the latest mouse position
+        and shows its information
+
+        Nothing is done if the position on the device screen is the same
+        as last time, and nothing is redrawn if the object is the same.
+        """
+        self._hover_timer_id = None
+        coord = self._descale(self._hover_position)
+        if coord == self._hover_coord:
+            return
+        self._hover_coord = coord
+
+        hit_map = self._hit_map
+        if hit_map is not None:
+            obj_info = hit_map.lookup(self._hover_position)
+        else:
+            obj_info = self._controller.execute(
+                'get_hierarchy_view_object_info', {'start': coord})
+        if obj_info == self._hover_info:
+            return
+        self._hover_info = obj_info
+
         canvas = self._root.nametowidget('mainframe.canvas')
         canvas.delete('object_rect')
         text = self._root.nametowidget('sidebar.infotext')
         text.delete(1.0, tkinter.END)
-
-        command_args = {'start': self._descale((event.x, event.y))}
-        obj_info = self._controller.execute(
-            'get_hierarchy_view_object_info', command_args)
         if obj_info:
             bounds = obj_info['visibleBounds']
 
@@ -398,9 +531,9 @@ class ScriptGeneratorUI(object):
             canvas.create_rectangle(
                 xy0[0], xy0[1], xy1[0], xy1[1],
                 outline='red', width=2, tag='object_rect')
-            for k, v in obj_info.items():
-                v = v or '-'
-                text.insert(tkinter.END, '{0}: {1}\n'.format(k, v))
+            text.insert(tkinter.END, ''.join(
+                '{0}: {1}\n'.format(k, v or '-')
+                for k, v in obj_info.items()))
 
     def _on_mouse_b1motion(self, event):
         """Callback for left-button motion event
@@ -517,7 +650,7 @@ class ScriptGeneratorUI(object):
                 return retval
             except (UiObjectNotFound, UiInconsitencyError):
                 self._acquire_hierarchy_view()
-        return command_wrap
+        return self._profiler.wrap('command.' + command_name, command_wrap)
 
     def _left_1point_action_menu(self, position):
         """Displays 1-point left-click menu"""
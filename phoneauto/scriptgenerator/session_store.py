@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""On-disk store of a recording session
+
+Hierarchy dumps, keyframe thumbnails and recorded actions are appended
+to a segment file, and each of them is indexed by a JSON line in an
+index file:
+
+    <directory>/segment.bin   payloads, appended one after another
+    <directory>/index.jsonl   {"number": 0, "kind": "dump", "offset": 0,
+                               "length": 1234, "time": ..., "meta": {...}}
+
+Payloads are read through a memory map of the segment file, so that
+any record of a long session can be accessed at random without
+holding the session in memory.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import io
+import json
+import mmap
+import os
+import time
+
+from PIL import Image
+
+from .action_ir import Action
+from .view_hierarchy_dump import ViewHierarchyDump
+
+SEGMENT_FILE_NAME = 'segment.bin'
+INDEX_FILE_NAME = 'index.jsonl'
+
+KIND_DUMP = 'dump'
+KIND_THUMBNAIL = 'thumbnail'
+KIND_ACTION = 'action'
+
+
+class Record(object):
+    """Index entry of a stored payload"""
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('number', 'kind', 'offset', 'length', 'timestamp', 'meta')
+
+    def __init__(self, number, kind, offset, length, timestamp, meta):
+        """Initialization
+
+        Args:
+            number (integer): sequence number in the session
+            kind (text): KIND_DUMP, KIND_THUMBNAIL or KIND_ACTION
+            offset (integer): offset of the payload in the segment file
+            length (integer): length of the payload in bytes
+            timestamp (float): time when the record was appended
+            meta (dict): kind specific information
+        """
+        self.number = number
+        self.kind = kind
+        self.offset = offset
+        self.length = length
+        self.timestamp = timestamp
+        self.meta = meta
+
+    def to_json(self):
+        """Returns JSON text of the index entry"""
+        return json.dumps({
+            'number': self.number, 'kind': self.kind,
+            'offset': self.offset, 'length': self.length,
+            'time': self.timestamp, 'meta': self.meta}, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text):
+        """Creates an index entry from JSON text made by to_json"""
+        obj = json.loads(text)
+        return cls(obj['number'], obj['kind'], obj['offset'],
+                   obj['length'], obj['time'], obj['meta'])
+
+
+def _truncate(path, size):
+    """Truncates a file to size bytes if it is longer"""
+    if os.path.getsize(path) > size:
+        with io.open(path, 'r+b') as f:
+            f.truncate(size)
+
+
+class SessionStore(object):
+    """Append-only store of dumps, thumbnails and actions
+
+    Opening an existing directory continues the session stored in it.
+    Index entries of which payload has not been completely written,
+    e.g. because of a crash, are discarded together with the entries
+    following them.
+    """
+
+    def __init__(self, directory, thumbnail_size=(135, 240),
+                 clock=time.time):
+        """Initialization
+
+        Args:
+            directory (text): directory of the store, created if missing
+            thumbnail_size (tuple): maximum (width, height) of thumbnails
+            clock (callable): returns current time in seconds
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._directory = directory
+        self._thumbnail_size = thumbnail_size
+        self._clock = clock
+        segment_path = os.path.join(directory, SEGMENT_FILE_NAME)
+        index_path = os.path.join(directory, INDEX_FILE_NAME)
+        self._records = self._load_index(index_path, segment_path)
+        self._segment = io.open(segment_path, 'ab')
+        self._index = io.open(index_path, 'a', encoding='utf-8')
+        self._reader = io.open(segment_path, 'rb')
+        self._map = None
+        self._last_dump_digest = None
+
+    @staticmethod
+    def _load_index(index_path, segment_path):
+        """Loads index entries of which payload exists
+
+        The index and the segment files are truncated at the end of
+        the last valid entry and its payload, so that appended entries
+        never follow a partially written line, nor a stale entry
+        which would refer to the appended payloads.
+        """
+        segment_size = (os.path.getsize(segment_path)
+                        if os.path.exists(segment_path) else 0)
+        records = []
+        index_size = segment_end = 0
+        if os.path.exists(index_path):
+            with io.open(index_path, 'rb') as index_file:
+                for line in index_file:
+                    if not line.endswith(b'\n'):
+                        # Partially written line
+                        break
+                    try:
+                        record = Record.from_json(line.decode('utf-8'))
+                    except (ValueError, KeyError):
+                        break
+                    end = record.offset + record.length
+                    if (record.number != len(records) or
+                            record.offset < segment_end or
+                            end > segment_size):
+                        break
+                    records.append(record)
+                    index_size += len(line)
+                    segment_end = end
+            _truncate(index_path, index_size)
+        if os.path.exists(segment_path):
+            _truncate(segment_path, segment_end)
+        return records
+
+    @property
+    def directory(self):
+        """Directory of the store"""
+        return self._directory
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self, kind=None):
+        """Returns index entries
+
+        Args:
+            kind (text): Only entries of the kind are returned if given
+        Returns:
+            list: Record objects in appended order
+        """
+        if kind is None:
+            return list(self._records)
+        return [r for r in self._records if r.kind == kind]
+
+    def append(self, kind, payload, meta=None):
+        """Appends a payload
+
+        Args:
+            kind (text): kind of the payload
+            payload (bytes): payload
+            meta (dict): JSON compatible information of the payload
+        Returns:
+            Record: index entry of the payload
+        """
+        self._segment.seek(0, os.SEEK_END)
+        offset = self._segment.tell()
+        self._segment.write(payload)
+        # The payload is written before its index entry,
+        # so that an index entry never refers to missing data.
+        self._segment.flush()
+        record = Record(len(self._records), kind, offset, len(payload),
+                        self._clock(), meta or {})
+        self._index.write(record.to_json() + '\n')
+        self._index.flush()
+        self._records.append(record)
+        return record
+
+    def read(self, record):
+        """Reads a payload
+
+        Args:
+            record (object): Record
+        Returns:
+            bytes: payload
+        """
+        if record.length == 0:
+            return b''
+        end = record.offset + record.length
+        if self._map is None or len(self._map) < end:
+            self._remap(end)
+        return self._map[record.offset:end]
+
+    def _remap(self, required_size):
+        """Maps the segment file, which has grown since last mapping"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        size = os.fstat(self._reader.fileno()).st_size
+        if size < required_size:
+            raise ValueError('Record is out of the segment file')
+        self._map = mmap.mmap(
+            self._reader.fileno(), size, access=mmap.ACCESS_READ)
+
+    def add_dump(self, device_info, dump_xml):
+        """Appends a hierarchy dump unless it is the same as the last one
+
+        Args:
+            device_info (dict): device info given with the dump
+            dump_xml (text): hierarchy dump XML, text or UTF-8 bytes
+        Returns:
+            Record: index entry, or None if not appended
+        """
+        payload = (dump_xml if isinstance(dump_xml, bytes)
+                   else dump_xml.encode('utf-8'))
+        digest = hashlib.sha1(payload).hexdigest()
+        if digest == self._last_dump_digest:
+            return None
+        self._last_dump_digest = digest
+        return self.append(KIND_DUMP, payload, {'device_info': device_info})
+
+    def add_thumbnail(self, image):
+        """Appends a thumbnail of a screen frame
+
+        Args:
+            image (PIL.Image): screen frame
+        Returns:
+            Record: index entry
+        """
+        thumbnail = image.copy()
+        thumbnail.thumbnail(self._thumbnail_size)
+        out = io.BytesIO()
+        thumbnail.save(out, format='PNG')
+        return self.append(KIND_THUMBNAIL, out.getvalue(), {
+            'width': image.size[0], 'height': image.size[1]})
+
+    def add_action(self, action):
+        """Appends a recorded action
+
+        Args:
+            action (object): Action
+        Returns:
+            Record: index entry
+        """
+        return self.append(KIND_ACTION, action.to_json().encode('utf-8'))
+
+    def load_dump(self, record):
+        """Returns ViewHierarchyDump of a dump record"""
+        return ViewHierarchyDump(
+            record.meta['device_info'], self.read(record).decode('utf-8'))
+
+    def load_thumbnail(self, record):
+        """Returns PIL.Image of a thumbnail record"""
+        image = Image.open(io.BytesIO(self.read(record)))
+        image.load()
+        return image
+
+    def load_action(self, record):
+        """Returns Action of an action record"""
+        return Action.from_json(self.read(record).decode('utf-8'))
+
+    def close(self):
+        """Closes the store"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._segment.close()
+        self._index.close()
+        self._reader.close()
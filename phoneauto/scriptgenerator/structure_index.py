@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Tree structure of the nodes of a hierarchy dump
+
+Nodes are identified by their positions in document order, which is
+the preorder of the tree. The subtree of a node therefore occupies
+the contiguous positions from the node to its last descendant,
+which makes an ancestor test two comparisons.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+
+
+class StructureIndex(object):
+    """Parent, depth, sibling order and subtree interval of each node"""
+
+    def __init__(self, root, nodes):
+        """Initialization
+
+        Args:
+            root (object): root element of the dump
+            nodes (list): dump node elements in document order
+        """
+        positions = dict((id(node), i) for i, node in enumerate(nodes))
+
+        def node_children(element):
+            """Positions of child nodes of an element"""
+            return [positions[id(child)] for child in element
+                    if id(child) in positions]
+
+        num_nodes = len(nodes)
+        self._parents = [None] * num_nodes
+        self._depths = [0] * num_nodes
+        self._sibling_positions = [0] * num_nodes
+        self._children = [node_children(node) for node in nodes]
+        self._roots = node_children(root)
+        for sibling_position, child in enumerate(self._roots):
+            self._sibling_positions[child] = sibling_position
+        for position, children in enumerate(self._children):
+            for sibling_position, child in enumerate(children):
+                self._parents[child] = position
+                self._depths[child] = self._depths[position] + 1
+                self._sibling_positions[child] = sibling_position
+        # Position of the last descendant, the node itself if it's a leaf
+        self._ends = list(range(num_nodes))
+        for position in reversed(range(num_nodes)):
+            children = self._children[position]
+            if children:
+                self._ends[position] = self._ends[children[-1]]
+
+    def __len__(self):
+        """Number of nodes"""
+        return len(self._parents)
+
+    def parent(self, position):
+        """Position of the parent node, None for a top-level node"""
+        return self._parents[position]
+
+    def depth(self, position):
+        """Depth of the node, 0 for a top-level node"""
+        return self._depths[position]
+
+    def sibling_position(self, position):
+        """Position of the node among the children of its parent"""
+        return self._sibling_positions[position]
+
+    def children(self, position):
+        """Positions of child nodes, None for top-level nodes"""
+        if position is None:
+            return list(self._roots)
+        return list(self._children[position])
+
+    def siblings(self, position):
+        """Positions of the other children of the parent"""
+        return [sibling for sibling in self.children(self.parent(position))
+                if sibling != position]
+
+    def ancestors(self, position):
+        """Positions of ancestor nodes, the parent first"""
+        ancestors = []
+        position = self._parents[position]
+        while position is not None:
+            ancestors.append(position)
+            position = self._parents[position]
+        return ancestors
+
+    def descendants(self, position):
+        """Positions of descendant nodes in document order
+
+        Args:
+            position (integer): node position,
+                or None for all nodes of the dump
+        Returns:
+            range: positions of descendants
+        """
+        if position is None:
+            return range(len(self._parents))
+        return range(position + 1, self._ends[position] + 1)
+
+    def is_ancestor(self, ancestor, descendant):
+        """Checks if a node is a proper ancestor of another node"""
+        return ancestor < descendant <= self._ends[ancestor]
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Text indices over string attributes of a hierarchy dump
+
+FuzzyTextIndex is an inverted index from trigrams of text,
+content-desc and resource-id values to the nodes having them.
+Values similar to a query are found by counting trigrams shared with
+the query over the posting lists, without scanning all nodes.
+
+ValueIndex maps values of an attribute to the nodes having them
+for exact searches. SubstringIndex narrows candidates of substring
+and prefix searches of an attribute with a trigram index and sorted
+values.
+
+:copyright: (c) 2015 by tksn
+:license: MIT
+"""
+
+from __future__ import unicode_literals
+import bisect
+import heapq
+
+# Search criteria name -> dump node attribute name of indexed attributes
+INDEXED_ATTRIBUTES = (
+    ('text', 'text'),
+    ('description', 'content-desc'),
+    ('resourceId', 'resource-id'))
+
+
+def trigrams(value):
+    """Returns the set of trigrams of a value
+
+    The value is lower-cased and padded with a space on both ends,
+    so that a value shorter than three characters still has trigrams
+    and matches at the ends weigh more.
+
+    Args:
+        value (text): attribute value
+    Returns:
+        set: trigrams
+    """
+    padded = ' {0} '.format(value.lower())
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(lhs, rhs, max_distance):
+    """Levenshtein distance of two strings, bounded by max_distance
+
+    Args:
+        lhs (text): a string
+        rhs (text): another string
+        max_distance (integer): distance which is enough to know
+    Returns:
+        integer: the distance, or max_distance + 1 if it is greater
+            than max_distance
+    """
+    if abs(len(lhs) - len(rhs)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(rhs) + 1))
+    for i, lhs_char in enumerate(lhs, 1):
+        current = [i]
+        for j, rhs_char in enumerate(rhs, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (lhs_char != rhs_char)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+class SimilarValue(object):
+    """Attribute value found by FuzzyTextIndex.search"""
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ('score', 'position', 'name', 'value')
+
+    def __init__(self, score, position, name, value):
+        """Initialization
+
+        Args:
+            score (float): similarity to the query, from 0 to 1
+            position (integer): node position in document order
+            name (text): search criteria name such as 'text'
+            value (text): attribute value
+        """
+        self.score = score
+        self.position = position
+        self.name = name
+        self.value = value
+
+
+class FuzzyTextIndex(object):
+    """Trigram index for similarity search of attribute values"""
+
+    def __init__(self, nodes, attributes=INDEXED_ATTRIBUTES):
+        """Initialization
+
+        Args:
+            nodes (list): dump node elements in document order
+            attributes (tuple):
+                (criteria name, node attribute name) pairs to index
+        """
+        self._entries = []
+        self._gram_counts = []
+        self._postings = {}
+        for position, node in enumerate(nodes):
+            for name, attr_name in attributes:
+                value = node.get(attr_name, '')
+                if not value:
+                    continue
+                entry = len(self._entries)
+                grams = trigrams(value)
+                self._entries.append((position, name, value))
+                self._gram_counts.append(len(grams))
+                for gram in grams:
+                    self._postings.setdefault(gram, []).append(entry)
+
+    def __len__(self):
+        """Number of indexed values"""
+        return len(self._entries)
+
+    def search(self, query, names=None, limit=10, min_score=0.3):
+        """Finds values similar to the query
+
+        Similarity is the Dice coefficient of trigram sets,
+        1.0 for values equal ignoring case.
+
+        Args:
+            query (text): text to search for
+            names (iterable):
+                criteria names such as 'text' to search,
+                all indexed attributes if None
+            limit (integer): maximum number of results
+            min_score (float): minimum similarity of results
+        Returns:
+            list: SimilarValue objects, most similar first
+        """
+        query_grams = trigrams(query)
+        counts = {}
+        for gram in query_grams:
+            for entry in self._postings.get(gram, ()):
+                counts[entry] = counts.get(entry, 0) + 1
+        names = None if names is None else frozenset(names)
+        num_query_grams = len(query_grams)
+        scored = []
+        for entry, count in counts.items():
+            score = 2.0 * count / (num_query_grams + self._gram_counts[entry])
+            if score < min_score:
+                continue
+            position, name, _ = self._entries[entry]
+            if names is not None and name not in names:
+                continue
+            # Earlier nodes first among the same score
+            scored.append((score, -position, entry))
+        return [SimilarValue(score, *self._entries[entry])
+                for score, _, entry in heapq.nlargest(limit, scored)]
+
+
+class ValueIndex(object):
+    """Map from values of an attribute to the nodes having them"""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, nodes, attr_name):
+        """Initialization
+
+        Args:
+            nodes (list): dump node elements in document order
+            attr_name (text): node attribute name such as 'text'
+        """
+        positions = {}
+        for position, node in enumerate(nodes):
+            positions.setdefault(node.get(attr_name, ''), []).append(position)
+        self._positions = positions
+
+    def equals(self, value):
+        """Nodes of which value equals to value
+
+        Returns:
+            list: sorted node positions
+        """
+        return list(self._positions.get(value, ()))
+
+
+class SubstringIndex(object):
+    """Case-sensitive trigram index and sorted prefix index
+    of an attribute of all nodes
+
+    Lookups return candidate node positions which may contain false
+    positives, or None when the index cannot narrow the candidates;
+    the caller verifies candidates with the actual operator.
+    """
+
+    def __init__(self, nodes, attr_name):
+        """Initialization
+
+        Args:
+            nodes (list): dump node elements in document order
+            attr_name (text): node attribute name such as 'text'
+        """
+        postings = {}
+        sorted_values = []
+        for position, node in enumerate(nodes):
+            value = node.get(attr_name, '')
+            sorted_values.append((value, position))
+            for gram in set(value[i:i + 3] for i in range(len(value) - 2)):
+                postings.setdefault(gram, []).append(position)
+        sorted_values.sort()
+        self._postings = postings
+        self._keys = [value for value, _ in sorted_values]
+        self._positions = [position for _, position in sorted_values]
+
+    def contains(self, substring):
+        """Candidates of which value contains substring
+
+        Returns:
+            list: sorted node positions, or None if substring is
+                shorter than a trigram
+        """
+        if len(substring) < 3:
+            return None
+        posting_lists = []
+        for i in range(len(substring) - 2):
+            posting = self._postings.get(substring[i:i + 3])
+            if posting is None:
+                return []
+            posting_lists.append(posting)
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for posting in posting_lists[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def startswith(self, prefix):
+        """Nodes of which value starts with prefix
+
+        Returns:
+            list: sorted node positions, or None if prefix is empty
+        """
+        if not prefix:
+            return None
+        keys = self._keys
+        start = end = bisect.bisect_left(keys, prefix)
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return sorted(self._positions[start:end])
@@ -14,6 +14,12 @@ def _quote(text):
     return '\'{0}\''.format(text)
 
 
+def _quote_escaped(text):
+    """Enclose the string with quotation characters
+    escaping backslashes and quotation characters in it"""
+    return _quote(text.replace('\\', '\\\\').replace('\'', '\\\''))
+
+
 def _quote_if_str(value):
     """Enclose the string with quotation characters if the value is a str"""
     return (_quote(value)
@@ -32,7 +38,14 @@ def _make_method_call_string(method_name, *args, **kwargs):
 
 def _make_instance_string(locator):
     """Make a instance code fragment string"""
-    method_call_str = _make_method_call_string('{instance}', **locator.filters)
+    if locator.relation is None:
+        method_call_str = _make_method_call_string(
+            '{instance}', **locator.filters)
+    else:
+        relation, anchor_filters = locator.relation
+        method_call_str = '{0}.{1}'.format(
+            _make_method_call_string('{instance}', **anchor_filters),
+            _make_method_call_string(relation, **locator.filters))
     method_call_str += ('' if locator.index is None
                         else '[{0}]'.format(locator.index))
     return method_call_str
@@ -60,12 +73,12 @@ class UiautomatorCoder(object):
         lines = [
             'import uiautomator',
             ('from phoneauto.helpers.uiautomator_notfound_handlers '
-             'import install_standard_handlers'),
+             'import install_unexpected_ui_state_watcher'),
             ('from phoneauto.helpers.uiautomator_device_wrapper '
              'import DeviceWrapper'),
             'device = DeviceWrapper(uiautomator.Device({0}))'.format(
                 device_name),
-            'install_standard_handlers(device)',
+            'install_unexpected_ui_state_watcher(device)',
             'return device'
             ]
         return lines
@@ -81,6 +94,18 @@ class UiautomatorCoder(object):
         """
         return ['pass']
 
+    @staticmethod
+    def get_code_selector(locator):
+        """Returns a code fragment which selects the UI object,
+        which the code fragments of actions on the object start with
+
+        Args:
+            locator (object): Locator to locate the target UI object.
+        Returns:
+            string: Code fragment string
+        """
+        return _make_instance_string(locator)
+
     @staticmethod
     def get_code_set_text(locator, text):
         """Returns a code fragment which performs set_text
@@ -155,7 +180,9 @@ class UiautomatorCoder(object):
 
         Args:
             locator (object): Locator to locate the target UI object.
-            other_locator (object): Destination locator
+            other_locator (object):
+                Destination locator, which must not be relational
+                since drag.to takes a plain selector.
             options (dict): Dictionary contains optional parameters
                 such as steps.
         Returns:
@@ -251,6 +278,17 @@ class UiautomatorCoder(object):
         return '{{instance}}.press({0}, {1}){2}'.format(
             key_code, meta, ('  # ' + key_name) if key_name else '')
 
+    @staticmethod
+    def get_code_input_text(text):
+        """Returns a code fragment which types text at once
+
+        Args:
+            text (text): Text to be typed into the focused view
+        Returns:
+            string: Code fragment string
+        """
+        return '{{instance}}.input_text({0})'.format(_quote_escaped(text))
+
     @staticmethod
     def get_code_open_notification():
         """Returns a code fragment which performs open_notification
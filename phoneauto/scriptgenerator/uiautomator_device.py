@@ -56,8 +56,20 @@ class UiautomatorDevice(object):
 
     def _find(self, locator):
         """Find UI object using locator."""
+        selector_kwargs = getattr(locator, 'selector_kwargs', None)
+        if selector_kwargs is not None:
+            # Pre-resolved locator (see replay.PreresolvedLocator).
+            # The object is selected by instance index on the device,
+            # without counting the matching objects first.
+            return self._device(**selector_kwargs)
         index = locator.index or 0
-        objs = self._device(**locator.filters)
+        relation = getattr(locator, 'relation', None)
+        if relation is None:
+            objs = self._device(**locator.filters)
+        else:
+            relation_name, anchor_filters = relation
+            objs = getattr(self._device(**anchor_filters), relation_name)(
+                **locator.filters)
         if len(objs) <= index:
             raise UiInconsitencyError(
                     'locator.index not found on device screen')
@@ -123,7 +135,8 @@ class UiautomatorDevice(object):
             locator (object): Locator object to locate the UI object
                 which is to be dragged.
             other_locator (object): Locator object to locate the destination
-                UI object.
+                UI object. It must not be relational, since drag.to
+                takes a plain selector.
             options (dict): Key-value pairs which contains optional
                 parameters to uiautomator.Device, such as steps
         """
@@ -267,6 +280,34 @@ class UiautomatorDevice(object):
         else:
             self._device.orientation = orientation
 
+    def wait(self, for_what, timeout):
+        """Wait for the screen state
+
+        Args:
+            for_what (string): 'update' or 'idle'
+            timeout (integer): Maximum wait duration in milliseconds.
+                uiautomator's default is used if None.
+        Returns:
+            bool: return value of uiautomator's wait,
+                e.g. False if no update has occurred within timeout
+        """
+        options = {} if timeout is None else {'timeout': timeout}
+        return getattr(self._device.wait, for_what)(**options)
+
+    def wait_object(self, locator, for_what, timeout):
+        """Wait for the state of a UI object specified by the locator
+
+        Args:
+            locator (object): Locator object to locate the UI object
+            for_what (string): 'exists' or 'gone'
+            timeout (integer): Maximum wait duration in milliseconds.
+                uiautomator's default is used if None.
+        Returns:
+            bool: True if the state is reached within timeout
+        """
+        options = {} if timeout is None else {'timeout': timeout}
+        return getattr(self._find(locator).wait, for_what)(**options)
+
     def get_info(self, locator):
         """Returns information of a UI object specified by the locator
 
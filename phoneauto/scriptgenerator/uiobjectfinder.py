@@ -6,15 +6,21 @@
 """
 
 from __future__ import unicode_literals
+from collections import OrderedDict
+from functools import partial
+import logging
 import math
 import sys
+from . import bounds_store
+from .text_index import edit_distance
+from .view_hierarchy_dump import compile_query
 from phoneauto.scriptgenerator.exception import UiObjectNotFound
 
 
 class UiObjectLocator(object):
     """Locator for locating a UI object on the screen"""
 
-    def __init__(self, filters, index=None):
+    def __init__(self, filters, index=None, relation=None):
         """Initialize locator object
 
         Args:
@@ -24,9 +30,14 @@ class UiObjectLocator(object):
                 filters. It is used to identify the UI object.
                 When filters are enough to filter out UI objects to one single
                 object, index is not used and can be None.
+            relation (tuple): ('child' or 'sibling', anchor filters)
+                if filters are applied in relation to an anchor object
+                as uiautomator child and sibling selectors do,
+                None if filters are applied to the whole screen.
         """
         self._filters = filters
         self._index = index
+        self._relation = relation
         self._meta = None
 
     def set_meta(self, meta):
@@ -48,21 +59,123 @@ class UiObjectLocator(object):
         """Index in filter results, which is used to identify a UI object"""
         return self._index
 
+    @property
+    def relation(self):
+        """('child' or 'sibling', anchor filters), or None"""
+        return self._relation
+
+
+class _LocatorCache(object):
+    """LRU cache of search results"""
+
+    def __init__(self, maxsize):
+        """Initialization"""
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns cached value, or default if key is not cached"""
+        value = self._entries.pop(key, default)
+        if value is not default:
+            self._entries[key] = value
+        return value
+
+    def put(self, key, value):
+        """Caches value"""
+        self._entries.pop(key, None)
+        if len(self._entries) >= self._maxsize:
+            self._entries.popitem(last=False)
+        self._entries[key] = value
+
+    def clear(self):
+        """Drops all cached values"""
+        self._entries.clear()
+
+    def __len__(self):
+        """Number of cached values"""
+        return len(self._entries)
+
+
+def _criteria_key(criteria):
+    """Returns hashable key of criteria, or None if it is not hashable"""
+    key = tuple(sorted(criteria.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+# Cached result of a search which found nothing
+_NOT_FOUND = object()
+
+# (filter name, attribute name) of filters tried to locate an object,
+# in order of preference
+_FILTER_NAMES = (
+    ('resourceId', 'resourceName'),
+    ('description', 'contentDescription'),
+    ('text', 'text'),
+    ('className', 'className'))
+
+# Filters tried to locate the anchor object of a relational locator
+_ANCHOR_FILTER_NAMES = _FILTER_NAMES[:3]
+
 
 class UiObjectFinder(object):
-    """Finder to spot a UI object for provided conditions"""
+    """Finder to spot a UI object for provided conditions
+
+    Locators are memoized per finder, that is, per hierarchy dump.
+    A finder is replaced whenever the dump is updated,
+    so cached locators never outlive the dump they were computed from.
+    """
 
     _FIND_OBJECT_DISTANCE_THRESH = 200
+    _CACHE_SIZE = 1024
+    # A text locator is ambiguous if another object's text
+    # is within this number of edits
+    _AMBIGUOUS_EDIT_DISTANCE = 2
+    # Number of ancestors tried as the anchor of a child locator
+    _RELATION_MAX_ANCESTORS = 3
 
-    def __init__(self, hierarchy_dump):
+    def __init__(self, hierarchy_dump, vectorized=None, stability=None,
+                 warn_ambiguous=False):
         """Initialize finder object
 
         Args:
             hierarchy_dump (object): UI hierarchy dump object
+            vectorized (bool):
+                Uses numpy-backed bounds store to find objects if True.
+                Defaults to True if numpy is available.
+            stability (LocatorStabilityScorer):
+                Scorer which has observed recent dumps.
+                If it has observed hierarchy_dump last, the most stable
+                unique filter is preferred over the fixed order of
+                resourceId, description, text and className.
+            warn_ambiguous (bool):
+                Warns if a text or description locator is similar to
+                other objects' ones. The check is done only after
+                the fuzzy index of hierarchy_dump has been built,
+                which is left to the caller so that it is not built
+                while a locator is determined.
         """
         self._hierarchy_dump = hierarchy_dump
+        self._stability = stability
+        self._warn_ambiguous = warn_ambiguous
+        if vectorized is None:
+            vectorized = bounds_store.available()
+        self._vectorized = vectorized
+        # (coord, ignore_distant, criteria) -> locator or _NOT_FOUND
+        self._search_cache = _LocatorCache(self._CACHE_SIZE)
+        # (id of object, criteria) -> locator
+        self._locator_cache = _LocatorCache(self._CACHE_SIZE)
 
-    def find_object_contains(self, coord, ignore_distant, **criteria):
+    @property
+    def hierarchy_dump(self):
+        """UI hierarchy dump object which objects are searched from"""
+        return self._hierarchy_dump
+
+    def find_object_contains(self, coord, ignore_distant, relational=True,
+                             **criteria):
         """Find an object of which rect contains given coordinates
         and meeds given criteria.
 
@@ -71,6 +184,10 @@ class UiObjectFinder(object):
             ignore_distant (bool):
                 Boolean flag which specifies whether it ignores
                 UI objects of which center are too far from coord.
+            relational (bool):
+                Allows child and sibling locators if True. Locators
+                given to uiautomator as a plain selector,
+                such as the destination of drag.to, must not be relational.
             criteria (dict):
                 Optional key-value pairs which filter search result
         Returns:
@@ -79,21 +196,127 @@ class UiObjectFinder(object):
           eafe  UiObjectNotFound: If there is no such object corresponds to
          f       given coordinates and criteria.
         """
-        # Find all objects which contain (x, y)
-        objects_iter = self._find_objects_contains(
-            coord, ignore_distant, **criteria)
-        # Pick an object which has smallest area
-        smallest = self._select_smallest_object(objects_iter)
+        criteria_key = _criteria_key(criteria)
+        if criteria_key is None:
+            return self._find_object_contains(
+                coord, ignore_distant, criteria, relational=relational)
+
+        search_key = (tuple(coord), bool(ignore_distant), bool(relational),
+                      criteria_key)
+        locator = self._search_cache.get(search_key)
+        if locator is None:
+            try:
+                locator = self._find_object_contains(
+                    coord, ignore_distant, criteria, criteria_key,
+                    relational)
+            except UiObjectNotFound:
+                self._search_cache.put(search_key, _NOT_FOUND)
+                raise
+            self._search_cache.put(search_key, locator)
+        elif locator is _NOT_FOUND:
+            raise UiObjectNotFound('({0}, {1})'.format(*coord))
+        return locator
+
+    def find_similar_objects(self, text, limit=5, min_score=0.5):
+        """Find objects of which text, content-desc or resource-id
+        is the closest to given text
+
+        Args:
+            text (text): text to search for
+            limit (integer): maximum number of objects
+            min_score (float): minimum similarity from 0 to 1
+        Returns:
+            list: (similarity, locator) pairs, most similar first
+        """
+        hd = self._hierarchy_dump
+        results = []
+        for similar in hd.find_similar(
+                text, limit=limit, min_score=min_score):
+            obj = hd.get_object(similar.position)
+            filters = {similar.name: similar.value}
+            objects = hd.find_objects(**filters)
+            index = None
+            if len(objects) > 1:
+                index = next(i for i, o in enumerate(objects) if o is obj)
+            locator = UiObjectLocator(filters=filters, index=index)
+            locator.set_meta(obj)
+            results.append((similar.score, locator))
+        return results
+
+    def clear_cache(self):
+        """Drops memoized locators"""
+        self._search_cache.clear()
+        self._locator_cache.clear()
+
+    def _find_object_contains(self, coord, ignore_distant, criteria,
+                              criteria_key=None, relational=True):
+        """find_object_contains without search result memoization"""
+        smallest = None
+        store = self._get_bounds_store()
+        if store is not None:
+            smallest = self._find_smallest_object_vectorized(
+                store, coord, ignore_distant, criteria)
+        else:
+            # Find all objects which contain (x, y)
+            objects_iter = self._find_objects_contains(
+                coord, ignore_distant, **criteria)
+            # Pick an object which has smallest area
+            smallest = self._select_smallest_object(objects_iter)
         if smallest is None:
             raise UiObjectNotFound('({0}, {1})'.format(*coord))
+
+        # The same object may be found from other coordinates
+        locator_key = None
+        if criteria_key is not None:
+            locator_key = (id(smallest['object']), bool(relational),
+                           criteria_key)
+            locator = self._locator_cache.get(locator_key)
+            if locator is not None:
+                return locator
+
         # Try finding filters which can uniquely identify an object
-        locator = self._determine_locator(smallest['object'])
+        locator = self._determine_locator(smallest['object'], relational)
         # If failed, Use index in addition to filters
         locator = locator or UiObjectLocator(
             filters=criteria, index=smallest['index'])
         locator.set_meta(smallest['object'])
+        if locator_key is not None:
+            self._locator_cache.put(locator_key, locator)
         return locator
 
+    def _get_bounds_store(self):
+        """Returns bounds store if vectorized search is available"""
+        if not self._vectorized:
+            return None
+        try:
+            return self._hierarchy_dump.get_bounds_store()
+        except ValueError:
+            # The dump contains invalid bounds, falls back to
+            # the per-object search which reports it if relevant.
+            return None
+
+    def _find_smallest_object_vectorized(self, store, coord,
+                                         ignore_distant, criteria):
+        """Vectorized equivalent of _find_objects_contains
+        followed by _select_smallest_object"""
+        flag_criteria, other_criteria = {}, {}
+        for name, value in criteria.items():
+            if name in bounds_store.FLAG_NAMES:
+                flag_criteria[name] = value
+            else:
+                other_criteria[name] = value
+        node_filter = (compile_query(other_criteria).matches
+                       if other_criteria else None)
+        mask = store.select(
+            flag_criteria, node_filter, self._hierarchy_dump.nodes)
+        thresh = self._FIND_OBJECT_DISTANCE_THRESH if ignore_distant else None
+        found = store.find_smallest_containing(coord, mask, thresh)
+        if found is None:
+            return None
+        index, position = found
+        return {'index': index,
+                'object': self._hierarchy_dump.get_object(position)}
+
     def _find_objects_contains(self, coord, ignore_distant, **criteria):
         """Find UI object of which rect contains coord"""
         # pylint: disable=invalid-name
@@ -134,8 +357,12 @@ class UiObjectFinder(object):
             return None
         return {'index': min_obj[1], 'object': min_obj[2]}
 
-    def _determine_locator(self, info):
+    def _determine_locator(self, info, relational=True):
         """Determine locator which identifies one single UI object"""
+        stability = self._stability
+        if (stability is not None and
+                stability.latest is self._hierarchy_dump):
+            return self._determine_stable_locator(info, relational)
 
         def unique(**criteria):
             """Check if given criteria finds single UI object"""
@@ -150,10 +377,12 @@ class UiObjectFinder(object):
         # uses content-desc if it's available
         content_desc = info['contentDescription']
         if content_desc and unique(description=content_desc):
+            self._warn_if_ambiguous('description', content_desc)
             return UiObjectLocator(filters={'description': content_desc})
 
         # uses text if it's available
         if info['text'] and unique(text=info['text']):
+            self._warn_if_ambiguous('text', info['text'])
             return UiObjectLocator(filters={'text': info['text']})
 
         # uses text if it's available
@@ -161,4 +390,82 @@ class UiObjectFinder(object):
         if class_name and unique(className=class_name):
             return UiObjectLocator(filters={'className': class_name})
 
+        if not relational:
+            return None
+        return self._determine_relational_locator(info)
+
+    def _determine_stable_locator(self, info, relational):
+        """Determine locator with the most stable filter
+        among the ones which identify one single UI object"""
+        candidates = [(name, info[attr_name])
+                      for name, attr_name in _FILTER_NAMES if info[attr_name]]
+        ranked = self._stability.rank(candidates)
+        if ranked:
+            name, value = ranked[0]
+            if name in ('description', 'text'):
+                # Searches only if the warning is enabled
+                self._warn_if_ambiguous(name, value)
+            return UiObjectLocator(filters={name: value})
+        if not relational:
+            return None
+        return self._determine_relational_locator(info)
+
+    def _determine_relational_locator(self, info):
+        """Determine child or sibling locator which identifies
+        one single UI object in relation to a uniquely identified one"""
+        hd = self._hierarchy_dump
+        position = hd.get_position(info)
+        if position is None:
+            return None
+        structure = hd.get_structure_index()
+        ancestors = structure.ancestors(position)
+        for level, ancestor in enumerate(
+                ancestors[:self._RELATION_MAX_ANCESTORS]):
+            filters = self._find_unique_filters(
+                info, partial(hd.find_related_objects, ancestor, 'child'))
+            if filters is None:
+                continue
+            anchors = [('child', ancestor)]
+            if level == 0:
+                # Siblings search the same scope as the parent does
+                anchors.extend(
+                    ('sibling', sibling)
+                    for sibling in structure.siblings(position))
+            for relation, anchor in anchors:
+                anchor_filters = self._find_unique_filters(
+                    hd.get_object(anchor), hd.find_objects,
+                    names=_ANCHOR_FILTER_NAMES)
+                if anchor_filters is not None:
+                    return UiObjectLocator(
+                        filters=filters, relation=(relation, anchor_filters))
         return None
+
+    @staticmethod
+    def _find_unique_filters(info, find, names=_FILTER_NAMES):
+        """Returns filters of an attribute of info
+        with which find returns only one object, or None"""
+        for name, attr_name in names:
+            value = info[attr_name]
+            if value and len(find(**{name: value})) == 1:
+                return {name: value}
+        return None
+
+    def _warn_if_ambiguous(self, name, value):
+        """Warns if other objects have values within a few edits,
+        since the locator may select one of them after a small change
+        of the screen, such as a counter in the text"""
+        if not self._warn_ambiguous:
+            return
+        fuzzy_index = self._hierarchy_dump.get_fuzzy_index(build=False)
+        if fuzzy_index is None:
+            return
+        max_distance = self._AMBIGUOUS_EDIT_DISTANCE
+        similar_values = sorted(set(
+            similar.value for similar in fuzzy_index.search(
+                value, names=(name,), limit=10)
+            if similar.value != value and
+            edit_distance(similar.value, value, max_distance) <= max_distance))
+        if similar_values:
+            logging.getLogger(__name__).warning(
+                'locator %s=%r is ambiguous, similar to %s',
+                name, value, ', '.join(repr(v) for v in similar_values))
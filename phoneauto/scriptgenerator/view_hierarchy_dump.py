@@ -6,8 +6,17 @@
 """
 
 from __future__ import unicode_literals
+from collections import OrderedDict
 import re
 import xml.etree.ElementTree as ET
+from . import bounds_store
+from . import structure_index
+from . import text_index
+
+
+# Pattern of bounds attribute value, such as "[0,0][1080,1920]"
+_BOUNDS_PATTERN = re.compile(
+    r'\[([+-]?\d+),([+-]?\d+)\]\[([+-]?\d+),([+-]?\d+)\]')
 
 
 def _equals(search_str, attr_str):
@@ -25,9 +34,19 @@ def _startswith(search_str, attr_str):
     return attr_str.startswith(search_str)
 
 
-def _matches(search_str, attr_str):
-    """Matches-operator which is used to find a view"""
-    return bool(re.search(search_str, attr_str))
+def _matches(search_pattern, attr_str):
+    """Matches-operator which is used to find a view
+
+    search_pattern is a regular expression object
+    which has been compiled by CompiledQuery.
+    """
+    return bool(search_pattern.search(attr_str))
+
+
+# Operators of which search string is compiled beforehand
+_OPERAND_COMPILERS = {
+    _matches: re.compile
+}
 
 
 # Query argument to (attribute, operator) mapping
@@ -59,9 +78,132 @@ _ATTRIBUTE_CONV_MAPPING = {
 }
 
 
+# Operators which SubstringIndex can narrow candidates for,
+# and the name of its lookup method
+_SUBSTRING_LOOKUPS = {
+    _contains: 'contains',
+    _startswith: 'startswith'
+}
+
+# Attributes of which ValueIndex and SubstringIndex are built
+_INDEXED_ATTRIBUTES = frozenset(['text', 'content-desc', 'resource-id'])
+
+
+def _value_to_str(value):
+    """value to string conversion used
+    in order to stringify lhs value"""
+    if isinstance(value, type('')):
+        return value
+    if isinstance(value, bool):
+        return str(value).lower()
+    else:
+        return str(value)
+
+
+class CompiledQuery(object):
+    """Search criteria compiled into attribute names, operator functions
+    and operands (such as precompiled regular expressions)"""
+
+    __slots__ = ('_matchers',)
+
+    def __init__(self, criteria):
+        """Initialization
+
+        Args:
+            criteria (dict or iterable):
+                Search criteria such as {'clickable': True, 'text': 'abc'},
+                or (name, value) pairs of them.
+        Raises:
+            NotImplementedError: If criteria contains unsupported name.
+        """
+        items = criteria.items() if isinstance(criteria, dict) else criteria
+        matchers = []
+        for name, value in items:
+            attr_conv = _ATTRIBUTE_CONV_MAPPING.get(name)
+            if attr_conv is None:
+                raise NotImplementedError(
+                    'Search by {0} has not implemented yet'.format(name))
+            attr_name, func = attr_conv
+            lhs_value = _value_to_str(value)
+            compiler = _OPERAND_COMPILERS.get(func)
+            if compiler is not None:
+                lhs_value = compiler(lhs_value)
+            matchers.append((attr_name, func, lhs_value))
+        self._matchers = tuple(matchers)
+
+    @property
+    def matchers(self):
+        """(attribute name, operator function, operand) of each criterion"""
+        return self._matchers
+
+    def matches(self, node):
+        """Checks if the node meets the criteria
+
+        Args:
+            node (object): dump node element
+        Returns:
+            bool: True if it meets all criteria
+        """
+        for attr_name, func, lhs_value in self._matchers:
+            if not func(lhs_value, node.get(attr_name, '')):
+                return False
+        return True
+
+
+class _QueryCache(object):
+    """LRU cache of CompiledQuery keyed by criteria"""
+
+    def __init__(self, maxsize):
+        """Initialization"""
+        self._maxsize = maxsize
+        self._queries = OrderedDict()
+
+    def get(self, criteria):
+        """Returns compiled query for criteria, compiles it if not cached"""
+        key = tuple(sorted(
+            (name, _value_to_str(value)) for name, value in criteria.items()))
+        query = self._queries.pop(key, None)
+        if query is None:
+            query = CompiledQuery(key)
+            if len(self._queries) >= self._maxsize:
+                self._queries.popitem(last=False)
+        self._queries[key] = query
+        return query
+
+    def clear(self):
+        """Drops all cached queries"""
+        self._queries.clear()
+
+
+_QUERY_CACHE = _QueryCache(maxsize=256)
+
+
+def compile_query(criteria):
+    """Returns CompiledQuery for criteria
+
+    Queries are cached, thus repeated searches with the same criteria
+    do not compile anything.
+
+    Args:
+        criteria (dict): search criteria such as {'clickable': True}
+    Returns:
+        CompiledQuery: compiled query
+    """
+    return _QUERY_CACHE.get(criteria)
+
+
 class ViewHierarchyDump(object):
     """Dump of android UI view hierarchy"""
 
+    # Dumps smaller than this are searched without value and substring
+    # indices, since scanning them is cheaper than building the indices
+    _SUBSTRING_INDEX_MIN_NODES = 256
+
+    # SubstringIndex of an attribute is built on this many substring
+    # or prefix searches of the attribute, since building it costs
+    # many scans while a dump is searched a few times in most cases
+    _SUBSTRING_INDEX_MIN_QUERIES = 3
+
     def __init__(self, device_info, dump):
         """Initialize dump object
 
@@ -71,6 +213,17 @@ class ViewHierarchyDump(object):
         """
         self._device_info = device_info
         self._root = ET.fromstring(dump)
+        self._nodes = list(self._root.iter('node'))
+        self._objects = [None] * len(self._nodes)
+        self._bounds_store = None
+        self._fuzzy_index = None
+        self._value_indices = {}
+        self._substring_indices = {}
+        # attribute name -> number of substring or prefix searches
+        self._substring_queries = {}
+        self._structure_index = None
+        # id of attributes dictionary -> node position
+        self._positions = {}
 
     @staticmethod
     def _get_boolean_attrs(node_attrs, out_attrs):
@@ -119,10 +272,8 @@ class ViewHierarchyDump(object):
         but specifically for bounds attribute.
         """
         bounds_str = node_attrs.get('bounds', '')
-        dig = r'[+-]?\d+'
-        pat = r'\[({dig}),({dig})\]\[({dig}),({dig})\]'.format(dig=dig)
-        match_result = re.match(pat, bounds_str)
-        if not match_result or len(match_result.groups()) != 4:
+        match_result = _BOUNDS_PATTERN.match(bounds_str)
+        if not match_result:
             raise ValueError('Dump result contained invalid bounds value')
         bounds = dict(zip(
             ('left', 'top', 'right', 'bottom'),
@@ -162,43 +313,127 @@ class ViewHierarchyDump(object):
         out_attrs['childCount'] = len(node)
         return out_attrs
 
-    @staticmethod
-    def _get_matchers(criteria):
-        """Returns matcher object to find objects which meets criteria """
-
-        class _Matcher(object):
-            """Matcher class holds a comparator function and
-            left hand side value"""
-
-            def __init__(self, key, func, lhs_value):
-                """Initialization"""
-                self.key = key
-                self._func = func
-                self._lhs_value = lhs_value
-
-            def __call__(self, rhs_value):
-                """compare lhs and rhs"""
-                return self._func(self._lhs_value, rhs_value)
-
-        def value_to_str(value):
-            """value to string conversion used
-            in order to stringify lhs value"""
-            if isinstance(value, type('')):
-                return value
-            if isinstance(value, bool):
-                return str(value).lower()
-            else:
-                return str(value)
+    def __len__(self):
+        """Number of nodes in the dump"""
+        return len(self._nodes)
 
-        matchers = []
-        for name, value in criteria.items():
-            attr_conv = _ATTRIBUTE_CONV_MAPPING.get(name)
-            if attr_conv is None:
-                raise NotImplementedError(
-                    'Search by {0} has not implemented yet'.format(name))
-            lhs_value = value_to_str(value)
-            matchers.append(_Matcher(attr_conv[0], attr_conv[1], lhs_value))
-        return matchers
+    @property
+    def nodes(self):
+        """Dump node elements in document order"""
+        return self._nodes
+
+    def get_object(self, node_index):
+        """Returns attributes of the node
+
+        Attributes are converted on first access and cached,
+        thus the same dictionary is returned for the same node.
+
+        Args:
+            node_index (int): position of the node in document order
+        Returns:
+            dict: attributes of the node
+        """
+        attrs = self._objects[node_index]
+        if attrs is None:
+            attrs = self._get_attrs(self._nodes[node_index])
+            self._objects[node_index] = attrs
+            self._positions[id(attrs)] = node_index
+        return attrs
+
+    def get_position(self, obj):
+        """Returns the node position of attributes returned by get_object
+
+        Args:
+            obj (dict): attributes of a node
+        Returns:
+            int: position of the node in document order,
+                or None if obj is not an object of this dump
+        """
+        return self._positions.get(id(obj))
+
+    def get_bounds_store(self):
+        """Returns vectorized bounds store of all nodes
+
+        The store is built on first call.
+
+        Returns:
+            BoundsStore: bounds store, or None if numpy is not available
+        """
+        if self._bounds_store is None and bounds_store.available():
+            self._bounds_store = bounds_store.BoundsStore(
+                [self.get_object(i) for i in range(len(self._nodes))])
+        return self._bounds_store
+
+    def get_fuzzy_index(self, build=True):
+        """Returns trigram index of text, content-desc and resource-id
+
+        The index is built on first call.
+
+        Args:
+            build (bool): builds the index if it has not been built yet
+        Returns:
+            FuzzyTextIndex: index of all nodes,
+                or None if build is False and it has not been built
+        """
+        if self._fuzzy_index is None and build:
+            self._fuzzy_index = text_index.FuzzyTextIndex(self._nodes)
+        return self._fuzzy_index
+
+    def find_similar(self, query, names=None, limit=10, min_score=0.3):
+        """Find attribute values similar to the query
+
+        Args:
+            query (text): text to search for
+            names (iterable):
+                criteria names to search, such as ('text', 'description').
+                text, description and resourceId are searched if None.
+            limit (integer): maximum number of results
+            min_score (float): minimum similarity from 0 to 1
+        Returns:
+            list: SimilarValue objects, most similar first.
+                Attributes of the node are given by
+                get_object(value.position).
+        """
+        return self.get_fuzzy_index().search(
+            query, names=names, limit=limit, min_score=min_score)
+
+    def get_structure_index(self):
+        """Returns parent/child/sibling index of all nodes
+
+        The index is built on first call.
+
+        Returns:
+            StructureIndex: index of all nodes
+        """
+        if self._structure_index is None:
+            self._structure_index = structure_index.StructureIndex(
+                self._root, self._nodes)
+        return self._structure_index
+
+    def find_related_objects(self, position, relation, **criteria):
+        """Find objects which meet criteria in relation to a node
+
+        Relations are the same as of uiautomator selectors.
+        'child' searches descendants of the node,
+        'sibling' searches descendants of the parent of the node.
+
+        Args:
+            position (int): position of the anchor node
+            relation (text): 'child' or 'sibling'
+            criteria (dict): search criteria as of find_objects
+        Returns:
+            list: list of attributes of found objects
+        """
+        index = self.get_structure_index()
+        if relation == 'child':
+            scope = index.descendants(position)
+        elif relation == 'sibling':
+            scope = index.descendants(index.parent(position))
+        else:
+            raise ValueError('Unknown relation {0}'.format(relation))
+        matches = compile_query(criteria).matches
+        nodes = self._nodes
+        return [self.get_object(i) for i in scope if matches(nodes[i])]
 
     def find_objects(self, **criteria):
         """Find all objects which meet criteria
@@ -210,18 +445,93 @@ class ViewHierarchyDump(object):
         Returns:
             list: list of attributes of found objects
         """
+        return self.find_objects_by_query(compile_query(criteria))
+
+    def find_objects_by_query(self, query):
+        """Find all objects which meet compiled query
+
+        Args:
+            query (CompiledQuery): query object created by compile_query
+        Returns:
+            list: list of attributes of found objects
+        """
+        matches = query.matches
+        candidates = self._find_candidates(query)
+        if candidates is None:
+            return [self.get_object(i)
+                    for i, node in enumerate(self._nodes) if matches(node)]
+        nodes = self._nodes
+        return [self.get_object(i) for i in candidates if matches(nodes[i])]
+
+    def get_value_index(self, attr_name):
+        """Returns ValueIndex of an attribute
+
+        The index is built on first call for the attribute.
 
-        matchers = self._get_matchers(criteria)
+        Args:
+            attr_name (text): node attribute name such as 'content-desc'
+        Returns:
+            ValueIndex: index of all nodes
+        """
+        index = self._value_indices.get(attr_name)
+        if index is None:
+            index = self._value_indices[attr_name] = (
+                text_index.ValueIndex(self._nodes, attr_name))
+        return index
 
-        found = []
-        for node in self._root.iter('node'):
-            match = True
-            for matcher in matchers:
-                rhs_value = node.get(matcher.key, '')
-                if not matcher(rhs_value):
-                    match = False
-                    break
-            if match:
-                found.append(self._get_attrs(node))
+    def get_substring_index(self, attr_name, build=True):
+        """Returns SubstringIndex of an attribute
 
-        return found
+        The index is built on first call for the attribute.
+
+        Args:
+            attr_name (text): node attribute name such as 'content-desc'
+            build (bool): builds the index if it has not been built yet
+        Returns:
+            SubstringIndex: index of all nodes,
+                or None if build is False and it has not been built
+        """
+        index = self._substring_indices.get(attr_name)
+        if index is None and build:
+            index = self._substring_indices[attr_name] = (
+                text_index.SubstringIndex(self._nodes, attr_name))
+        return index
+
+    def _find_candidates(self, query):
+        """Narrows nodes to search with value and substring indices
+
+        Returns:
+            list: sorted positions of candidate nodes, which are to be
+                verified by the query, or None if all nodes are candidates
+        """
+        if len(self._nodes) < self._SUBSTRING_INDEX_MIN_NODES:
+            return None
+        candidates = None
+        for attr_name, func, operand in query.matchers:
+            if attr_name not in _INDEXED_ATTRIBUTES:
+                continue
+            if func is _equals:
+                found = self.get_value_index(attr_name).equals(operand)
+            elif func in _SUBSTRING_LOOKUPS:
+                index = self._count_substring_query(attr_name)
+                if index is None:
+                    continue
+                found = getattr(index, _SUBSTRING_LOOKUPS[func])(operand)
+            else:
+                continue
+            if found is not None and (
+                    candidates is None or len(found) < len(candidates)):
+                candidates = found
+        return candidates
+
+    def _count_substring_query(self, attr_name):
+        """Counts a substring or prefix search of an attribute
+
+        Returns:
+            SubstringIndex: index of the attribute, or None if
+                it has not been searched enough times to build it
+        """
+        count = self._substring_queries.get(attr_name, 0) + 1
+        self._substring_queries[attr_name] = count
+        return self.get_substring_index(
+            attr_name, build=count >= self._SUBSTRING_INDEX_MIN_QUERIES)
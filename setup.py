@@ -49,10 +49,11 @@ setup(
 
     keywords='android automation uiautomator',
 
-    packages=find_packages(exclude=['tests', 'output']),
+    packages=find_packages(exclude=['tests', 'tests.*', 'output']),
 
     setup_requires=['pytest-runner>=2.0,<3dev', 'docutils'],
     install_requires=['uiautomator', 'Pillow', 'future'],
+    extras_require={'numpy': ['numpy']},
     tests_require=['pytest>=2.8', 'mock'],
 
     platforms = ['Windows', 'Mac OS X'],
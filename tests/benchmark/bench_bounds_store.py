@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of vectorized bounds store against per-object search
+
+Run with: python -m tests.benchmark.bench_bounds_store
+"""
+
+from __future__ import unicode_literals, print_function
+import random
+import time
+
+from phoneauto.scriptgenerator import view_hierarchy_dump
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from tests.benchmark.harness import measure, report
+from tests.dump_generator import DEVICE_INFO, generate_dump_xml
+
+SIZES = (500, 5000, 50000)
+QUICK_SIZES = (500, 5000)
+_CRITERIA = {'clickable': True, 'enabled': True}
+
+
+def run(quick=False, number=20):
+    """Measures the smallest-containing-object search
+    and returns {name: seconds per call}"""
+    sizes = QUICK_SIZES if quick else SIZES
+    results = {}
+    rng = random.Random(0)
+    for size in sizes:
+        hd = view_hierarchy_dump.ViewHierarchyDump(
+            DEVICE_INFO, generate_dump_xml(size))
+        # Converts all objects beforehand so that
+        # both paths are measured without the conversion cost.
+        for i in range(len(hd)):
+            hd.get_object(i)
+
+        start = time.time()
+        store = hd.get_bounds_store()
+        results['bounds_store.build[{0}]'.format(size)] = time.time() - start
+
+        finder = UiObjectFinder(hd)
+        coords = [(rng.randrange(1080), rng.randrange(1920))
+                  for _ in range(number)]
+
+        def per_object():
+            for coord in coords:
+                finder._select_smallest_object(
+                    finder._find_objects_contains(coord, True, **_CRITERIA))
+
+        def vectorized():
+            for coord in coords:
+                finder._find_smallest_object_vectorized(
+                    store, coord, True, _CRITERIA)
+
+        results['find_smallest.dict[{0}]'.format(size)] = (
+            measure(per_object, number=1, repeat=3) / number)
+        results['find_smallest.numpy[{0}]'.format(size)] = (
+            measure(vectorized, number=1, repeat=3) / number)
+    return results
+
+
+def main():
+    """Entry point"""
+    for name, seconds in sorted(run().items()):
+        report(name, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Microbenchmark of DeviceWrapper per-call overhead
+
+Run with: python -m tests.benchmark.bench_device_wrapper
+"""
+
+from __future__ import unicode_literals, print_function
+
+from uiautomator import param_to_property
+from phoneauto.helpers.uiautomator_device_wrapper import DeviceWrapper
+from tests.benchmark.harness import measure, report
+
+
+class _NullWait(object):
+
+    def idle(self, timeout=None):
+        pass
+
+    def update(self, timeout=None):
+        pass
+
+
+class _Device(object):
+    """uiautomator.Device stand-in whose methods do nothing"""
+
+    def __init__(self):
+        self.wait = _NullWait()
+
+    @property
+    def press(self):
+        """A new stateful object on every access as uiautomator does"""
+        @param_to_property('home', 'back')
+        def _press(key, meta=None):
+            pass
+        return _press
+
+    def click(self, x, y):
+        pass
+
+
+def run(quick=False):
+    """Measures wrapper overhead and returns {name: seconds per call}"""
+    number = 10000 if quick else 100000
+    device = _Device()
+    wdev = DeviceWrapper(device)
+    results = {}
+
+    direct = measure(lambda: device.click(1, 2), number)
+    results['device_wrapper.click'] = (
+        measure(lambda: wdev.click(1, 2), number) - direct)
+
+    direct = measure(lambda: device.press.home(), number)
+    results['device_wrapper.press.home'] = (
+        measure(lambda: wdev.press.home(), number) - direct)
+
+    direct = measure(lambda: device.press(4), number)
+    results['device_wrapper.press(keycode)'] = (
+        measure(lambda: wdev.press(4), number) - direct)
+    return results
+
+
+def main():
+    """Entry point"""
+    for name, seconds in sorted(run().items()):
+        report(name + ' (overhead)', seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Scaling check of dump parsing and search over the dump corpus
+
+Each operation on the synthetic corpus entries is expected to finish
+within a bound linear in the number of nodes. The bounds are generous,
+to catch only scaling regressions (e.g. quadratic behaviour)
+on slow machines, but wall-clock time still depends on the load of
+the machine, so they are checked here rather than in unit tests.
+
+Run with: python -m tests.benchmark.bench_dump_corpus [--quick]
+"""
+
+from __future__ import unicode_literals, print_function
+import argparse
+import random
+import sys
+import time
+
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from tests import dump_corpus
+from tests.benchmark.harness import report
+from tests.dump_generator import SCREEN_HEIGHT, SCREEN_WIDTH
+
+_SECONDS_PER_NODE = 50e-6
+_SECONDS_BASE = 0.5
+
+# Number of points searched by the finder per measurement
+_FINDER_POINTS = 50
+
+
+def time_bound(num_nodes, factor=1):
+    """Upper bound in seconds of an operation over num_nodes nodes"""
+    return _SECONDS_BASE + num_nodes * _SECONDS_PER_NODE * factor
+
+
+def _elapsed(func):
+    """Calls func once and returns the elapsed seconds"""
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def _find_points(finder, points):
+    """Searches the finder at every point"""
+    for point in points:
+        try:
+            finder.find_object_contains(
+                point, True, clickable=True, enabled=True)
+        except UiObjectNotFound:
+            pass
+
+
+def measure_entry(name):
+    """Measures operations on a corpus entry
+
+    Returns:
+        dict: {operation: (elapsed seconds, bound seconds)}
+    """
+    num_nodes = len(dump_corpus.load_dump(name))
+    hd = dump_corpus.load_dump(name, fresh=True)
+    rng = random.Random(0)
+    points = [(rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT))
+              for _ in range(_FINDER_POINTS)]
+    bound = time_bound(num_nodes)
+    return {
+        'parse': (_elapsed(
+            lambda: dump_corpus.load_dump(name, fresh=True)), bound),
+        'find_objects.clickable': (_elapsed(
+            lambda: hd.find_objects(clickable=True, enabled=True)), bound),
+        'find_objects.textContains': (_elapsed(
+            lambda: hd.find_objects(textContains='Gmail')), bound),
+        'finder': (
+            _elapsed(lambda: _find_points(UiObjectFinder(hd), points)),
+            time_bound(num_nodes, factor=_FINDER_POINTS / 5.0))
+    }
+
+
+def _entry_names(quick):
+    """Names of synthetic corpus entries to measure"""
+    sizes = dump_corpus.SYNTHETIC_SIZES
+    return ['synthetic_{0}'.format(size)
+            for size in (sizes[:2] if quick else sizes)]
+
+
+def measure_all(quick=False):
+    """Returns {benchmark name: (elapsed seconds, bound seconds)}"""
+    results = {}
+    for name in _entry_names(quick):
+        for operation, measured in measure_entry(name).items():
+            results['corpus.{0}[{1}]'.format(operation, name)] = measured
+    return results
+
+
+def run(quick=False):
+    """Runs the corpus operations and returns {name: seconds}"""
+    return dict((name, seconds)
+                for name, (seconds, _) in measure_all(quick).items())
+
+
+def main():
+    """Entry point, exits with 1 if any operation exceeds its bound"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='Smaller entries only')
+    options = parser.parse_args()
+    exceeded = []
+    for name, (seconds, bound) in sorted(
+            measure_all(options.quick).items()):
+        report(name, seconds)
+        if seconds >= bound:
+            exceeded.append(name)
+    for name in exceeded:
+        print('exceeded the bound: {0}'.format(name), file=sys.stderr)
+    return 1 if exceeded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
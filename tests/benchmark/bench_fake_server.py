@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""End-to-end load test against the fake uiautomator server
+
+Commands and replays go through uiautomator's JSON-RPC client over HTTP
+to FakeUiautomatorServer, thus no phone is needed.
+
+Run with: python -m tests.benchmark.bench_fake_server
+"""
+
+from __future__ import unicode_literals, print_function
+import io
+import threading
+
+import pytest
+
+from phoneauto.scriptgenerator.action_ir import Action, ActionLog
+from phoneauto.scriptgenerator.pytest_script_writer import PytestScriptWriter
+from phoneauto.scriptgenerator.replay import ReplayEngine
+from phoneauto.scriptgenerator.scriptgenerator import ScriptGenerator
+from phoneauto.scriptgenerator.uiautomator_coder import UiautomatorCoder
+from phoneauto.scriptgenerator.uiautomator_device import UiautomatorDevice
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+from tests import fake_uiautomator_server
+from tests.benchmark.bench_scriptgenerator import clickable_point
+from tests.benchmark.harness import measure, report
+from tests.dump_generator import generate_dump_xml
+
+# Latency of a typical device per RPC call, in seconds
+DEVICE_LATENCY = 0.005
+
+FAN_OUT = (1, 4, 16)
+QUICK_FAN_OUT = (1, 4)
+
+
+def _replay_log(steps):
+    """Returns ActionLog of alternating key presses and clicks"""
+    locator = UiObjectLocator(filters={'clickable': True}, index=0)
+    log = ActionLog()
+    for i in range(steps):
+        if i % 2:
+            log.append(Action('click_object',
+                              {'locator': locator, 'wait': None}))
+        else:
+            log.append(Action('press_key',
+                              {'key_name': 'DPAD_DOWN', 'meta': 0}))
+    return log
+
+
+def run_execute(dump_xml, number):
+    """Measures ScriptGenerator.execute over JSON-RPC"""
+    point = clickable_point(dump_xml)
+    monkeypatch = pytest.MonkeyPatch()
+    server = fake_uiautomator_server.FakeUiautomatorServer([dump_xml])
+    try:
+        server.start()
+        fake_uiautomator_server.install(monkeypatch, {'fake': server})
+        coder = UiautomatorCoder()
+        writer = PytestScriptWriter(io.StringIO(), [coder])
+        writer.start()
+        generator = ScriptGenerator({
+            'devices': [UiautomatorDevice('fake')],
+            'coder': coder, 'writer': writer})
+        results = {
+            'fake_server.update_view_dump': measure(
+                lambda: generator.execute('update_view_dump'),
+                number=max(1, number // 10), repeat=3)}
+        commands = (
+            ('press_key', {'key_name': 'HOME', 'meta': None}),
+            ('click_object', {'start': point, 'wait': None}))
+        for command_name, command_args in commands:
+            results['fake_server.execute.{0}'.format(command_name)] = (
+                measure(lambda: generator.execute(command_name, command_args),
+                        number=number, repeat=3))
+        return results
+    finally:
+        server.stop()
+        monkeypatch.undo()
+
+
+def run_fan_out(dump_xml, device_counts, steps):
+    """Measures replay of the same log on devices in parallel
+
+    Returns seconds per step of a device, which stays close to
+    the injected latency as long as devices do not contend.
+    """
+    log = _replay_log(steps)
+    results = {}
+    for count in device_counts:
+        monkeypatch = pytest.MonkeyPatch()
+        servers = dict(
+            ('fake-{0}'.format(i), fake_uiautomator_server.
+             FakeUiautomatorServer([dump_xml], latency=DEVICE_LATENCY)
+             .start()) for i in range(count))
+        try:
+            fake_uiautomator_server.install(monkeypatch, servers)
+            engines = [ReplayEngine([UiautomatorDevice(serial)],
+                                    pipeline=True)
+                       for serial in sorted(servers)]
+
+            def replay_all():
+                threads = [threading.Thread(target=e.run, args=(log,))
+                           for e in engines]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            results['fake_server.replay_fan_out[{0}]'.format(count)] = (
+                measure(replay_all, number=1, repeat=3) / steps)
+        finally:
+            for server in servers.values():
+                server.stop()
+            monkeypatch.undo()
+    return results
+
+
+def run(quick=False):
+    """Runs all fake server benchmarks"""
+    dump_xml = generate_dump_xml(500 if quick else 1000)
+    results = run_execute(dump_xml, number=20 if quick else 100)
+    results.update(run_fan_out(
+        dump_xml, QUICK_FAN_OUT if quick else FAN_OUT,
+        steps=10 if quick else 40))
+    return results
+
+
+def main():
+    """Entry point"""
+    for name, seconds in sorted(run().items()):
+        report(name, seconds)
+
+
+if __name__ == '__main__':
+    main()
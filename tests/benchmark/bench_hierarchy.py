@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of hierarchy dump parsing and UI object search
+
+Run with: python -m tests.benchmark.bench_hierarchy
+"""
+
+from __future__ import unicode_literals, print_function
+import random
+
+from phoneauto.scriptgenerator.view_hierarchy_dump import ViewHierarchyDump
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
+from tests.benchmark.harness import measure, report
+from tests.dump_generator import (
+    DEVICE_INFO, generate_dump_xml, read_testdata)
+
+SIZES = (100, 1000, 5000, 20000)
+QUICK_SIZES = (100, 1000)
+
+# Operator name -> criteria which exercises the operator
+OPERATOR_CRITERIA = {
+    'text': {'text': 'Camera 7'},
+    'textContains': {'textContains': 'amera'},
+    'textStartsWith': {'textStartsWith': 'Cam'},
+    'textMatches': {'textMatches': '^Cam.+7$'},
+    'className': {'className': 'android.widget.TextView'},
+    'description': {'description': 'Camera'},
+    'resourceId': {'resourceIdMatches': ':id/camera_'},
+    'clickable': {'clickable': True, 'enabled': True}
+}
+
+
+def dumps(quick=False):
+    """Yields (label, device_info, dump xml) of benchmark inputs"""
+    yield 'recorded', DEVICE_INFO, read_testdata('dump_home.xml')
+    for size in (QUICK_SIZES if quick else SIZES):
+        yield str(size), DEVICE_INFO, generate_dump_xml(size)
+
+
+def _repeat_for(size):
+    """Number of calls per measurement, smaller for larger dumps"""
+    return max(1, 2000 // size)
+
+
+def run(quick=False):
+    """Runs all hierarchy benchmarks and returns {name: seconds per call}"""
+    results = {}
+    rng = random.Random(0)
+    for label, device_info, xml in dumps(quick):
+        hd = ViewHierarchyDump(device_info, xml)
+        number = _repeat_for(len(hd))
+
+        results['parse[{0}]'.format(label)] = measure(
+            lambda: ViewHierarchyDump(device_info, xml),
+            number=number, repeat=3)
+
+        for i in range(len(hd)):
+            hd.get_object(i)
+
+        for operator, criteria in sorted(OPERATOR_CRITERIA.items()):
+            results['find_objects.{0}[{1}]'.format(operator, label)] = (
+                measure(lambda: hd.find_objects(**criteria),
+                        number=number, repeat=3))
+
+        coords = [(rng.randrange(device_info['displayWidth']),
+                   rng.randrange(device_info['displayHeight']))
+                  for _ in range(20)]
+        finder = UiObjectFinder(hd)
+
+        def find_all_contains():
+            for coord in coords:
+                try:
+                    finder.find_object_contains(
+                        coord, True, clickable=True, enabled=True)
+                except UiObjectNotFound:
+                    pass
+
+        def find_object_contains():
+            # Every repeat searches, rather than hits memoized locators
+            finder.clear_cache()
+            find_all_contains()
+
+        results['find_object_contains[{0}]'.format(label)] = measure(
+            find_object_contains, number=1, repeat=3) / len(coords)
+
+        find_all_contains()
+        results['find_object_contains.cached[{0}]'.format(label)] = measure(
+            find_all_contains, number=1, repeat=3) / len(coords)
+
+        objects = [hd.get_object(rng.randrange(len(hd))) for _ in range(20)]
+
+        def determine_locator():
+            for obj in objects:
+                finder._determine_locator(obj)
+
+        results['determine_locator[{0}]'.format(label)] = measure(
+            determine_locator, number=1, repeat=3) / len(objects)
+    return results
+
+
+def main():
+    """Entry point"""
+    for name, seconds in sorted(run().items()):
+        report(name, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the video frame pipeline
+
+Screenrecord.run is measured under sustained load with a synthetic
+stream source, thus neither a device nor ffmpeg is needed.
+A recorded h264 file can be replayed instead with --video.
+
+Run with: python -m tests.benchmark.bench_screenrecord [--video FILE]
+"""
+
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from phoneauto.scriptgenerator import screenrecord
+from phoneauto.scriptgenerator.profiler import Profiler
+from tests.benchmark.harness import measure, report
+
+SIZES = ((480, 800), (540, 960), (1080, 1920))
+
+# (width, height, frames per second, None for as fast as possible)
+PIPELINE_LOADS = ((540, 960, 30), (540, 960, None), (1080, 1920, None))
+QUICK_PIPELINE_LOADS = ((540, 960, 30), (540, 960, None))
+
+
+def run_decode(quick=False):
+    """Measures raw RGB frame decode"""
+    results = {}
+    for width, height in SIZES:
+        frame_data = os.urandom(width * height * 3)
+        results['decode_frame[{0}x{1}]'.format(width, height)] = measure(
+            lambda: screenrecord.decode_frame(frame_data, (width, height)),
+            number=10 if quick else 100, repeat=3)
+    return results
+
+
+def _peak_rss_bytes():
+    """Peak resident set size of the process, None if unknown"""
+    if resource is None:
+        return None
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_pipeline(source, width, height, duration):
+    """Runs Screenrecord with the source and consumes its frames
+
+    Returns:
+        dict: fps, mean decode CPU time, mean and max queue latency
+            in seconds, max queue depth, and peak RSS in bytes
+    """
+    profiler = Profiler()
+    recorder = screenrecord.Screenrecord(
+        width, height, profiler=profiler, source=source)
+    latencies = []
+    recorder.start()
+    start = time.time()
+    try:
+        while time.time() - start < duration:
+            frame = recorder.queue.get()
+            latencies.append(time.time() - frame.info['time'])
+    finally:
+        elapsed = time.time() - start
+        recorder.join()
+
+    events = profiler.events()
+    decode_cpu = [e['args']['thread_cpu_ms'] / 1000.0 for e in events
+                  if e['name'] == 'screenrecord.decode' and
+                  'thread_cpu_ms' in e['args']]
+    depths = [e['args']['depth'] for e in events
+              if e['name'] == 'screenrecord_queue']
+    return {
+        'fps': len(latencies) / elapsed,
+        'decode_cpu': sum(decode_cpu) / max(1, len(decode_cpu)),
+        'queue_latency': sum(latencies) / max(1, len(latencies)),
+        'queue_latency_max': max(latencies or [0.0]),
+        'queue_depth_max': max(depths or [0]),
+        'peak_rss': _peak_rss_bytes()
+    }
+
+
+def _load_name(width, height, fps):
+    """Name of a pipeline load such as 540x960@30"""
+    return '{0}x{1}@{2}'.format(width, height, fps or 'max')
+
+
+def run_pipelines(loads, duration, video=None):
+    """Runs pipelines and returns {load name: statistics}"""
+    stats = {}
+    for width, height, fps in loads:
+        if video:
+            source = screenrecord.FileStreamSource(video, fps=fps)
+        else:
+            source = screenrecord.SyntheticStreamSource(fps=fps)
+        stats[_load_name(width, height, fps)] = run_pipeline(
+            source, width, height, duration)
+    return stats
+
+
+def run(quick=False):
+    """Measures frame decode and the whole pipeline
+
+    Pipeline results are seconds per frame, decode CPU seconds
+    per frame and queue latency in seconds.
+    """
+    results = run_decode(quick)
+    stats = run_pipelines(QUICK_PIPELINE_LOADS if quick else PIPELINE_LOADS,
+                          duration=1.0 if quick else 3.0)
+    for name, stat in stats.items():
+        results['screenrecord.frame[{0}]'.format(name)] = 1.0 / stat['fps']
+        results['screenrecord.decode_cpu[{0}]'.format(name)] = (
+            stat['decode_cpu'])
+        results['screenrecord.queue_latency[{0}]'.format(name)] = (
+            stat['queue_latency'])
+    return results
+
+
+def main():
+    """Entry point"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--video', help='Video file to replay')
+    parser.add_argument('--duration', default=3.0, type=float,
+                        help='Seconds to run each pipeline')
+    options = parser.parse_args()
+
+    for name, seconds in sorted(run_decode().items()):
+        report(name, seconds)
+    stats = run_pipelines(PIPELINE_LOADS, options.duration, options.video)
+    print('{0:<20} {1:>8} {2:>12} {3:>12} {4:>12} {5:>6} {6:>10}'.format(
+        'load', 'fps', 'decode(us)', 'latency(us)', 'max(us)', 'depth',
+        'rss(MB)'))
+    for name, stat in sorted(stats.items()):
+        rss = stat['peak_rss']
+        print('{0:<20} {1:>8.1f} {2:>12.1f} {3:>12.1f} {4:>12.1f} {5:>6} '
+              '{6:>10}'.format(
+                  name, stat['fps'], stat['decode_cpu'] * 1e6,
+                  stat['queue_latency'] * 1e6,
+                  stat['queue_latency_max'] * 1e6, stat['queue_depth_max'],
+                  '-' if rss is None else '{0:.1f}'.format(rss / 2.0**20)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of code generation and command execution
+
+Runs offline: the device is the uiautomator mock used by unit tests.
+
+Run with: python -m tests.benchmark.bench_scriptgenerator
+"""
+
+from __future__ import unicode_literals, print_function
+import io
+
+from mock import MagicMock
+import pytest
+
+from phoneauto.scriptgenerator.pytest_script_writer import PytestScriptWriter
+from phoneauto.scriptgenerator.scriptgenerator import ScriptGenerator
+from phoneauto.scriptgenerator.uiautomator_coder import UiautomatorCoder
+from phoneauto.scriptgenerator.uiautomator_device import UiautomatorDevice
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+from phoneauto.scriptgenerator.view_hierarchy_dump import ViewHierarchyDump
+from tests import uiautomator_mock
+from tests.benchmark.harness import measure, report
+from tests.dump_generator import DEVICE_INFO, generate_dump_xml
+
+_LOCATOR = UiObjectLocator(filters={'resourceId': 'com.example:id/button'})
+_INDEXED_LOCATOR = UiObjectLocator(
+    filters={'className': 'android.widget.TextView', 'clickable': True},
+    index=3)
+
+# Coder method name -> keyword arguments
+CODER_CALLS = {
+    'get_code_click_object': {'locator': _LOCATOR, 'wait': None},
+    'get_code_set_text': {'locator': _INDEXED_LOCATOR, 'text': 'abc'},
+    'get_code_drag_object_to_object': {
+        'locator': _LOCATOR, 'other_locator': _INDEXED_LOCATOR,
+        'options': {'steps': 10}},
+    'get_code_press_key': {'key_name': 'a', 'meta': None},
+    'get_code_swipe': {
+        'start': (10, 20), 'end': (30, 40), 'options': {'steps': 10}},
+    'get_code_wait': {'for_what': 'update', 'timeout': 1000}
+}
+
+
+def run_coder(number=20000):
+    """Measures code fragment generation"""
+    coder = UiautomatorCoder()
+    results = {}
+    for method_name, kwargs in sorted(CODER_CALLS.items()):
+        method = getattr(coder, method_name)
+        results['coder.{0}'.format(method_name)] = measure(
+            lambda: method(**kwargs), number=number)
+    return results
+
+
+def create_generator(monkeypatch, dump_xml):
+    """Creates ScriptGenerator which talks to the uiautomator mock"""
+    device_mock, _ = uiautomator_mock.install(monkeypatch)
+    device_mock.info = DEVICE_INFO
+    device_mock.dump.return_value = dump_xml
+    device_mock.return_value = [MagicMock()]
+    device = UiautomatorDevice()
+    coder = UiautomatorCoder()
+    writer = PytestScriptWriter(io.StringIO(), [coder])
+    writer.start()
+    generator = ScriptGenerator(
+        {'devices': [device], 'coder': coder, 'writer': writer})
+    generator.execute('update_view_dump')
+    return generator
+
+
+def clickable_point(dump_xml):
+    """Returns the center of a clickable object in the dump"""
+    hd = ViewHierarchyDump(DEVICE_INFO, dump_xml)
+    for obj in hd.find_objects(clickable=True, enabled=True):
+        bounds = obj['visibleBounds']
+        if bounds['bottom'] < DEVICE_INFO['displayHeight']:
+            return ((bounds['left'] + bounds['right']) // 2,
+                    (bounds['top'] + bounds['bottom']) // 2)
+    raise ValueError('No clickable object in the dump')
+
+
+def run_execute(size=1000, number=200):
+    """Measures ScriptGenerator.execute including mocked device calls"""
+    monkeypatch = pytest.MonkeyPatch()
+    try:
+        dump_xml = generate_dump_xml(size)
+        point = clickable_point(dump_xml)
+        generator = create_generator(monkeypatch, dump_xml)
+
+        def execute_uncached(command_name, command_args):
+            # Every call searches, rather than hits memoized locators
+            generator.finder.clear_cache()
+            generator.execute(command_name, command_args)
+
+        results = {}
+        commands = (
+            ('press_key', {'key_name': 'HOME', 'meta': None}),
+            ('get_hierarchy_view_object_info', {'start': point}),
+            ('click_object', {'start': point, 'wait': None}))
+        for command_name, command_args in commands:
+            results['execute.{0}[{1}]'.format(command_name, size)] = measure(
+                lambda: execute_uncached(command_name, command_args),
+                number=number, repeat=3)
+        for command_name, command_args in commands[1:]:
+            generator.execute(command_name, command_args)
+            name = 'execute.{0}.cached[{1}]'.format(command_name, size)
+            results[name] = measure(
+                lambda: generator.execute(command_name, command_args),
+                number=number, repeat=3)
+        return results
+    finally:
+        monkeypatch.undo()
+
+
+class _NullObject(object):
+    """Object of which every method does nothing and returns ''"""
+    # pylint: disable=too-few-public-methods
+
+    def __getattr__(self, name):
+        method = lambda *args, **kwargs: ''
+        setattr(self, name, method)
+        return method
+
+
+class _NullWriter(object):
+    """Writer which discards recorded lines"""
+    # pylint: disable=too-few-public-methods
+
+    @staticmethod
+    def get_recorder(device_index=0):
+        """Returns recorder which does nothing"""
+        # pylint: disable=unused-argument
+        return lambda *args, **kwargs: None
+
+
+def run_dispatch(number=20000):
+    """Measures ScriptGenerator.execute overhead with no-op collaborators"""
+    null = _NullObject()
+    generator = ScriptGenerator(
+        {'devices': [null], 'coder': null, 'writer': _NullWriter()})
+    commands = (
+        ('press_key', {'key_name': 'HOME', 'meta': None}),
+        ('click_xy', {'start': (10, 20)}),
+        ('insert_wait', {'for_what': 'idle', 'timeout': 1000}))
+    results = {}
+    for command_name, command_args in commands:
+        results['dispatch.{0}'.format(command_name)] = measure(
+            lambda: generator.execute(command_name, command_args),
+            number=number)
+    return results
+
+
+def run(quick=False):
+    """Runs all scriptgenerator benchmarks"""
+    results = run_coder(number=2000 if quick else 20000)
+    results.update(run_dispatch(number=2000 if quick else 20000))
+    results.update(run_execute(number=20 if quick else 200))
+    return results
+
+
+def main():
+    """Entry point"""
+    for name, seconds in sorted(run().items()):
+        report(name, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Small timing helpers shared by benchmarks"""
+
+from __future__ import unicode_literals, print_function
+import timeit
+
+
+def measure(func, number=10000, repeat=5):
+    """Returns the best per-call time of func in seconds"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def report(name, seconds, out=None):
+    """Prints a per-call time in a human readable form
+    to out, or stdout if None"""
+    print('{0:<40} {1:>10.3f} us/call'.format(name, seconds * 1e6),
+          file=out)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Runs all benchmarks and writes machine-readable results
+
+Usage:
+    python -m tests.benchmark.run_benchmarks -o result.json
+    python -m tests.benchmark.run_benchmarks --compare base.json
+
+Results are written as JSON:
+    {"meta": {"commit": ..., "python": ..., ...},
+     "results": {"<benchmark name>": <seconds per call>, ...}}
+"""
+
+from __future__ import unicode_literals, print_function
+import argparse
+import datetime
+import io
+import json
+import platform
+import subprocess
+import sys
+
+from phoneauto.scriptgenerator import bounds_store
+from tests.benchmark import (
+    bench_bounds_store, bench_device_wrapper, bench_dump_corpus,
+    bench_fake_server, bench_hierarchy, bench_scriptgenerator,
+    bench_screenrecord)
+from tests.benchmark.harness import report
+
+BENCHMARKS = [
+    ('device_wrapper', bench_device_wrapper.run),
+    ('dump_corpus', bench_dump_corpus.run),
+    ('fake_server', bench_fake_server.run),
+    ('hierarchy', bench_hierarchy.run),
+    ('scriptgenerator', bench_scriptgenerator.run),
+    ('screenrecord', bench_screenrecord.run)
+]
+
+if bounds_store.available():
+    BENCHMARKS.append(('bounds_store', bench_bounds_store.run))
+
+
+def git_commit():
+    """Returns the current commit hash, or None outside of a git tree"""
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def run_all(quick=False, only=None):
+    """Runs benchmarks and returns the result document"""
+    results = {}
+    for group, run in BENCHMARKS:
+        if only and group not in only:
+            continue
+        print('running {0} ...'.format(group), file=sys.stderr)
+        results.update(run(quick=quick))
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick
+        },
+        'results': results
+    }
+
+
+def compare(base, current, threshold):
+    """Prints comparison table and returns names of regressed benchmarks"""
+    regressed = []
+    base_results = base['results']
+    print('{0:<48} {1:>12} {2:>12} {3:>8}'.format(
+        'benchmark', 'base(us)', 'current(us)', 'ratio'))
+    for name, seconds in sorted(current['results'].items()):
+        base_seconds = base_results.get(name)
+        if not base_seconds:
+            continue
+        ratio = seconds / base_seconds
+        mark = ''
+        if ratio > 1.0 + threshold:
+            regressed.append(name)
+            mark = ' <<'
+        print('{0:<48} {1:>12.3f} {2:>12.3f} {3:>8.2f}{4}'.format(
+            name, base_seconds * 1e6, seconds * 1e6, ratio, mark))
+    return regressed
+
+
+def parse_options(args=None):
+    """Parse options"""
+    parser = argparse.ArgumentParser(description='Run benchmarks')
+    parser.add_argument(
+        '-o', '--output', default='',
+        help='Output JSON file path. Stdout if omitted')
+    parser.add_argument(
+        '--compare', default='',
+        help='JSON file of a previous run to compare with')
+    parser.add_argument(
+        '--threshold', default=0.2, type=float,
+        help='Ratio above 1.0 which is reported as regression')
+    parser.add_argument(
+        '--quick', action='store_true',
+        help='Smaller inputs and fewer iterations')
+    parser.add_argument(
+        '--only', nargs='*',
+        help='Benchmark groups to run: ' +
+        ', '.join(group for group, _ in BENCHMARKS))
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Entry point"""
+    options = parse_options(args)
+    document = run_all(quick=options.quick, only=options.only)
+
+    text = json.dumps(document, indent=2, sort_keys=True)
+    # The table goes to stderr if stdout is for the JSON
+    table_out = None
+    if options.output:
+        with io.open(options.output, 'w', encoding='utf-8') as out_file:
+            out_file.write(text)
+    elif not options.compare:
+        print(text)
+        table_out = sys.stderr
+
+    if options.compare:
+        with io.open(options.compare, encoding='utf-8') as base_file:
+            base = json.load(base_file)
+        regressed = compare(base, document, options.threshold)
+        return 1 if regressed else 0
+
+    for name, seconds in sorted(document['results'].items()):
+        report(name, seconds, out=table_out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
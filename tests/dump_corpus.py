@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Corpus of hierarchy dumps for tests and benchmarks
+
+Entries are looked up by name:
+
+- dumps in tests/unit/testdata, named after the file without
+  the .xml or .xml.gz extension, e.g. 'dump_home'
+- synthetic dumps of realistic sizes made by dump_generator,
+  e.g. 'synthetic_5000' (see SYNTHETIC_SIZES)
+
+XML strings and parsed dumps are cached per process, so that tests
+sharing an entry parse it only once.
+"""
+
+from __future__ import unicode_literals
+import gzip
+import io
+import os
+
+from phoneauto.scriptgenerator.view_hierarchy_dump import ViewHierarchyDump
+from tests.dump_generator import DEVICE_INFO, generate_dump_xml
+
+TESTDATA_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'unit', 'testdata')
+
+# A small screen, a long list, and a huge (pathological) screen
+SYNTHETIC_SIZES = (500, 5000, 20000)
+
+_SYNTHETIC_PREFIX = 'synthetic_'
+
+_xml_cache = {}
+_dump_cache = {}
+
+
+def _file_entries():
+    """Returns {name: path} of dump files in the testdata directory"""
+    entries = {}
+    for filename in os.listdir(TESTDATA_DIR):
+        for ext in ('.xml.gz', '.xml'):
+            if filename.endswith(ext):
+                entries[filename[:-len(ext)]] = os.path.join(
+                    TESTDATA_DIR, filename)
+                break
+    return entries
+
+
+def names():
+    """Returns names of all corpus entries"""
+    synthetic = ['{0}{1}'.format(_SYNTHETIC_PREFIX, size)
+                 for size in SYNTHETIC_SIZES]
+    return sorted(_file_entries()) + synthetic
+
+
+def _read_file(path):
+    """Reads a dump file, which may be gzip compressed"""
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            return f.read().decode('utf-8')
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def load_xml(name):
+    """Returns dump XML string of a corpus entry
+
+    Args:
+        name (text): entry name
+    Returns:
+        text: dump XML
+    Raises:
+        KeyError: if there is no such entry
+    """
+    xml = _xml_cache.get(name)
+    if xml is not None:
+        return xml
+    if name.startswith(_SYNTHETIC_PREFIX):
+        xml = generate_dump_xml(int(name[len(_SYNTHETIC_PREFIX):]))
+    else:
+        xml = _read_file(_file_entries()[name])
+    _xml_cache[name] = xml
+    return xml
+
+
+def load_dump(name, fresh=False):
+    """Returns ViewHierarchyDump of a corpus entry
+
+    Args:
+        name (text): entry name
+        fresh (bool):
+            Returns a newly parsed dump if True. Otherwise the dump
+            is shared with other callers, which must not modify it.
+    Returns:
+        ViewHierarchyDump: parsed dump
+    """
+    if fresh:
+        return ViewHierarchyDump(DEVICE_INFO, load_xml(name))
+    hd = _dump_cache.get(name)
+    if hd is None:
+        hd = _dump_cache[name] = ViewHierarchyDump(
+            DEVICE_INFO, load_xml(name))
+    return hd
+
+
+def clear_cache():
+    """Clears cached XML strings and dumps"""
+    _xml_cache.clear()
+    _dump_cache.clear()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Generator of synthetic hierarchy dumps of arbitrary size,
+and helpers which create dumps for tests"""
+
+from __future__ import unicode_literals
+import io
+import os
+import random
+import xml.etree.ElementTree as ET
+from phoneauto.scriptgenerator.view_hierarchy_dump import ViewHierarchyDump
+
+SCREEN_WIDTH = 1080
+SCREEN_HEIGHT = 1920
+
+DEVICE_INFO = {
+    'displayWidth': SCREEN_WIDTH,
+    'displayHeight': SCREEN_HEIGHT
+}
+
+_CONTAINER_CLASSES = (
+    'android.widget.FrameLayout', 'android.widget.LinearLayout',
+    'android.widget.RelativeLayout', 'android.widget.ListView',
+    'android.support.v7.widget.RecyclerView')
+
+_LEAF_CLASSES = (
+    'android.widget.TextView', 'android.widget.ImageView',
+    'android.widget.Button', 'android.widget.EditText',
+    'android.widget.CheckBox', 'android.view.View')
+
+_WORDS = (
+    'Settings', 'Gmail', 'Camera', 'Photos', 'Maps', 'Chrome', 'Play',
+    'Store', 'Music', 'Clock', 'Calendar', 'Contacts', 'Phone', 'Messages',
+    'Search', 'Wi-Fi', 'Bluetooth', 'Display', 'Sound', 'Battery',
+    'Storage', 'Apps', 'Location', 'Security', 'Accounts', 'Language',
+    'Backup', 'Reset', 'Date', 'About')
+
+_PACKAGE = 'com.example.synthetic'
+
+TESTDATA_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'unit', 'testdata')
+
+
+def _bounds_str(rect):
+    """Formats (left, top, right, bottom) as a bounds attribute value"""
+    return '[{0},{1}][{2},{3}]'.format(*rect)
+
+
+def _split(rect, count, horizontal):
+    """Splits rect into count strips"""
+    left, top, right, bottom = rect
+    if horizontal:
+        step = max(1, (right - left) // count)
+        return [(left + i * step, top, left + (i + 1) * step, bottom)
+                for i in range(count)]
+    step = max(1, (bottom - top) // count)
+    return [(left, top + i * step, right, top + (i + 1) * step)
+            for i in range(count)]
+
+
+def _set_attrs(elem, rng, index, rect, is_leaf, serial):
+    """Fills node attributes"""
+    word = rng.choice(_WORDS)
+    clickable = is_leaf and rng.random() < 0.6
+    class_name = rng.choice(_LEAF_CLASSES if is_leaf else _CONTAINER_CLASSES)
+    attrs = {
+        'index': str(index),
+        'text': '{0} {1}'.format(word, serial) if is_leaf else '',
+        'resource-id': ('{0}:id/{1}_{2}'.format(_PACKAGE, word.lower(), serial)
+                        if rng.random() < 0.5 else ''),
+        'class': class_name,
+        'package': _PACKAGE,
+        'content-desc': word if rng.random() < 0.2 else '',
+        'checkable': 'true' if class_name.endswith('CheckBox') else 'false',
+        'checked': 'false',
+        'clickable': 'true' if clickable else 'false',
+        'enabled': 'true',
+        'focusable': 'true' if clickable else 'false',
+        'focused': 'false',
+        'scrollable': 'true' if class_name.endswith(('ListView', 'View'))
+                      and not is_leaf else 'false',
+        'long-clickable': 'false',
+        'password': 'false',
+        'selected': 'false',
+        'bounds': _bounds_str(rect)
+    }
+    for key, value in attrs.items():
+        elem.set(key, value)
+
+
+def generate_dump_xml(num_nodes, seed=0, max_children=6):
+    """Generates a hierarchy dump xml string which has num_nodes nodes
+
+    Nodes form a tree of nested layouts whose children split
+    the parent's bounds into strips. Content taller than the screen
+    is generated for large dumps, like a long scrollable list.
+
+    Args:
+        num_nodes (int): number of node elements
+        seed (int): random seed, the same seed yields the same dump
+        max_children (int): maximum number of children of a node
+    Returns:
+        text: dump xml string
+    """
+    rng = random.Random(seed)
+    root = ET.Element('hierarchy', rotation='0')
+    pages = max(1, num_nodes // 1000)
+    root_rect = (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT * pages)
+    top = ET.SubElement(root, 'node')
+    queue = [(top, root_rect, 0)]
+    created = 1
+    head = 0
+    while head < len(queue) and created < num_nodes:
+        parent, rect, depth = queue[head]
+        head += 1
+        remaining = num_nodes - created
+        count = min(remaining, rng.randint(1, max_children))
+        horizontal = (depth % 2) == 1
+        for child_index, child_rect in enumerate(
+                _split(rect, count, horizontal)):
+            child = ET.SubElement(parent, 'node')
+            child.set('index', str(child_index))
+            child.set('bounds', _bounds_str(child_rect))
+            queue.append((child, child_rect, depth + 1))
+        created += count
+
+    for serial, (elem, rect, _) in enumerate(queue):
+        _set_attrs(elem, rng, int(elem.get('index', '0')), rect,
+                   len(elem) == 0, serial)
+
+    return ('<?xml version=\'1.0\' encoding=\'UTF-8\' standalone=\'yes\' ?>' +
+            ET.tostring(root).decode('utf-8'))
+
+
+def read_testdata(filename):
+    """Reads a dump xml string in tests/unit/testdata"""
+    with io.open(os.path.join(TESTDATA_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+
+def create_dump(xml):
+    """Creates a ViewHierarchyDump of xml on a device of DEVICE_INFO"""
+    return ViewHierarchyDump(DEVICE_INFO, xml)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Clock for tests, of which time is controlled by the test"""
+
+from __future__ import unicode_literals
+
+
+class FakeClock(object):
+    """Callable which returns the current time in seconds like time.time
+
+    The time advances only when the test changes now or calls advance,
+    and by step on each call if step is given.
+    """
+
+    def __init__(self, now=0.0, step=0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def advance(self, ms):
+        """Advances the time by ms milliseconds"""
+        self.now += ms / 1000.0
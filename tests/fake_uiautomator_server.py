@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the uiautomator JSON-RPC server running on a device
+
+The server implements the subset of the RPC which UiautomatorDevice
+uses, on top of hierarchy dumps such as recorded ones in a session
+store or synthetic ones in the dump corpus:
+
+- UI objects are selected by matching uiautomator selectors against
+  the current dump, in the same way as ViewHierarchyDump.find_objects.
+- Actions (clicks, key presses, swipes, ...) are counted and logged,
+  and optionally advance the current dump to the next one, so that
+  a recorded sequence of screens is played back.
+- Latency can be injected per RPC method to emulate a real device.
+
+Usage:
+    with FakeUiautomatorServer([dump_xml], latency=0.01) as server:
+        install(monkeypatch, {'fake-0': server})
+        device = UiautomatorDevice('fake-0')
+
+No adb and no phone is needed.
+"""
+
+from __future__ import unicode_literals
+import collections
+import io
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+import PIL.Image
+import uiautomator
+
+from phoneauto.scriptgenerator.view_hierarchy_dump import (
+    ViewHierarchyDump, compile_query)
+from tests.dump_generator import DEVICE_INFO
+
+# JSON-RPC error codes. uiautomator restarts the server on codes
+# greater than or equal to -32001, which must be avoided here.
+_METHOD_NOT_FOUND = -32601
+_INTERNAL_ERROR = -32603
+_OBJECT_NOT_FOUND = -32002
+
+# Selector entries which are not search criteria
+_SELECTOR_META_KEYS = frozenset(
+    ['mask', 'childOrSibling', 'childOrSiblingSelector', 'instance'])
+
+# RPC methods which change what is on the screen
+_ACTION_METHODS = frozenset([
+    'click', 'clickAndWaitForNewWindow', 'longClick', 'swipe', 'drag',
+    'dragTo', 'pressKey', 'pressKeyCode', 'setText', 'clearTextField',
+    'pinchIn', 'pinchOut', 'setOrientation', 'openNotification',
+    'openQuickSettings', 'flingForward', 'flingBackward',
+    'flingToBeginning', 'flingToEnd', 'scrollForward', 'scrollBackward',
+    'scrollToBeginning', 'scrollToEnd', 'scrollTo'])
+
+
+class RpcError(Exception):
+    """Error returned to the client as a JSON-RPC error object"""
+
+    def __init__(self, code, exception_type_name, message):
+        """Initialization"""
+        super(RpcError, self).__init__(message)
+        self.code = code
+        self.exception_type_name = exception_type_name
+
+
+def _criteria(selector):
+    """Converts a uiautomator selector to find_objects criteria"""
+    return dict((k, v) for k, v in selector.items()
+                if k not in _SELECTOR_META_KEYS)
+
+
+class _Screen(object):
+    """Hierarchy dump served as the current screen"""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, dump_xml, device_info):
+        """Initialization"""
+        self.dump_xml = dump_xml
+        self.device_info = device_info
+        self._dump = None
+
+    @property
+    def dump(self):
+        """ViewHierarchyDump of the screen, parsed on first access"""
+        if self._dump is None:
+            self._dump = ViewHierarchyDump(self.device_info, self.dump_xml)
+        return self._dump
+
+    def find(self, selector):
+        """Returns indices of nodes matching the selector
+
+        Child and sibling selectors are applied in turn
+        to the first node matched so far.
+        """
+        dump = self.dump
+        query = compile_query(_criteria(selector))
+        found = [i for i, node in enumerate(dump.nodes)
+                 if query.matches(node)]
+        for relation, related_selector in zip(
+                selector.get('childOrSibling', []),
+                selector.get('childOrSiblingSelector', [])):
+            if not found:
+                break
+            found = [dump.get_position(obj)
+                     for obj in dump.find_related_objects(
+                         found[0], relation, **_criteria(related_selector))]
+        return found
+
+
+class FakeUiautomatorServer(object):
+    """JSON-RPC server which behaves like uiautomator on a device"""
+
+    def __init__(self, dumps, device_info=None, latency=0.0,
+                 advance=False, host='127.0.0.1', port=0):
+        """Initialization
+
+        Args:
+            dumps (list): hierarchy dump XML strings, served in order
+            device_info (dict):
+                deviceInfo returned to the client.
+                dump_generator.DEVICE_INFO is used if None.
+            latency (float or dict):
+                Delay in seconds added to every RPC call, or
+                {method name: delay} with an optional None key
+                for methods not in the dict.
+            advance (bool):
+                Serves the next dump after each action if True.
+                The last dump is kept once it is reached.
+            host (text): address to bind
+            port (integer): port to bind, any free port if 0
+        """
+        info = dict(DEVICE_INFO if device_info is None else device_info)
+        info.setdefault('displayRotation', 0)
+        info.setdefault('sdkInt', 19)
+        self.device_info = info
+        self._screens = [_Screen(x, info) for x in dumps]
+        self._position = 0
+        self._latency = latency
+        self._advance = advance
+        self._lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.call_log = []
+        self._httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.rpc = self
+        self._thread = None
+
+    @classmethod
+    def from_session_store(cls, store, **kwargs):
+        """Creates a server which serves dumps in a session store
+
+        Args:
+            store (object): SessionStore
+            kwargs: other arguments to __init__
+        """
+        records = store.records('dump')
+        if records and 'device_info' not in kwargs:
+            kwargs['device_info'] = records[0].meta['device_info']
+        return cls([store.read(r).decode('utf-8') for r in records],
+                   **kwargs)
+
+    @property
+    def host(self):
+        """Bound address"""
+        return self._httpd.server_address[0]
+
+    @property
+    def port(self):
+        """Bound port"""
+        return self._httpd.server_address[1]
+
+    @property
+    def position(self):
+        """Index of the dump currently served"""
+        return self._position
+
+    def start(self):
+        """Starts serving in a background thread"""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket"""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def set_dumps(self, dumps):
+        """Replaces the dumps and serves the first one"""
+        with self._lock:
+            self._screens = [_Screen(x, self.device_info) for x in dumps]
+            self._position = 0
+
+    def _delay(self, method):
+        """Sleeps for the latency of the method"""
+        latency = self._latency
+        if isinstance(latency, dict):
+            latency = latency.get(method, latency.get(None, 0.0))
+        if latency:
+            time.sleep(latency)
+
+    def call(self, method, params):
+        """Executes an RPC call
+
+        Args:
+            method (text): RPC method name
+            params (list or dict): parameters given by the client
+        Returns:
+            object: JSON compatible result
+        Raises:
+            RpcError: if the call fails
+        """
+        self._delay(method)
+        handler = getattr(self, '_rpc_' + method, None)
+        if handler is None:
+            handler = (self._rpc_action if method in _ACTION_METHODS
+                       else None)
+        if handler is None:
+            raise RpcError(_METHOD_NOT_FOUND, 'NoSuchMethodException',
+                           'no such method: ' + method)
+        args = params if isinstance(params, list) else [params]
+        with self._lock:
+            self.calls[method] += 1
+            self.call_log.append((method, params))
+            screen = self._screens[self._position]
+            result = handler(screen, method, *args)
+            if self._advance and method in _ACTION_METHODS:
+                self._position = min(
+                    self._position + 1, len(self._screens) - 1)
+        return result
+
+    @staticmethod
+    def _rpc_ping(*_):
+        """ping"""
+        return 'pong'
+
+    def _rpc_deviceInfo(self, *_):
+        """deviceInfo"""
+        # pylint: disable=invalid-name
+        return self.device_info
+
+    @staticmethod
+    def _rpc_dumpWindowHierarchy(screen, *_):
+        """dumpWindowHierarchy"""
+        # pylint: disable=invalid-name
+        return screen.dump_xml
+
+    @staticmethod
+    def _rpc_waitForIdle(*_):
+        """waitForIdle"""
+        # pylint: disable=invalid-name
+        return True
+
+    _rpc_waitForWindowUpdate = _rpc_waitForIdle
+
+    @staticmethod
+    def _rpc_count(screen, _, selector):
+        """count"""
+        return len(screen.find(selector))
+
+    @staticmethod
+    def _rpc_exist(screen, _, selector):
+        """exist"""
+        return len(screen.find(selector)) > selector.get('instance', 0)
+
+    _rpc_waitForExists = _rpc_exist
+
+    @classmethod
+    def _rpc_waitUntilGone(cls, screen, method, selector, *_):
+        """waitUntilGone"""
+        # pylint: disable=invalid-name
+        return not cls._rpc_exist(screen, method, selector)
+
+    @staticmethod
+    def _select(screen, selector):
+        """Returns the node index of a UI object selected by selector"""
+        found = screen.find(selector)
+        instance = selector.get('instance', 0)
+        if len(found) <= instance:
+            raise RpcError(_OBJECT_NOT_FOUND, 'UiObjectNotFoundException',
+                           json.dumps(selector, sort_keys=True))
+        return found[instance]
+
+    @classmethod
+    def _rpc_objInfo(cls, screen, _, selector):
+        """objInfo"""
+        # pylint: disable=invalid-name
+        return screen.dump.get_object(cls._select(screen, selector))
+
+    @classmethod
+    def _rpc_action(cls, screen, _, *args):
+        """Actions, which check the selected object exists if any"""
+        if args and isinstance(args[0], dict):
+            cls._select(screen, args[0])
+        return True
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server which handles each request in a thread"""
+    daemon_threads = True
+    rpc = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles JSON-RPC, stop and screenshot requests"""
+
+    protocol_version = 'HTTP/1.0'
+
+    def log_message(self, *_):
+        """Suppresses request logging"""
+        pass
+
+    def _send(self, body, content_type):
+        """Sends a response"""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """JSON-RPC"""
+        # pylint: disable=invalid-name
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length).decode('utf-8'))
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            response['result'] = self.server.rpc.call(
+                request['method'], request.get('params', []))
+        except RpcError as exc:
+            response['error'] = {
+                'code': exc.code, 'message': str(exc),
+                'data': {'exceptionTypeName': exc.exception_type_name}}
+        except Exception as exc:  # pylint: disable=broad-except
+            # Reported to the client rather than dropping the connection,
+            # e.g. bad arguments or unsupported selector keys
+            response['error'] = {
+                'code': _INTERNAL_ERROR,
+                'message': '{0}: {1}'.format(type(exc).__name__, exc),
+                'data': {'exceptionTypeName': type(exc).__name__}}
+        self._send(json.dumps(response).encode('utf-8'),
+                   'application/json')
+
+    def do_GET(self):
+        """Screenshot and stop"""
+        # pylint: disable=invalid-name
+        if self.path.startswith('/screenshot'):
+            info = self.server.rpc.device_info
+            image = PIL.Image.new(
+                'RGB', (info['displayWidth'], info['displayHeight']))
+            out = io.BytesIO()
+            image.save(out, format='PNG')
+            self._send(out.getvalue(), 'image/png')
+        else:
+            self._send(b'', 'text/plain')
+
+
+def connect(server, serial='fake'):
+    """Returns uiautomator.Device which talks to the fake server
+
+    The device does not use adb: starting and stopping the RPC server
+    on the device are no-ops.
+
+    Args:
+        server (object): started FakeUiautomatorServer
+        serial (text): serial number reported by the device
+    """
+    # AutomatorDevice is uiautomator.Device, which may be patched
+    device = uiautomator.AutomatorDevice(
+        serial, local_port=server.port, adb_server_host=server.host)
+    device.server.start = lambda timeout=5: None
+    device.server.stop = lambda: None
+    device.server.sdk_version = lambda: server.device_info['sdkInt']
+    return device
+
+
+def install(monkeypatch, servers):
+    """Makes uiautomator.Device connect to fake servers
+
+    Args:
+        monkeypatch (object): pytest monkeypatch
+        servers (dict): {serial: started FakeUiautomatorServer}
+    """
+    monkeypatch.setattr(
+        'uiautomator.Device',
+        lambda serial=None, **_: connect(servers[serial], serial))
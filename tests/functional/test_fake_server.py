@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+import os
+import threading
+
+import pytest
+import uiautomator
+
+from phoneauto.scriptgenerator.action_ir import Action, ActionLog
+from phoneauto.scriptgenerator.exception import UiInconsitencyError
+from phoneauto.scriptgenerator.pytest_script_writer import PytestScriptWriter
+from phoneauto.scriptgenerator.replay import PreresolvedLocator, ReplayEngine
+from phoneauto.scriptgenerator.scriptgenerator import ScriptGenerator
+from phoneauto.scriptgenerator.session_store import SessionStore
+from phoneauto.scriptgenerator.uiautomator_coder import UiautomatorCoder
+from phoneauto.scriptgenerator.uiautomator_device import UiautomatorDevice
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+from tests import fake_uiautomator_server
+from tests.dump_generator import DEVICE_INFO, generate_dump_xml
+from tests.fake_uiautomator_server import FakeUiautomatorServer
+
+_DUMP = generate_dump_xml(200)
+
+_OK_LOCATOR = UiObjectLocator(filters={'text': 'OK'})
+
+
+def _dump_with_button(text):
+    return (
+        '<?xml version="1.0" ?><hierarchy rotation="0">'
+        '<node index="0" text="{0}" resource-id="" class="android.widget'
+        '.Button" package="p" content-desc="" checkable="false" '
+        'checked="false" clickable="true" enabled="true" focusable="true" '
+        'focused="false" scrollable="false" long-clickable="false" '
+        'password="false" selected="false" bounds="[0,0][100,100]" />'
+        '</hierarchy>').format(text)
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    started = {}
+
+    def start(count=1, dumps=None, **kwargs):
+        for i in range(count):
+            server = FakeUiautomatorServer(dumps or [_DUMP], **kwargs)
+            started['fake-{0}'.format(i)] = server.start()
+        fake_uiautomator_server.install(monkeypatch, started)
+        return [started['fake-{0}'.format(i)] for i in range(count)]
+    yield start
+    for server in started.values():
+        server.stop()
+
+
+def test_device_talks_to_fake_server(servers):
+    server, = servers(dumps=[_dump_with_button('OK')])
+    device = UiautomatorDevice('fake-0')
+    assert device.info['displayWidth'] == DEVICE_INFO['displayWidth']
+    assert 'text="OK"' in device.dump()
+    device.click_object(_OK_LOCATOR, None)
+    device.set_text(_OK_LOCATOR, 'abc')
+    device.press_key('HOME', 0)
+    assert device.get_info(_OK_LOCATOR)['text'] == 'OK'
+    assert server.calls['click'] == 1
+    assert server.calls['setText'] == 1
+    assert server.calls['pressKeyCode'] == 1
+
+
+def test_missing_object_is_reported(servers):
+    servers(dumps=[_dump_with_button('OK')])
+    device = UiautomatorDevice('fake-0')
+    with pytest.raises(UiInconsitencyError):
+        device.get_info(UiObjectLocator(filters={'text': 'Cancel'}))
+    with pytest.raises(uiautomator.JsonRPCError):
+        device.get_info(PreresolvedLocator({'text': 'OK'}, index=1))
+
+
+def test_unexpected_server_errors_are_reported(servers):
+    servers(dumps=[_dump_with_button('OK')])
+    device = uiautomator.Device('fake-0')
+    with pytest.raises(uiautomator.JsonRPCError) as exc_info:
+        # objInfo without a selector
+        device.server.jsonrpc.objInfo()
+    assert exc_info.value.code < -32001
+    assert 'TypeError' in str(exc_info.value)
+    assert device.server.jsonrpc.ping() == 'pong'
+
+
+def test_actions_advance_recorded_dumps(servers, tmpdir):
+    store = SessionStore(str(tmpdir))
+    store.add_dump(DEVICE_INFO, _dump_with_button('Next'))
+    store.add_dump(DEVICE_INFO, _dump_with_button('Done'))
+    server = FakeUiautomatorServer.from_session_store(store, advance=True)
+    store.close()
+    with server:
+        device = fake_uiautomator_server.connect(server)
+        assert 'Next' in device.dump()
+        device(text='Next').click()
+        assert 'Done' in device.dump()
+        device.press.home()
+        assert server.position == 1
+
+
+def test_script_generator_end_to_end(servers):
+    server, = servers(dumps=[_dump_with_button('OK')])
+    device = UiautomatorDevice('fake-0')
+    coder = UiautomatorCoder()
+    out = io.StringIO()
+    writer = PytestScriptWriter(out, [coder])
+    writer.start()
+    generator = ScriptGenerator(
+        {'devices': [device], 'coder': coder, 'writer': writer})
+    generator.execute('update_view_dump')
+    generator.execute('click_object', {'start': (50, 50), 'wait': None})
+    generator.execute('press_key', {'key_name': 'BACK', 'meta': None})
+    assert server.calls['click'] == 1
+    assert server.calls['pressKeyCode'] == 1
+    assert "text='OK'" in out.getvalue()
+
+
+def test_relational_locator_end_to_end(servers):
+    with open(os.path.join(os.path.dirname(__file__), os.pardir, 'unit',
+                           'testdata', 'dump_settings.xml')) as f:
+        server, = servers(dumps=[f.read()])
+    device = UiautomatorDevice('fake-0')
+    coder = UiautomatorCoder()
+    out = io.StringIO()
+    writer = PytestScriptWriter(out, [coder])
+    writer.start()
+    generator = ScriptGenerator(
+        {'devices': [device], 'coder': coder, 'writer': writer})
+    generator.execute('update_view_dump')
+    generator.execute('click_object', {'start': (900, 300), 'wait': None})
+    assert server.calls['click'] == 1
+    assert (".sibling(resourceId='android:id/switch_widget')"
+            in out.getvalue())
+
+    locator = UiObjectLocator(
+        filters={'resourceId': 'android:id/switch_widget'},
+        relation=('sibling', {'text': 'Bluetooth'}))
+    assert device.get_info(locator)['bounds']['top'] == 200
+    preresolved = PreresolvedLocator(
+        locator.filters, relation=('child', {'text': 'Bluetooth'}))
+    with pytest.raises(UiInconsitencyError):
+        device.get_info(preresolved)
+
+
+def test_replay_fans_out_to_devices(servers):
+    fakes = servers(count=3, dumps=[_dump_with_button('OK')],
+                    latency={'pressKeyCode': 0.02})
+    log = ActionLog()
+    log.append(Action('press_key', {'key_name': 'HOME', 'meta': 0}))
+    log.append(Action('click_object', {'locator': _OK_LOCATOR,
+                                       'wait': None}))
+    log.append(Action('press_key', {'key_name': 'BACK', 'meta': 0}))
+    devices = [UiautomatorDevice('fake-{0}'.format(i)) for i in range(3)]
+    reports = [None] * len(devices)
+
+    def replay(i):
+        engine = ReplayEngine([devices[i]], pipeline=True)
+        reports[i] = engine.run(log)
+
+    threads = [threading.Thread(target=replay, args=(i,))
+               for i in range(len(devices))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(r.succeeded for r in reports)
+    for fake in fakes:
+        assert fake.calls['pressKeyCode'] == 2
+        assert fake.calls['click'] == 1
+    assert reports[0].steps[0].elapsed_ms >= 20
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+
+from mock import MagicMock, patch
+import pytest
+
+from phoneauto.scriptgenerator import headless_main
+from phoneauto.scriptgenerator.headless import ActionError
+from phoneauto.scriptgenerator.keycode import get_keycode
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from tests.functional.test_uiactions import create_dump_xml
+from tests.uiautomator_mock import uia_element_info
+
+
+def run_headless(mocks, action_lines, **options):
+    result_out = io.BytesIO()
+    options.update({
+        'result_out': result_out,
+        'actions': io.StringIO('\n'.join(action_lines))
+    })
+    with patch.object(UiObjectFinder, '_FIND_OBJECT_DISTANCE_THRESH',
+                      new=100000000):
+        skipped = headless_main(options)
+    lines = [l.strip() for l in
+             result_out.getvalue().decode('utf-8').split('\n') if l.strip()]
+    return lines, skipped
+
+
+def set_element(mocks, **uia_attr):
+    elem = MagicMock()
+    elem.info = uia_element_info(**uia_attr)
+    mocks.device.return_value = [elem]
+    mocks.device.dump.return_value = create_dump_xml(elem.info)
+    return elem
+
+
+def test_headless_records_actions(mocks):
+    set_element(mocks, text='OK', clickable=True, enabled=True,
+                bounds={'left': 0, 'top': 0, 'right': 100, 'bottom': 100})
+    lines, skipped = run_headless(mocks, [
+        '# comment',
+        '{"command": "press_key", "args": {"key_name": "HOME"}}',
+        '',
+        '{"command": "click_object", "args": {"start": [50, 50]}}',
+        '{"command": "insert_wait", '
+        '"args": {"for_what": "idle", "timeout": 5000}}'
+    ])
+    assert skipped == 0
+    assert '.press({0}, None)'.format(get_keycode('HOME')) in lines[-3]
+    assert "text='OK'" in lines[-2] and '.click()' in lines[-2]
+    assert '.wait.idle(timeout=5000)' in lines[-1]
+    assert mocks.device.press.called
+
+
+def test_headless_updates_dump_only_when_needed(mocks):
+    set_element(mocks, text='OK', clickable=True, enabled=True,
+                bounds={'left': 0, 'top': 0, 'right': 100, 'bottom': 100})
+    mocks.device.dump.reset_mock()
+    run_headless(mocks, [
+        '{"command": "press_key", "args": {"key_name": "HOME"}}',
+        '{"command": "insert_wait_object", "args": '
+        '{"start": [50, 50], "for_what": "exists", "timeout": 1000}}',
+        '{"command": "insert_wait_object", "args": '
+        '{"start": [50, 50], "for_what": "gone", "timeout": 1000}}',
+        '{"command": "click_object", "args": {"start": [50, 50]}}',
+        '{"command": "press_key", "args": {"key_name": "BACK"}}'
+    ])
+    assert mocks.device.dump.call_count == 1
+
+
+def test_headless_object_not_found(mocks):
+    mocks.device.dump.return_value = (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>"
+        '<hierarchy rotation="0"></hierarchy>')
+    actions = [
+        '{"command": "click_object", "args": {"start": [50, 50]}}',
+        '{"command": "press_key", "args": {"key_name": "HOME"}}'
+    ]
+    with pytest.raises(ActionError) as excinfo:
+        run_headless(mocks, actions)
+    assert excinfo.value.line_number == 1
+
+    lines, skipped = run_headless(mocks, actions, keep_going=True)
+    assert skipped == 1
+    assert '.press(' in lines[-1]
+
+
+@pytest.mark.parametrize('line', [
+    'not json',
+    '{"args": {}}',
+    '{"command": "no_such_command"}'
+])
+def test_headless_invalid_action(mocks, line):
+    with pytest.raises(ActionError):
+        run_headless(mocks, [line])
+
+
+def test_headless_writes_result_path_atomically(mocks, tmpdir):
+    set_element(mocks, text='OK', clickable=True, enabled=True,
+                bounds={'left': 0, 'top': 0, 'right': 100, 'bottom': 100})
+    path = str(tmpdir.join('script.py'))
+    headless_main({
+        'result_path': path,
+        'actions': io.StringIO(
+            '{"command": "press_key", "args": {"key_name": "HOME"}}')
+    })
+    with io.open(path, encoding='utf-8') as f:
+        script = f.read()
+    assert 'def test_run(_s):' in script
+    assert '.press({0}, None)'.format(get_keycode('HOME')) in script
+    assert tmpdir.listdir() == [tmpdir.join('script.py')]
+
+
+def test_headless_failure_keeps_destination(mocks, tmpdir):
+    path = tmpdir.join('script.py')
+    path.write('old')
+    with pytest.raises(ActionError):
+        headless_main({
+            'result_path': str(path),
+            'actions': io.StringIO(
+                '{"command": "press_key", "args": {"key_name": "HOME"}}\n'
+                '{"command": "no_such_command"}')
+        })
+    assert path.read() == 'old'
+    partial = [p for p in tmpdir.listdir() if p != path]
+    assert len(partial) == 1
+    assert '.press(' in partial[0].read()
+
+
+SIMILARTEXT_XML = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="Inbox (12)" resource-id="" class="android.view.View"
+    package="p" content-desc="" clickable="true" enabled="true"
+    bounds="[0,0][100,50]" />
+  <node index="1" text="Inbox (13)" resource-id="" class="android.view.View"
+    package="p" content-desc="" clickable="true" enabled="true"
+    bounds="[0,50][100,100]" />
+</hierarchy>
+"""
+
+
+@pytest.mark.parametrize('warn', [True, False])
+def test_headless_warns_ambiguous_locators(mocks, caplog, warn):
+    set_element(mocks, text='Inbox (12)', clickable=True, enabled=True,
+                bounds={'left': 0, 'top': 0, 'right': 100, 'bottom': 50})
+    mocks.device.dump.return_value = SIMILARTEXT_XML
+    lines, _ = run_headless(mocks, [
+        '{"command": "click_object", "args": {"start": [50, 25]}}'
+    ], warn_ambiguous_locators=warn)
+    assert "text='Inbox (12)'" in lines[-1]
+    assert ("'Inbox (13)'" in caplog.text) == warn
+
+
+def test_headless_optimizes_recorded_actions(mocks):
+    lines, _ = run_headless(mocks, [
+        '{"command": "press_key", "args": {"key_name": "%s"}}' % key
+        for key in ('a', ' ', 'b')
+    ], optimize=True)
+    assert lines[-1] == "_s.devices[0].input_text('a b')"
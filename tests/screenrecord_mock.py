@@ -16,6 +16,7 @@ def install(monkeypatch):
         mode='RGB', size=(_SCREEN_WIDTH, _SCREEN_HEIGHT))
     m.capture_oneshot.return_value = dummy_img
     m.get_scale.return_value = (1.0, 1.0)
+    m.width, m.height = _SCREEN_WIDTH, _SCREEN_HEIGHT
 
     monkeypatch.setattr(
         'phoneauto.scriptgenerator.screenrecord.Screenrecord', m_class)
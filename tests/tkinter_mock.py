@@ -65,6 +65,7 @@ class Widget(object):
         def after_func_wrap():
             after_func(*args)
         self.after_func = after_func_wrap
+        return 'after#{0}'.format(id(after_func_wrap))
 
     def after_cancel(self, timer_id):
         self.after_func = None
@@ -137,3 +138,4 @@ class Text(Widget):
     def __init__(self, *args, **kwargs):
         Widget.__init__(self, *args, **kwargs)
         self.insert = Mock()
+        self.delete = Mock()
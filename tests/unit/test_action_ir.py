@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+
+from mock import Mock
+import pytest
+
+from phoneauto.scriptgenerator.action_ir import (
+    ACTION_FIELDS, Action, ActionLog, CodeRenderer)
+from phoneauto.scriptgenerator.uiautomator_coder import UiautomatorCoder
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+
+
+def click_action(index=None):
+    locator = UiObjectLocator(filters={'text': 'OK'}, index=index)
+    return Action('click_object', {'locator': locator, 'wait': None})
+
+
+def test_json_round_trip():
+    actions = [
+        click_action(index=2),
+        Action('swipe', {'start': (1, 2), 'end': (3, 4),
+                         'options': {'steps': 10}}, device_index=1),
+        Action('press_key', {'key_name': 'a', 'meta': 1})]
+    for action in actions:
+        loaded = Action.from_json(action.to_json())
+        assert loaded == action
+        assert loaded.device_index == action.device_index
+    loaded = Action.from_json(actions[0].to_json())
+    assert loaded.args['locator'].filters == {'text': 'OK'}
+    assert loaded.args['locator'].index == 2
+    assert Action.from_json(actions[1].to_json()).args['start'] == (1, 2)
+
+
+def test_json_round_trip_of_relational_locator():
+    locator = UiObjectLocator(
+        filters={'className': 'android.widget.Switch'},
+        relation=('sibling', {'text': 'Wi-Fi'}))
+    action = Action('click_object', {'locator': locator, 'wait': None})
+    loaded = Action.from_json(action.to_json())
+    assert loaded == action
+    assert loaded.args['locator'].relation == ('sibling', {'text': 'Wi-Fi'})
+    assert CodeRenderer(UiautomatorCoder()).render(loaded) == (
+        "{instance}(text='Wi-Fi')"
+        ".sibling(className='android.widget.Switch').click()")
+
+
+def test_renderer_renders_with_coder():
+    renderer = CodeRenderer(UiautomatorCoder())
+    assert renderer.render(click_action()) == "{instance}(text='OK').click()"
+    assert renderer.render(Action(
+        'swipe', {'start': (1, 2), 'end': (3, 4), 'options': {}})) == (
+            '{instance}.swipe(1, 2, 3, 4)')
+
+
+def test_renderer_caches_fragments():
+    coder = Mock()
+    coder.get_code_click_object.return_value = 'code'
+    renderer = CodeRenderer(coder, maxsize=2)
+    for _ in range(3):
+        assert renderer.render(click_action()) == 'code'
+    assert coder.get_code_click_object.call_count == 1
+    renderer.render(click_action(index=1))
+    renderer.render(click_action(index=2))
+    renderer.render(click_action())
+    assert coder.get_code_click_object.call_count == 4
+
+
+def test_renderer_does_not_cache_unhashable_args():
+    coder = Mock()
+    coder.get_code_swipe.return_value = 'code'
+    renderer = CodeRenderer(coder)
+    action = Action('swipe', {'start': (1, 2), 'end': (3, 4),
+                              'options': {'steps': set([10])}})
+    renderer.render(action)
+    renderer.render(action)
+    assert coder.get_code_swipe.call_count == 2
+
+
+def test_action_checks_args():
+    Action('open_notification', {})
+    Action('wait', {'for_what': 'idle', 'timeout': None})
+    with pytest.raises(ValueError):
+        Action('click', {'coord': (1, 2)})
+    with pytest.raises(TypeError):
+        Action('click_xy', {'coords': (1, 2)})
+    with pytest.raises(TypeError):
+        Action('click_xy', {'coord': (1, 2), 'wait': None})
+    with pytest.raises(TypeError):
+        Action('wait', {'for_what': 'idle'})
+    with pytest.raises(TypeError):
+        Action('click_object', {'locator': {'text': 'OK'}, 'wait': None})
+    with pytest.raises(TypeError):
+        Action.from_json(
+            '{"op": "press_key", "args": {"key_name": 3, "meta": null}}')
+
+
+def test_action_fields_match_coder():
+    for op, fields in ACTION_FIELDS.items():
+        code = getattr(UiautomatorCoder, 'get_code_' + op).__code__
+        names = code.co_varnames[:code.co_argcount]
+        assert tuple(name for name, _ in fields) == names
+
+
+def test_action_log_writes_json_lines_and_loads():
+    out = io.StringIO()
+    log = ActionLog(out)
+    log.append(click_action())
+    log.append(Action('wait', {'for_what': 'idle', 'timeout': 10}, 1))
+    loaded = ActionLog.load(io.StringIO(out.getvalue() + '\n'))
+    assert len(loaded) == 2
+    assert list(loaded) == list(log)
+    dumped = io.StringIO()
+    loaded.dump(dumped)
+    assert dumped.getvalue() == out.getvalue()
+
+
+def test_action_log_replays_into_another_coder():
+    log = ActionLog()
+    log.append(click_action())
+    log.append(Action('press_key', {'key_name': 'HOME', 'meta': None}, 1))
+    writer = Mock()
+    recorders = {0: Mock(), 1: Mock()}
+    writer.get_recorder.side_effect = lambda i: recorders[i]
+    coder = Mock()
+    coder.get_code_click_object.return_value = 'click'
+    coder.get_code_press_key.return_value = 'press'
+    log.replay(writer, coder)
+    recorders[0].assert_called_once_with('click', action=log[0])
+    recorders[1].assert_called_once_with('press', action=log[1])
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+import os
+
+import pytest
+
+from phoneauto.scriptgenerator.atomic_file import AtomicFile
+
+
+def read_text(path):
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_commit_replaces_destination(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write('old')
+    atomic = AtomicFile(path)
+    atomic.write('new\n')
+    atomic.checkpoint()
+    assert read_text(path) == 'old'
+    assert read_text(atomic.tmp_path) == 'new\n'
+    atomic.commit()
+    assert atomic.closed
+    assert read_text(path) == 'new\n'
+    assert not os.path.exists(atomic.tmp_path)
+
+
+def test_tmp_file_is_next_to_destination(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    atomic = AtomicFile(path)
+    assert os.path.dirname(atomic.tmp_path) == str(tmpdir)
+    assert atomic.path == path
+    atomic.discard()
+
+
+def test_discard_leaves_destination_untouched(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    atomic = AtomicFile(path)
+    atomic.write('partial')
+    atomic.discard()
+    assert not os.path.exists(path)
+    assert not os.path.exists(atomic.tmp_path)
+
+
+def test_close_keeps_tmp_file(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    atomic = AtomicFile(path)
+    atomic.write('partial')
+    atomic.close()
+    assert not os.path.exists(path)
+    assert read_text(atomic.tmp_path) == 'partial'
+
+
+def test_context_manager(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    with AtomicFile(path) as atomic:
+        atomic.write('done')
+    assert read_text(path) == 'done'
+
+    with pytest.raises(RuntimeError):
+        with AtomicFile(path) as atomic:
+            atomic.write('broken')
+            raise RuntimeError()
+    assert read_text(path) == 'done'
+    assert not os.path.exists(atomic.tmp_path)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX file modes')
+def test_commit_gives_new_file_default_mode(tmpdir):
+    path = str(tmpdir.join('out.py'))
+    with AtomicFile(path) as atomic:
+        atomic.write('new\n')
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX file modes')
+def test_commit_keeps_mode_of_destination(tmpdir):
+    path = str(tmpdir.join('out.prom'))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write('old')
+    os.chmod(path, 0o644)
+    with AtomicFile(path) as atomic:
+        atomic.write('new\n')
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert read_text(path) == 'new\n'
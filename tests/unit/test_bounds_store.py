@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import random
+import pytest
+from phoneauto.scriptgenerator import uiobjectfinder
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
+from tests.dump_generator import create_dump, generate_dump_xml
+
+numpy = pytest.importorskip('numpy')
+
+
+def create_generated_dump(num_nodes=2000):
+    return create_dump(generate_dump_xml(num_nodes, seed=1))
+
+
+def find(finder, coord, ignore_distant, criteria):
+    try:
+        locator = finder.find_object_contains(
+            coord, ignore_distant, **criteria)
+    except UiObjectNotFound:
+        return None
+    return locator.meta, locator.filters, locator.index
+
+
+@pytest.mark.parametrize('criteria', [
+    {},
+    {'clickable': True, 'enabled': True},
+    {'className': 'android.widget.TextView'},
+    {'textContains': 'Camera', 'clickable': True},
+    {'clickable': 'true'},
+    {'clickable': 'yes'},
+])
+@pytest.mark.parametrize('ignore_distant', [True, False])
+def test_vectorized_equals_dict_path(criteria, ignore_distant):
+    hd = create_generated_dump()
+    vectorized = uiobjectfinder.UiObjectFinder(hd, vectorized=True)
+    per_object = uiobjectfinder.UiObjectFinder(hd, vectorized=False)
+    rng = random.Random(0)
+    for _ in range(50):
+        coord = (rng.randrange(1080), rng.randrange(1920))
+        assert (find(vectorized, coord, ignore_distant, criteria) ==
+                find(per_object, coord, ignore_distant, criteria))
+
+
+def test_store_arrays():
+    hd = create_generated_dump(num_nodes=100)
+    store = hd.get_bounds_store()
+    assert store.bounds.shape == (100, 4)
+    assert store.flags.shape == (100,)
+    assert hd.get_bounds_store() is store
+
+
+def test_flag_mask():
+    hd = create_generated_dump(num_nodes=300)
+    store = hd.get_bounds_store()
+    mask = store.flag_mask({'clickable': True, 'enabled': True})
+    expected = [o['clickable'] and o['enabled']
+                for o in (hd.get_object(i) for i in range(len(hd)))]
+    assert mask.tolist() == expected
+
+
+def test_not_vectorized_without_store():
+    finder = uiobjectfinder.UiObjectFinder(
+        create_generated_dump(), vectorized=False)
+    assert finder._get_bounds_store() is None
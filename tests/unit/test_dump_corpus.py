@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import gzip
+import random
+import sys
+
+import pytest
+
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from phoneauto.scriptgenerator.view_hierarchy_dump import ViewHierarchyDump
+from tests import dump_corpus
+from tests.dump_generator import (
+    DEVICE_INFO, SCREEN_HEIGHT, SCREEN_WIDTH, generate_dump_xml)
+
+_SYNTHETIC_NAMES = ['synthetic_{0}'.format(size)
+                    for size in dump_corpus.SYNTHETIC_SIZES]
+
+
+def test_names():
+    names = dump_corpus.names()
+    assert 'dump_home' in names
+    assert set(_SYNTHETIC_NAMES) <= set(names)
+
+
+@pytest.mark.parametrize('size', dump_corpus.SYNTHETIC_SIZES)
+def test_synthetic_entry_size(size):
+    assert len(dump_corpus.load_dump('synthetic_{0}'.format(size))) == size
+
+
+def test_loader_caches():
+    assert dump_corpus.load_xml('dump_home') is dump_corpus.load_xml(
+        'dump_home')
+    hd = dump_corpus.load_dump('dump_home')
+    assert dump_corpus.load_dump('dump_home') is hd
+    assert dump_corpus.load_dump('dump_home', fresh=True) is not hd
+
+
+def test_loader_reads_gzip(tmpdir, monkeypatch):
+    xml = dump_corpus.load_xml('synthetic_500')
+    with gzip.open(str(tmpdir.join('compressed.xml.gz')), 'wb') as f:
+        f.write(xml.encode('utf-8'))
+    monkeypatch.setattr(dump_corpus, 'TESTDATA_DIR', str(tmpdir))
+    assert dump_corpus.names()[0] == 'compressed'
+    try:
+        assert dump_corpus.load_xml('compressed') == xml
+    finally:
+        dump_corpus.clear_cache()
+
+
+def test_unknown_entry():
+    with pytest.raises(KeyError):
+        dump_corpus.load_xml('no_such_dump')
+
+
+@pytest.mark.parametrize('name', _SYNTHETIC_NAMES)
+def test_find_objects_on_synthetic_entry(name):
+    hd = dump_corpus.load_dump(name)
+    assert hd.find_objects(clickable=True, enabled=True)
+    assert hd.find_objects(textContains='Gmail')
+
+
+@pytest.mark.parametrize('name', _SYNTHETIC_NAMES)
+def test_finder_on_synthetic_entry(name):
+    finder = UiObjectFinder(dump_corpus.load_dump(name, fresh=True))
+    rng = random.Random(0)
+    found = 0
+    for _ in range(50):
+        point = (rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT))
+        try:
+            finder.find_object_contains(
+                point, True, clickable=True, enabled=True)
+            found += 1
+        except UiObjectNotFound:
+            pass
+    assert found > 0
+
+
+def count_calls(func):
+    # Number of Python and builtin function calls made by func,
+    # which unlike elapsed time does not depend on the machine
+    calls = [0]
+
+    def profile(_, event, __):
+        if event in ('call', 'c_call'):
+            calls[0] += 1
+    sys.setprofile(profile)
+    try:
+        func()
+    finally:
+        sys.setprofile(None)
+    return calls[0]
+
+
+def count_operation_calls(num_nodes):
+    hd = ViewHierarchyDump(DEVICE_INFO, generate_dump_xml(num_nodes))
+    finder = UiObjectFinder(hd)
+    rng = random.Random(0)
+    points = [(rng.randrange(SCREEN_WIDTH), rng.randrange(SCREEN_HEIGHT))
+              for _ in range(50)]
+
+    def find_points():
+        for point in points:
+            try:
+                finder.find_object_contains(
+                    point, True, clickable=True, enabled=True)
+            except UiObjectNotFound:
+                pass
+    return {
+        'find_objects.clickable': count_calls(
+            lambda: hd.find_objects(clickable=True, enabled=True)),
+        'find_objects.textContains': count_calls(
+            lambda: hd.find_objects(textContains='Gmail')),
+        'finder': count_calls(find_points)
+    }
+
+
+def test_operations_scale_linearly():
+    # Linear operations make about 4 times as many calls on 4 times
+    # as many nodes, quadratic ones about 16 times
+    small = count_operation_calls(1000)
+    large = count_operation_calls(4000)
+    for operation, calls in small.items():
+        assert large[operation] < calls * 6, operation
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+from mock import Mock
+import pytest
+from phoneauto.scriptgenerator import headless, scriptgenerator, session_store
+
+
+def test_parse_actions():
+    actions = list(headless.parse_actions([
+        '{"command": "drag_xy_to_xy", '
+        '"args": {"start": [1, 2], "end": [3, 4]}, "device": 1}',
+        '  ',
+        '# {"command": "press_key"}',
+        '{"command": "open_notification"}'
+    ]))
+    assert actions == [
+        (1, 'drag_xy_to_xy', {'start': (1, 2), 'end': (3, 4)}, 1),
+        (4, 'open_notification', {}, 0)]
+
+
+def test_parse_actions_error_has_line_number():
+    with pytest.raises(headless.ActionError) as excinfo:
+        list(headless.parse_actions(['', '[1, 2]']))
+    assert excinfo.value.line_number == 2
+    assert 'line 2' in str(excinfo.value)
+
+
+def test_driver_without_auto_update():
+    controller = Mock()
+    driver = headless.HeadlessDriver(controller, auto_update=False)
+    driver.perform('click_object', {'start': (0, 0)})
+    controller.execute.assert_called_once_with(
+        'click_object', {'start': (0, 0)}, device_index=0)
+
+
+def test_driver_updates_dump_only_when_stale():
+    controller = Mock()
+    driver = headless.HeadlessDriver(controller)
+    driver.perform('click_xy', {'coord': (0, 0)})
+    driver.perform('click_object', {'start': (0, 0)})
+    driver.perform('get_hierarchy_view_objects')
+    driver.perform('click_object', {'start': (0, 0)})
+    commands = [c[0][0] for c in controller.execute.call_args_list]
+    assert commands == [
+        'click_xy', 'update_view_dump', 'click_object',
+        'update_view_dump', 'get_hierarchy_view_objects', 'click_object']
+
+
+def test_driver_uses_restored_dump(tmpdir):
+    device = Mock()
+    device.info = {'displayWidth': 100, 'displayHeight': 100}
+    g = scriptgenerator.ScriptGenerator({
+        'devices': [device], 'coder': Mock(), 'writer': Mock()})
+    g.session_store = session_store.SessionStore(str(tmpdir))
+    driver = headless.HeadlessDriver(g)
+    for text in ('first', 'second'):
+        device.dump.return_value = (
+            '<?xml version="1.0" ?><hierarchy rotation="0">'
+            '<node text="{0}" clickable="true" enabled="true"'
+            ' bounds="[0,0][10,10]"/>'
+            '</hierarchy>'.format(text))
+        driver.perform('update_view_dump')
+    driver.perform('click_xy', {'start': (50, 50)})
+    assert len(driver.perform('get_session_dumps')) == 2
+    driver.perform('restore_view_dump', {'index': -2})
+    driver.perform('click_object', {'start': (5, 5)})
+    assert device.dump.call_count == 2
+    _, kwargs = device.click_object.call_args
+    assert kwargs['locator'].filters == {'text': 'first'}
+    g.session_store.close()
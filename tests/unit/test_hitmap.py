@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import random
+import pytest
+from phoneauto.scriptgenerator import uiobjectfinder
+from phoneauto.scriptgenerator import view_hierarchy_dump
+from phoneauto.scriptgenerator.bounds_store import FLAG_NAMES
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
+from tests.dump_generator import (
+    DEVICE_INFO, SCREEN_WIDTH, SCREEN_HEIGHT, generate_dump_xml)
+
+pytest.importorskip('numpy')
+from phoneauto.scriptgenerator import hitmap
+
+
+def find_meta(finder, coord, ignore_distant):
+    try:
+        return finder.find_object_contains(coord, ignore_distant).meta
+    except UiObjectNotFound:
+        return None
+
+
+@pytest.mark.parametrize('canvas_size', [(540, 960), (480, 800)])
+@pytest.mark.parametrize('ignore_distant', [True, False])
+def test_hit_map_equals_finder(canvas_size, ignore_distant):
+    hd = view_hierarchy_dump.ViewHierarchyDump(
+        DEVICE_INFO, generate_dump_xml(500, seed=3))
+    finder = uiobjectfinder.UiObjectFinder(hd)
+    scale = (canvas_size[0] / float(SCREEN_WIDTH),
+             canvas_size[1] / float(SCREEN_HEIGHT))
+    thresh = finder._FIND_OBJECT_DISTANCE_THRESH if ignore_distant else None
+    hit_map = hitmap.build_hit_map(
+        hd.find_objects(), canvas_size, scale, thresh)
+    rng = random.Random(0)
+    for _ in range(300):
+        pos = (rng.randrange(canvas_size[0]), rng.randrange(canvas_size[1]))
+        coord = (int(pos[0] / scale[0]), int(pos[1] / scale[1]))
+        assert hit_map.lookup(pos) is find_meta(finder, coord, ignore_distant)
+
+
+def test_same_area_first_object_wins():
+    objects = [
+        {'visibleBounds': {'left': 0, 'top': 0, 'right': 10, 'bottom': 10}},
+        {'visibleBounds': {'left': 0, 'top': 0, 'right': 10, 'bottom': 10}},
+        {'visibleBounds': {'left': 0, 'top': 0, 'right': 20, 'bottom': 20}}
+    ]
+    for o in objects:
+        o.update(dict((name, False) for name in FLAG_NAMES))
+    hit_map = hitmap.build_hit_map(objects, (20, 20), (1.0, 1.0))
+    assert hit_map.lookup((5, 5)) is objects[0]
+    assert hit_map.lookup((15, 15)) is objects[2]
+    assert hit_map.lookup((20, 5)) is None
+    assert hit_map.lookup((-1, 5)) is None
+
+
+def test_builder_notifies():
+    built = []
+    builder = hitmap.HitMapBuilder(
+        [], (4, 4), (1.0, 1.0), on_built=built.append)
+    builder.start()
+    builder.join()
+    assert built == [builder.hit_map]
+    assert builder.hit_map.lookup((0, 0)) is None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+import json
+from phoneauto.scriptgenerator import instrumentation
+from tests.fake_clock import FakeClock
+
+
+def test_histogram_percentiles():
+    h = instrumentation.Histogram()
+    assert h.p50 is None
+    for i in range(1, 101):
+        h.add(float(i))
+    assert h.count == 100
+    assert h.p50 in (50.0, 51.0)
+    assert h.p95 in (95.0, 96.0)
+
+
+def test_histogram_keeps_recent_samples():
+    h = instrumentation.Histogram(maxlen=10)
+    for _ in range(100):
+        h.add(1000.0)
+    for _ in range(10):
+        h.add(1.0)
+    assert h.p95 == 1.0
+    assert h.count == 110
+
+
+def test_span_measures_duration():
+    clock = FakeClock()
+    inst = instrumentation.Instrumentation(clock=clock)
+    with inst.span('click_object', 'device'):
+        clock.now += 0.25
+    histogram = inst.histograms[('click_object', 'device')]
+    assert histogram.count == 1
+    assert histogram.p50 == 250.0
+
+
+def test_span_records_error_and_propagates():
+    records = []
+    inst = instrumentation.Instrumentation(
+        exporters=[lambda i, r: records.append(r)])
+    try:
+        with inst.span('click_object', 'finder'):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert records[0]['error'] is True
+    assert records[0]['phase'] == 'finder'
+
+
+def test_summary_by_phase():
+    inst = instrumentation.Instrumentation()
+    inst.add_sample('press_key', 'total', 3.0)
+    inst.add_sample('press_key', 'device', 2.0)
+    inst.add_sample('click_xy', 'total', 5.0)
+    summary = inst.summary(phase='total')
+    assert [s['command'] for s in summary] == ['click_xy', 'press_key']
+    assert summary[1]['p95_ms'] == 3.0
+
+
+def test_json_lines_exporter():
+    out = io.StringIO()
+    inst = instrumentation.Instrumentation(
+        exporters=[instrumentation.JsonLinesExporter(out)])
+    inst.add_sample('press_key', 'total', 3.0)
+    inst.add_sample('press_key', 'device', 2.0)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1])['duration_ms'] == 2.0
+    inst.close()
+    assert out.closed
+
+
+def test_prometheus_text_exporter(tmpdir):
+    path = str(tmpdir.join('metrics.prom'))
+    clock = FakeClock()
+    exporter = instrumentation.PrometheusTextExporter(path, interval=5.0)
+    inst = instrumentation.Instrumentation(exporters=[exporter], clock=clock)
+    inst.add_sample('press_key', 'total', 3.0)
+    inst.add_sample('click_xy', 'total', 4.0)
+    with io.open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert ('scriptgenerator_span_milliseconds_count'
+            '{command="press_key",phase="total"} 1') in text
+    assert 'click_xy' not in text
+
+    clock.now += 5.0
+    inst.add_sample('click_xy', 'total', 4.0)
+    with io.open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert ('scriptgenerator_span_milliseconds'
+            '{command="click_xy",phase="total",quantile="0.5"} 4.0') in text
+
+
+def test_prometheus_text_exporter_writes_last_spans_on_close(tmpdir):
+    path = tmpdir.join('metrics.prom')
+    clock = FakeClock()
+    exporter = instrumentation.PrometheusTextExporter(str(path))
+    inst = instrumentation.Instrumentation(exporters=[exporter], clock=clock)
+    inst.add_sample('press_key', 'total', 3.0)
+    inst.add_sample('click_xy', 'total', 4.0)
+    assert 'click_xy' not in path.read()
+    inst.close()
+    assert 'click_xy' in path.read()
+
+    path.remove()
+    inst.close()
+    assert not path.exists()
+
+
+def test_null_instrumentation():
+    inst = instrumentation.NullInstrumentation()
+    with inst.span('press_key', 'total'):
+        pass
+    assert not inst.enabled
+    assert inst.summary() == []
+    inst.close()
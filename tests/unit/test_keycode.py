@@ -14,6 +14,15 @@ def test_chars_to_keys():
     assert tuple(keycode.chars_to_keys_us('aA \t')) == (
         ('a', None), ('a', 1), (' ', None), ('\t', None))
 
+def test_key_to_char():
+    assert keycode.key_to_char_us('a') == 'a'
+    assert keycode.key_to_char_us('a', 1) == 'A'
+    assert keycode.key_to_char_us('1', 1) == '!'
+    assert keycode.key_to_char_us('HOME') is None
+    assert keycode.key_to_char_us(' ', 1) is None
+    for char in 'aZ9~ \n':
+        assert keycode.key_to_char_us(*keycode.char_to_key_us(char)) == char
+
 def test_keycode_of_symbol_from_char():
     assert keycode.get_keycode('`') == 68
 
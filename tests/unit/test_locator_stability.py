@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+from mock import patch
+from phoneauto.scriptgenerator.locator_stability import LocatorStabilityScorer
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectFinder
+from tests.dump_generator import create_dump
+
+
+def create_rows_dump(*rows):
+    nodes = ''.join(
+        '<node text="{0}" resource-id="{1}" class="android.widget.TextView" '
+        'content-desc="" bounds="[0,{2}][1080,{3}]" />'.format(
+            text, resource_id, i * 100, (i + 1) * 100)
+        for i, (text, resource_id) in enumerate(rows))
+    return create_dump(
+        '<?xml version="1.0" ?><hierarchy rotation="0">{0}</hierarchy>'
+        .format(nodes))
+
+
+def test_scores_count_dumps_with_unique_match():
+    scorer = LocatorStabilityScorer(history=3)
+    assert scorer.latest is None
+    assert not scorer.is_unique('text', 'Alpha')
+    first = create_rows_dump(('Alpha', 'id/row'), ('Beta', 'id/row'))
+    scorer.observe(first)
+    second = create_rows_dump(('Alpha', 'id/row'))
+    scorer.observe(second)
+    assert scorer.latest is second
+    assert len(scorer) == 2
+    assert scorer.score('text', 'Alpha') == 2
+    assert scorer.score('resourceId', 'id/row') == 1
+    assert scorer.score('text', 'Beta') == 1
+    assert not scorer.is_unique('text', 'Beta')
+    assert scorer.is_unique('resourceId', 'id/row')
+    assert scorer.score('className', 'android.widget.TextView') == 1
+
+
+def test_oldest_dump_leaves_the_window():
+    scorer = LocatorStabilityScorer(history=2)
+    scorer.observe(create_rows_dump(('Beta', 'id/beta')))
+    for _ in range(2):
+        scorer.observe(create_rows_dump(('Alpha', 'id/row')))
+    assert len(scorer) == 2
+    assert scorer.score('text', 'Beta') == 0
+    assert scorer.score('text', 'Alpha') == 2
+
+
+def test_rank_prefers_stable_filters_and_keeps_order_on_ties():
+    scorer = LocatorStabilityScorer()
+    scorer.observe(create_rows_dump(('Alpha', 'id/row'), ('Beta', 'id/row')))
+    scorer.observe(
+        create_rows_dump(('Alpha', 'id/row'), ('Gamma', 'id/other')))
+    candidates = [('resourceId', 'id/row'), ('text', 'Alpha'),
+                  ('resourceId', 'id/other'), ('text', 'Gamma')]
+    assert scorer.rank(candidates) == [
+        ('text', 'Alpha'), ('resourceId', 'id/row'),
+        ('resourceId', 'id/other'), ('text', 'Gamma')]
+    assert scorer.rank([('text', 'Beta')]) == []
+
+
+def test_finder_prefers_stable_locator():
+    scorer = LocatorStabilityScorer()
+    scorer.observe(create_rows_dump(('Alpha', 'id/row'), ('Beta', 'id/row')))
+    dump = create_rows_dump(('Alpha', 'id/row'), ('Gamma', 'id/other'))
+    assert UiObjectFinder(dump).find_object_contains(
+        (500, 50), False).filters == {'resourceId': 'id/row'}
+    scorer.observe(dump)
+    finder = UiObjectFinder(dump, stability=scorer)
+    assert finder.find_object_contains(
+        (500, 50), False).filters == {'text': 'Alpha'}
+    assert finder.find_object_contains(
+        (500, 150), False).filters == {'resourceId': 'id/other'}
+
+
+def test_finder_ignores_scorer_of_other_dump():
+    scorer = LocatorStabilityScorer()
+    scorer.observe(create_rows_dump(('Alpha', 'id/row'), ('Beta', 'id/row')))
+    dump = create_rows_dump(('Alpha', 'id/row'))
+    finder = UiObjectFinder(dump, stability=scorer)
+    assert finder.find_object_contains(
+        (500, 50), False).filters == {'resourceId': 'id/row'}
+
+
+def test_stable_locator_does_not_search_the_dump():
+    scorer = LocatorStabilityScorer()
+    dump = create_rows_dump(('Alpha', 'id/row'), ('Beta', 'id/row'))
+    scorer.observe(dump)
+    finder = UiObjectFinder(dump, stability=scorer)
+    with patch.object(dump, 'find_objects') as find_objects, \
+            patch.object(dump, 'find_similar') as find_similar:
+        locator = finder._determine_locator(dump.get_object(0))
+    assert locator.filters == {'text': 'Alpha'}
+    assert not find_objects.called and not find_similar.called
+    assert dump.get_fuzzy_index(build=False) is None
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+import json
+import threading
+from phoneauto.scriptgenerator import profiler
+from tests.fake_clock import FakeClock
+
+
+def test_span_records_complete_event():
+    clock = FakeClock(now=100.0)
+    p = profiler.Profiler(clock=clock)
+    with p.span('on_mouse_motion'):
+        clock.now += 0.02
+    event = p.events()[-1]
+    assert event['ph'] == 'X'
+    assert event['name'] == 'on_mouse_motion'
+    assert event['ts'] == 100000000
+    assert event['dur'] == 20000
+    assert event['tid'] == threading.current_thread().ident
+
+
+def test_wrap_returns_value():
+    p = profiler.Profiler()
+    wrapped = p.wrap('func', lambda a, b=0: a + b)
+    assert wrapped(1, b=2) == 3
+    assert [e['name'] for e in p.events() if e['ph'] == 'X'] == ['func']
+
+
+def test_scheduled_records_lag():
+    clock = FakeClock(now=100.0)
+    p = profiler.Profiler(clock=clock)
+    func = p.scheduled('refresh_screen', 100, lambda: None)
+    clock.now += 0.15
+    func()
+    lag = [e for e in p.events() if e['name'] == 'event_loop_lag_ms'][0]
+    assert round(lag['args']['refresh_screen']) == 50
+
+
+def test_events_from_threads_are_named():
+    p = profiler.Profiler()
+    thread = threading.Thread(
+        target=lambda: p.counter('queue', {'depth': 1}), name='worker')
+    thread.start()
+    thread.join()
+    names = [e['args']['name'] for e in p.events() if e['ph'] == 'M']
+    assert names == ['worker']
+
+
+def test_max_events():
+    p = profiler.Profiler(max_events=3)
+    for i in range(10):
+        p.counter('queue', {'depth': i})
+    depths = [e['args']['depth'] for e in p.events() if e['ph'] == 'C']
+    assert depths == [7, 8, 9]
+
+
+def test_save(tmpdir):
+    path = str(tmpdir.join('trace.json'))
+    p = profiler.Profiler()
+    with p.span('refresh_screen'):
+        pass
+    p.instant('screenrecord.restart')
+    p.save(path)
+    with io.open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    phases = [e['ph'] for e in document['traceEvents']]
+    assert phases == ['M', 'X', 'i']
+
+
+def test_null_profiler():
+    p = profiler.NullProfiler()
+    func = lambda: 1
+    assert p.wrap('func', func) is func
+    assert p.scheduled('func', 100, func) is func
+    with p.span('func'):
+        pass
+    assert not p.enabled
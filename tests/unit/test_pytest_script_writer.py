@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+
+from mock import Mock
+
+from phoneauto.scriptgenerator.pytest_script_writer import PytestScriptWriter
+
+
+def create_writer(file_obj, **kwargs):
+    coder = Mock()
+    coder.get_device_open_code.return_value = ['return None']
+    coder.get_device_close_code.return_value = ['pass']
+    writer = PytestScriptWriter(file_obj, [coder], **kwargs)
+    writer.start()
+    return writer
+
+
+def test_unbuffered_writes_each_line():
+    out = io.StringIO()
+    writer = create_writer(out)
+    recorder = writer.get_recorder()
+    recorder('{instance}.click()')
+    assert out.getvalue().endswith('    _s.devices[0].click()\n')
+
+
+def test_buffered_writes_in_batches():
+    out = Mock()
+    writer = create_writer(out, buffered=True, checkpoint_lines=4)
+    recorder = writer.get_recorder()
+    recorder('{instance}.a()')
+    recorder('{instance}.b()')
+    assert not out.write.called
+    recorder('{instance}.c()')
+    assert out.write.call_count == 1
+    assert out.write.call_args[0][0].endswith(
+        'def test_run(_s):\n'
+        '    _s.devices[0].a()\n'
+        '    _s.devices[0].b()\n'
+        '    _s.devices[0].c()\n')
+    assert out.checkpoint.called
+
+
+def test_buffered_finish_commits():
+    out = Mock()
+    writer = create_writer(out, buffered=True, checkpoint_lines=100)
+    writer.get_recorder()('{instance}.a()')
+    writer.finish()
+    written = out.write.call_args_list[-1][0][0]
+    assert written.endswith('    _s.devices[0].a()\n\n')
+    assert out.commit.called
+
+
+def test_buffered_without_checkpoint_flushes():
+    out = io.StringIO()
+    writer = create_writer(out, buffered=True, checkpoint_lines=1)
+    writer.get_recorder()('{instance}.a()')
+    assert out.getvalue().endswith('    _s.devices[0].a()\n')
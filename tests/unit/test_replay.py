@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from mock import Mock
+
+from phoneauto.helpers.wait_policy import AdaptiveWaitPolicy
+from phoneauto.scriptgenerator.action_ir import Action
+from phoneauto.scriptgenerator.replay import (
+    PreresolvedLocator, ReplayEngine)
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+from tests.fake_clock import FakeClock
+
+
+def press(key_name):
+    return Action('press_key', {'key_name': key_name, 'meta': None})
+
+
+def click():
+    return Action('click_object', {
+        'locator': UiObjectLocator({'text': 'OK'}, index=1), 'wait': None})
+
+
+def wait_calls(device):
+    return [c[0][0] for c in device.wait.call_args_list]
+
+
+def test_replay_executes_actions_with_waits():
+    device = Mock()
+    engine = ReplayEngine([device])
+    report = engine.run([press('HOME'), click()])
+    assert report.succeeded
+    device.press_key.assert_called_once_with(key_name='HOME', meta=None)
+    locator = device.click_object.call_args[1]['locator']
+    assert isinstance(locator, PreresolvedLocator)
+    assert locator.selector_kwargs == {'text': 'OK', 'instance': 1}
+    assert wait_calls(device) == ['idle', 'update', 'idle'] * 2
+
+
+def test_replay_pipelines_blind_steps():
+    device = Mock()
+    engine = ReplayEngine([device], pipeline=True)
+    engine.run([press('a'), press('b'), press('c'), click()])
+    assert device.press_key.call_count == 3
+    assert wait_calls(device) == (
+        ['idle'] + ['update', 'idle'] + ['idle', 'update', 'idle'])
+
+
+def test_replay_wait_steps_are_not_wrapped():
+    device = Mock()
+    engine = ReplayEngine([device])
+    engine.run([Action('wait', {'for_what': 'idle', 'timeout': 10})])
+    device.wait.assert_called_once_with(for_what='idle', timeout=10)
+
+
+def test_replay_skips_screenshot_without_dir():
+    device = Mock()
+    report = ReplayEngine([device]).run(
+        [Action('screenshot', {'file': 'x'})])
+    assert report.steps[0].skipped
+    assert not device.get_screenshot_as_file.called
+
+
+def test_replay_saves_screenshot(tmpdir):
+    device = Mock()
+    ReplayEngine([device], screenshot_dir=str(tmpdir)).run(
+        [press('a'), Action('screenshot', {'file': 'x'})])
+    device.get_screenshot_as_file.assert_called_once_with(
+        str(tmpdir.join('step_0002.png')))
+
+
+def test_replay_reports_latency_and_stops_on_error():
+    device = Mock()
+    device.click_object.side_effect = ValueError('not found')
+    engine = ReplayEngine([device], clock=FakeClock(step=0.01))
+    report = engine.run([press('a'), click(), press('b')])
+    assert [s.op for s in report.steps] == ['press_key', 'click_object']
+    assert all(s.elapsed_ms > 0 for s in report.steps)
+    assert not report.succeeded
+    assert report.failed[0].number == 2
+    assert 'FAILED' in report.format()
+
+    report = engine.run([press('a'), click(), press('b')],
+                        stop_on_error=False)
+    assert len(report.steps) == 3
+    assert len(report.failed) == 1
+
+
+def test_replay_with_adaptive_wait_policy():
+    device = Mock()
+    device.wait.return_value = False
+    policy = AdaptiveWaitPolicy()
+    ReplayEngine([device], wait_policy=policy).run([press('a'), click()])
+    assert policy.stats.actions == 2
+    assert policy.stats.post_idle_skipped == 2
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import pytest
+
+from phoneauto.scriptgenerator.profiler import Profiler
+from phoneauto.scriptgenerator.screenrecord import (
+    AdbStreamSource, FileStreamSource, Screenrecord, SyntheticStreamSource,
+    get_adb_command)
+
+
+@pytest.fixture
+def real_screenrecord(monkeypatch):
+    # Undoes the mock installed by conftest,
+    # since Screenrecord refers to the module global of itself.
+    monkeypatch.setattr(
+        'phoneauto.scriptgenerator.screenrecord.Screenrecord', Screenrecord)
+
+
+def test_adb_command_with_custom_executable():
+    command = get_adb_command(540, 960, adb_exe='/opt/fake/adb')
+    assert command[0] == '/opt/fake/adb'
+    assert '--size=540x960' in command
+
+
+def test_file_source_command():
+    command = FileStreamSource('rec.h264', fps=15).get_command(270, 480)
+    assert command[:4] == ['ffmpeg', '-re', '-stream_loop', '-1']
+    assert command[command.index('-i') + 1] == 'rec.h264'
+    assert command[command.index('-vf') + 1] == 'fps=15,scale=270:480'
+    assert command[-5:] == ['-pix_fmt', 'rgb24', '-vcodec', 'rawvideo', '-']
+
+
+def test_file_source_command_once_at_full_speed():
+    command = FileStreamSource(
+        'rec.h264', loop=False, realtime=False).get_command(270, 480)
+    assert '-re' not in command and '-stream_loop' not in command
+
+
+def test_synthetic_source_streams_frames():
+    source = SyntheticStreamSource(fps=None, num_patterns=4)
+    stream = source.open(8, 8, 1024)
+    frames = [stream.read(8 * 8 * 3) for _ in range(5)]
+    source.close()
+    assert all(len(f) == 8 * 8 * 3 for f in frames)
+    assert frames[0] != frames[1]
+    assert frames[0] == frames[4]
+
+
+def test_screenrecord_runs_with_synthetic_source(real_screenrecord):
+    profiler = Profiler()
+    recorder = Screenrecord(
+        width=16, height=32, profiler=profiler,
+        source=SyntheticStreamSource(fps=100, screen_size=(160, 320)))
+    assert recorder.get_scale() == (0.1, 0.1)
+    assert recorder.capture_oneshot().size == (16, 32)
+    recorder.start()
+    try:
+        frame = recorder.queue.get(timeout=5)
+    finally:
+        recorder.join()
+    assert not recorder.is_alive()
+    assert frame.size == (16, 32)
+    assert 'time' in frame.info
+    assert any(e['name'] == 'screenrecord.decode' for e in profiler.events())
+
+
+def test_adb_source_is_default(real_screenrecord, monkeypatch):
+    captured = []
+
+    def screencap(self):
+        captured.append(self)
+        return SyntheticStreamSource(screen_size=(4, 4)).screencap()
+    monkeypatch.setattr(AdbStreamSource, 'screencap', screencap)
+    Screenrecord(width=2, height=2)
+    assert isinstance(captured[0], AdbStreamSource)
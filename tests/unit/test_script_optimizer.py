@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+
+from mock import Mock
+
+from phoneauto.scriptgenerator import keycode
+from phoneauto.scriptgenerator.action_ir import Action
+from phoneauto.scriptgenerator.pytest_script_writer import PytestScriptWriter
+from phoneauto.scriptgenerator.script_optimizer import ScriptOptimizer
+from phoneauto.scriptgenerator.uiautomator_coder import UiautomatorCoder
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
+
+
+def presses(text, device_index=0):
+    return [Action('press_key', {'key_name': key, 'meta': meta},
+                   device_index)
+            for key, meta in keycode.chars_to_keys_us(text)]
+
+
+def press(key_name, device_index=0):
+    return Action('press_key', {'key_name': key_name, 'meta': None},
+                  device_index)
+
+
+def wait(for_what, timeout=None):
+    return Action('wait', {'for_what': for_what, 'timeout': timeout})
+
+
+def click(x, y):
+    return Action('click_xy', {'coord': (x, y)})
+
+
+def click_object(filters, index=None):
+    return Action('click_object', {
+        'locator': UiObjectLocator(filters=filters, index=index),
+        'wait': None})
+
+
+def optimize(actions, **kwargs):
+    return ScriptOptimizer(UiautomatorCoder(), **kwargs).optimize(actions)
+
+
+def process(actions, optimizer=None):
+    optimizer = optimizer or ScriptOptimizer(UiautomatorCoder())
+    return [code for _, code in optimizer.process(actions)]
+
+
+def test_merge_key_runs():
+    actions = presses("Hi, it's") + [click(1, 2)] + presses('x')
+    assert optimize(actions) == [
+        Action('input_text', {'text': "Hi, it's"}),
+        click(1, 2)] + presses('x')
+
+
+def test_merge_key_runs_includes_spaces():
+    assert optimize(presses('a b c')) == [
+        Action('input_text', {'text': 'a b c'})]
+
+
+def test_merge_key_runs_stops_at_untypable_keys():
+    actions = presses('ab\ncd') + [press('HOME')]
+    assert optimize(actions) == [
+        Action('input_text', {'text': 'ab'}),
+        presses('\n')[0],
+        Action('input_text', {'text': 'cd'}),
+        press('HOME')]
+
+
+def test_merge_key_runs_per_device():
+    actions = presses('ab') + presses('cd', device_index=1)
+    assert optimize(actions) == [
+        Action('input_text', {'text': 'ab'}, 0),
+        Action('input_text', {'text': 'cd'}, 1)]
+
+
+def test_collapse_waits():
+    actions = [
+        wait('update', 100),
+        wait('update', 500),
+        wait('update', 200),
+        wait('idle'),
+        wait('idle'),
+        wait('idle', 100),
+        click(1, 2),
+        wait('idle', 100),
+        wait('idle', 500),
+        wait('idle', 200)]
+    assert optimize(actions) == [
+        wait('update', 100),
+        wait('update', 500),
+        wait('update', 200),
+        wait('idle'),
+        wait('idle', 100),
+        click(1, 2),
+        wait('idle', 500)]
+
+
+def test_dedupe_clicks_is_opt_in():
+    actions = [click(1, 2), click(1, 2)]
+    assert optimize(actions) == actions
+    assert optimize(actions, dedupe_clicks=True) == actions[:1]
+    actions = [press('HOME'), press('HOME')]
+    assert optimize(actions, dedupe_clicks=True) == actions
+
+
+def test_hoist_selectors():
+    optimizer = ScriptOptimizer(UiautomatorCoder())
+    ok = {'text': 'OK'}
+    actions = [
+        click_object(ok),
+        click_object({'text': 'Once'}),
+        Action('wait_object', {
+            'locator': UiObjectLocator(filters=ok),
+            'for_what': 'gone', 'timeout': 10})]
+    assert process(actions, optimizer) == [
+        "sel_0 = {instance}(text='OK')",
+        'sel_0.click()',
+        "{instance}(text='Once').click()",
+        'sel_0.wait.gone(timeout=10)']
+    assert process([click_object(ok)], optimizer) == ['sel_0.click()']
+
+
+def test_indexed_selectors_are_not_hoisted():
+    # d(...)[n] looks the object up when it is evaluated
+    actions = [click_object({'text': 'OK'}, index=2)] * 2
+    assert process(actions) == ["{instance}(text='OK')[2].click()"] * 2
+
+
+def test_selectors_are_hoisted_per_device():
+    actions = [click_object({'text': 'OK'}), click_object({'text': 'OK'})]
+    actions[1].device_index = 1
+    assert process(actions) == [
+        "{instance}(text='OK').click()", "{instance}(text='OK').click()"]
+
+
+def create_writer(out, optimizer):
+    coder = Mock()
+    coder.get_device_open_code.return_value = ['return None']
+    coder.get_device_close_code.return_value = ['pass']
+    return PytestScriptWriter(
+        out, [coder], checkpoint_lines=100, optimizer=optimizer)
+
+
+def test_writer_optimizes_batches():
+    out = io.StringIO()
+    writer = create_writer(out, ScriptOptimizer(UiautomatorCoder()))
+    writer.start()
+    recorder = writer.get_recorder()
+    coder = UiautomatorCoder()
+    for action in presses('ab'):
+        recorder(coder.get_code_press_key(**action.args), action=action)
+    assert out.getvalue() == ''
+    writer.finish()
+    assert out.getvalue().endswith(
+        "def test_run(_s):\n    _s.devices[0].input_text('ab')\n\n")
+
+
+def test_writer_keeps_order_of_statements_without_actions():
+    out = io.StringIO()
+    writer = create_writer(out, ScriptOptimizer(UiautomatorCoder()))
+    writer.start()
+    recorder = writer.get_recorder()
+    coder = UiautomatorCoder()
+    action = press('a')
+    recorder(coder.get_code_press_key(**action.args), action=action)
+    recorder('# comment')
+    recorder(coder.get_code_press_key(**action.args), action=action)
+    writer.finish()
+    assert out.getvalue().endswith(
+        '    _s.devices[0].press(29, None)  # a\n'
+        '    # comment\n'
+        '    _s.devices[0].press(29, None)  # a\n\n')
@@ -2,20 +2,24 @@
 
 from __future__ import unicode_literals
 from mock import Mock
-from phoneauto.scriptgenerator import scriptgenerator
+from PIL import Image
+from phoneauto.scriptgenerator import (
+    action_ir, instrumentation, scriptgenerator, session_store)
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
 
 
-def create_scriptgenerator():
+def create_scriptgenerator(**extra_conf):
     d = Mock()
     d.get_screenshot_as_file = Mock()
     f = Mock()
-    f.find_object_contains = Mock()
+    f.find_object_contains = Mock(return_value=Mock(spec=UiObjectLocator))
     conf = {
         'devices': [d],
         'coder': Mock(),
         'finder': f,
         'writer': Mock()
     }
+    conf.update(extra_conf)
     return scriptgenerator.ScriptGenerator(conf)
 
 
@@ -34,3 +38,112 @@ def test_swipe_object_with_horiz_direction():
     _, swipe_kwargs = g.devices[0].swipe_object.call_args
     assert findobj_kwargs['coord'] == (0, 0)
     assert swipe_kwargs['direction'] == 'down'
+
+
+def test_drag_destination_is_not_relational():
+    g = create_scriptgenerator()
+    g.execute('drag_object_to_object', {'start': (0, 0), 'end': (5, 5)})
+    calls = g.finder.find_object_contains.call_args_list
+    assert [c[1]['relational'] for c in calls] == [True, False]
+
+
+def test_execute_measures_spans():
+    g = create_scriptgenerator()
+    g.instrumentation = instrumentation.Instrumentation()
+    g.execute('click_object', {'start': (0, 0)})
+    phases = set(p for c, p in g.instrumentation.histograms
+                 if c == 'click_object')
+    assert phases == set(
+        ['total', 'kwargs', 'finder', 'coder', 'record', 'device'])
+
+
+def test_execute_reuses_recorder_per_device():
+    g = create_scriptgenerator()
+    g.devices.append(Mock())
+    for _ in range(3):
+        g.execute('press_key', {'key_name': 'HOME'})
+        g.execute('press_key', {'key_name': 'HOME'}, device_index=1)
+    assert g.writer.get_recorder.call_count == 2
+    assert g.devices[1].press_key.call_count == 3
+
+
+def test_execute_plain_kwargs_and_defaults():
+    g = create_scriptgenerator()
+    g.execute('drag_xy_to_xy', {'start': (1, 2), 'end': (3, 4)})
+    _, coder_kwargs = g.coder.get_code_drag_xy_to_xy.call_args
+    _, device_kwargs = g.devices[0].drag_xy_to_xy.call_args
+    assert coder_kwargs == device_kwargs == {
+        'start': (1, 2), 'end': (3, 4), 'options': {}}
+
+
+def test_execute_updates_finder():
+    g = create_scriptgenerator()
+    g.finder = None
+    g.devices[0].dump.return_value = (
+        '<?xml version="1.0" ?><hierarchy rotation="0"></hierarchy>')
+    g.devices[0].info = {'displayWidth': 100, 'displayHeight': 100}
+    g.execute('update_view_dump')
+    assert g.finder is not None
+
+
+def test_execute_builds_fuzzy_index_on_update_if_warning():
+    for warn in (False, True):
+        g = create_scriptgenerator(warn_ambiguous_locators=warn)
+        g.devices[0].dump.return_value = (
+            '<?xml version="1.0" ?><hierarchy rotation="0">'
+            '<node text="a" bounds="[0,0][10,10]"/></hierarchy>')
+        g.devices[0].info = {'displayWidth': 100, 'displayHeight': 100}
+        g.execute('update_view_dump')
+        fuzzy_index = g.finder.hierarchy_dump.get_fuzzy_index(build=False)
+        assert (fuzzy_index is not None) == warn
+
+
+def test_execute_scores_locators_over_dumps():
+    g = create_scriptgenerator()
+    g.finder = None
+    g.devices[0].info = {'displayWidth': 1000, 'displayHeight': 1000}
+    rows = ('<node text="{0}" resource-id="id/row" clickable="true" '
+            'enabled="true" bounds="[0,{1}][1000,{2}]"/>')
+    for texts in (('Alpha', 'Beta'), ('Alpha',)):
+        g.devices[0].dump.return_value = (
+            '<?xml version="1.0" ?><hierarchy rotation="0">{0}'
+            '</hierarchy>'.format(''.join(
+                rows.format(t, i * 100, (i + 1) * 100)
+                for i, t in enumerate(texts))))
+        g.execute('update_view_dump')
+    g.execute('click_object', {'start': (500, 50)})
+    _, coder_kwargs = g.coder.get_code_click_object.call_args
+    assert coder_kwargs['locator'].filters == {'text': 'Alpha'}
+
+
+def test_execute_appends_actions_to_action_log():
+    g = create_scriptgenerator()
+    g.action_log = action_ir.ActionLog()
+    g.execute('press_key', {'key_name': 'HOME'})
+    g.execute('insert_wait', {'for_what': 'idle', 'timeout': 100})
+    assert [a.op for a in g.action_log] == ['press_key', 'wait']
+    assert g.action_log[1].args == {'for_what': 'idle', 'timeout': 100}
+    g.coder.get_code_wait.assert_called_once_with(
+        for_what='idle', timeout=100)
+
+
+def test_execute_stores_and_restores_dumps(tmpdir):
+    g = create_scriptgenerator()
+    g.session_store = session_store.SessionStore(str(tmpdir))
+    g.devices[0].info = {'displayWidth': 100, 'displayHeight': 100}
+    dumps = [
+        '<?xml version="1.0" ?><hierarchy rotation="0">'
+        '<node text="{0}" bounds="[0,0][10,10]"/></hierarchy>'.format(t)
+        for t in ('first', 'second')]
+    for dump in dumps + dumps[1:]:
+        g.devices[0].dump.return_value = dump
+        g.execute('update_view_dump',
+                  {'frame': Image.new('RGB', (100, 100))})
+    assert len(g.execute('get_session_dumps')) == 2
+    g.execute('restore_view_dump', {'index': -2})
+    texts = [o['text'] for o in g.finder.hierarchy_dump.find_objects()]
+    assert texts == ['first']
+    g.execute('press_key', {'key_name': 'HOME'})
+    kinds = [r.kind for r in g.session_store.records()]
+    assert kinds == ['dump', 'thumbnail', 'dump', 'thumbnail', 'action']
+    g.session_store.close()
@@ -3,7 +3,9 @@
 from __future__ import unicode_literals
 import pytest
 from mock import Mock, patch
-from phoneauto.scriptgenerator import scriptgenerator_ui
+from phoneauto.scriptgenerator import (
+    hitmap, instrumentation, profiler, scriptgenerator_ui)
+from phoneauto.scriptgenerator.bounds_store import FLAG_NAMES
 
 
 def create_scriptgenerator_ui():
@@ -19,3 +21,146 @@ def test_take_screenshot_cancel(mocks):
             'asksaveasfilename', return_value=''):
         ui._take_screenshot()
 
+
+
+def test_refresh_latency_panel(mocks):
+    ui = create_scriptgenerator_ui()
+    inst = instrumentation.Instrumentation()
+    inst.add_sample('press_key', 'total', 3.0)
+    inst.add_sample('click_object', 'total', 40.0)
+    ui._controller.instrumentation = inst
+    ui._refresh_latency_panel()
+    text = mocks.uiroot.nametowidget('sidebar.latencytext')
+    lines = [args[1] for args, _ in text.insert.call_args_list]
+    assert lines == ['click_object: 40/40\n', 'press_key: 3/3\n']
+
+
+def test_refresh_latency_panel_disabled(mocks):
+    ui = create_scriptgenerator_ui()
+    ui._controller.instrumentation = instrumentation.NullInstrumentation()
+    ui._refresh_latency_panel()
+    text = mocks.uiroot.nametowidget('sidebar.latencytext')
+    assert not text.insert.called
+
+
+def test_refresh_screen_profiled(mocks):
+    p = profiler.Profiler()
+    ui = scriptgenerator_ui.ScriptGeneratorUI(profiler=p)
+    ui._controller = Mock()
+    ui._controller.instrumentation = None
+    ui._screenrecord.queue.qsize.return_value = 2
+    ui._screenrecord.queue.empty.return_value = True
+    ui._refresh_screen()
+    mocks.uiroot.process_after_func()
+    events = p.events()
+    assert {'depth': 2} in [e['args'] for e in events if e['ph'] == 'C']
+    assert 'refresh_screen' in [e['name'] for e in events if e['ph'] == 'X']
+
+
+def hover_ui(mocks):
+    ui = create_scriptgenerator_ui()
+    ui._scale = (1.0, 1.0)
+    canvas = mocks.uiroot.nametowidget('mainframe.canvas')
+    canvas.create_rectangle.reset_mock()
+    return ui, canvas
+
+
+def motion(ui, x, y):
+    class _Event(object): pass
+    event = _Event()
+    event.x, event.y = x, y
+    ui._on_mouse_motion(event)
+
+
+def test_hover_coalesces_motion_events(mocks):
+    ui, canvas = hover_ui(mocks)
+    ui._controller.execute.return_value = None
+    for x in range(10):
+        motion(ui, x, 5)
+    canvas.process_after_func()
+    ui._controller.execute.assert_called_once_with(
+        'get_hierarchy_view_object_info', {'start': (9, 5)})
+
+
+def test_hover_skips_same_object(mocks):
+    ui, canvas = hover_ui(mocks)
+    info = {'visibleBounds':
+            {'left': 0, 'top': 0, 'right': 10, 'bottom': 10},
+            'text': 'abc'}
+    ui._controller.execute.return_value = info
+    motion(ui, 1, 1)
+    canvas.process_after_func()
+    motion(ui, 1, 1)
+    canvas.process_after_func()
+    assert ui._controller.execute.call_count == 1
+    motion(ui, 2, 2)
+    canvas.process_after_func()
+    assert ui._controller.execute.call_count == 2
+    assert canvas.create_rectangle.call_count == 1
+
+
+def test_hover_redraws_after_leave(mocks):
+    ui, canvas = hover_ui(mocks)
+    ui._controller.execute.return_value = {
+        'visibleBounds': {'left': 0, 'top': 0, 'right': 10, 'bottom': 10}}
+    motion(ui, 1, 1)
+    canvas.process_after_func()
+    ui._on_mouse_leave(None)
+    motion(ui, 1, 1)
+    canvas.process_after_func()
+    assert canvas.create_rectangle.call_count == 2
+
+
+def test_hover_uses_hit_map(mocks):
+    pytest.importorskip('numpy')
+    ui, canvas = hover_ui(mocks)
+    info = {'visibleBounds':
+            {'left': 0, 'top': 0, 'right': 10, 'bottom': 10}}
+    info.update(dict((name, False) for name in FLAG_NAMES))
+    ui._controller.execute.return_value = [info]
+    ui._build_hit_map().join()
+    ui._controller.execute.reset_mock()
+    motion(ui, 5, 5)
+    canvas.process_after_func()
+    assert not ui._controller.execute.called
+    assert canvas.create_rectangle.call_count == 1
+
+
+def test_hit_map_survives_mouse_leave(mocks):
+    pytest.importorskip('numpy')
+    ui, canvas = hover_ui(mocks)
+    info = {'visibleBounds':
+            {'left': 0, 'top': 0, 'right': 10, 'bottom': 10}}
+    info.update(dict((name, False) for name in FLAG_NAMES))
+    ui._controller.execute.return_value = [info]
+    ui._build_hit_map().join()
+    ui._on_mouse_leave(None)
+    assert ui._hit_map is not None
+    ui._controller.execute.reset_mock()
+    motion(ui, 5, 5)
+    canvas.process_after_func()
+    assert not ui._controller.execute.called
+
+
+def test_hit_map_of_leave_time_is_discarded_after_update(mocks):
+    pytest.importorskip('numpy')
+    ui, canvas = hover_ui(mocks)
+    ui._controller.execute.return_value = []
+    with patch.object(hitmap.HitMapBuilder, 'start'):
+        stale_builder = ui._build_hit_map()
+        ui._on_mouse_leave(None)
+        ui._build_hit_map()
+    stale_builder.run()
+    assert ui._hit_map is None
+
+
+def test_obsolete_hit_map_is_discarded(mocks):
+    pytest.importorskip('numpy')
+    ui, canvas = hover_ui(mocks)
+    ui._controller.execute.return_value = []
+    with patch.object(hitmap.HitMapBuilder, 'start'):
+        builder = ui._build_hit_map()
+    ui._hit_map_generation += 1
+    builder.run()
+    assert builder.hit_map is not None
+    assert ui._hit_map is None
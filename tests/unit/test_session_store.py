@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import io
+import os
+
+from PIL import Image
+import pytest
+
+from phoneauto.scriptgenerator.action_ir import Action
+from phoneauto.scriptgenerator.session_store import (
+    INDEX_FILE_NAME, KIND_ACTION, KIND_DUMP, KIND_THUMBNAIL, SessionStore)
+
+_DEVICE_INFO = {'displayWidth': 100, 'displayHeight': 200}
+
+
+def dump_xml(text):
+    return ('<?xml version="1.0" ?><hierarchy rotation="0">'
+            '<node text="{0}" bounds="[0,0][10,10]"/></hierarchy>'
+            .format(text))
+
+
+@pytest.fixture
+def store(tmpdir):
+    s = SessionStore(str(tmpdir.join('session')))
+    yield s
+    s.close()
+
+
+def test_append_and_read(store):
+    first = store.append('blob', b'abc', {'x': 1})
+    second = store.append('blob', b'defg')
+    empty = store.append('blob', b'')
+    assert store.read(second) == b'defg'
+    assert store.read(first) == b'abc'
+    assert store.read(empty) == b''
+    assert [r.number for r in store.records()] == [0, 1, 2]
+    assert first.meta == {'x': 1}
+
+
+def test_dumps_are_stored_unless_unchanged(store):
+    assert store.add_dump(_DEVICE_INFO, dump_xml('a')) is not None
+    assert store.add_dump(_DEVICE_INFO, dump_xml('a')) is None
+    store.add_dump(_DEVICE_INFO, dump_xml('b'))
+    records = store.records(KIND_DUMP)
+    assert len(records) == 2
+    hd = store.load_dump(records[0])
+    assert [o['text'] for o in hd.find_objects()] == ['a']
+
+
+def test_thumbnail_and_action(store):
+    record = store.add_thumbnail(Image.new('RGB', (540, 960), 'red'))
+    thumbnail = store.load_thumbnail(record)
+    assert thumbnail.size == (135, 240)
+    assert record.meta == {'width': 540, 'height': 960}
+    action = Action('press_key', {'key_name': 'HOME', 'meta': None})
+    assert store.load_action(store.add_action(action)) == action
+    assert [r.kind for r in store.records()] == [KIND_THUMBNAIL, KIND_ACTION]
+
+
+def test_reopen_continues_session(tmpdir):
+    directory = str(tmpdir.join('session'))
+    store = SessionStore(directory)
+    store.add_dump(_DEVICE_INFO, dump_xml('a'))
+    store.close()
+    store = SessionStore(directory)
+    store.add_dump(_DEVICE_INFO, dump_xml('b'))
+    texts = [store.load_dump(r).find_objects()[0]['text']
+             for r in store.records(KIND_DUMP)]
+    assert texts == ['a', 'b']
+    assert [r.number for r in store.records()] == [0, 1]
+    store.close()
+
+
+def test_reopen_ignores_incomplete_records(tmpdir):
+    directory = str(tmpdir.join('session'))
+    store = SessionStore(directory)
+    store.append('blob', b'abc')
+    store.close()
+    with io.open(os.path.join(directory, INDEX_FILE_NAME), 'a',
+                 encoding='utf-8') as index_file:
+        index_file.write(
+            '{"number": 1, "kind": "blob", "offset": 3, "length": 10, '
+            '"time": 0, "meta": {}}\n{"number": 2, "ki')
+    store = SessionStore(directory)
+    assert len(store) == 1
+    assert store.read(store.records()[0]) == b'abc'
+    store.close()
+
+
+def test_reopen_truncates_torn_records_before_appending(tmpdir):
+    directory = str(tmpdir.join('session'))
+    store = SessionStore(directory)
+    store.append('blob', b'abc')
+    store.close()
+    with io.open(os.path.join(directory, 'segment.bin'), 'ab') as segment:
+        segment.write(b'torn payload')
+    with io.open(os.path.join(directory, INDEX_FILE_NAME), 'a',
+                 encoding='utf-8') as index_file:
+        index_file.write(
+            '{"number": 1, "kind": "blob", "offset": 3, "length": 40, '
+            '"time": 0, "meta": {}}\n{"number": 2, "ki')
+    store = SessionStore(directory)
+    store.append('blob', b'defg')
+    store.close()
+
+    store = SessionStore(directory)
+    records = store.records()
+    assert [r.number for r in records] == [0, 1]
+    assert [store.read(r) for r in records] == [b'abc', b'defg']
+    assert records[1].offset == 3
+    store.close()
+    with io.open(os.path.join(directory, INDEX_FILE_NAME),
+                 encoding='utf-8') as index_file:
+        assert len(index_file.read().splitlines()) == 2
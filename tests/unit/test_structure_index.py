@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import pytest
+from tests.dump_generator import (
+    create_dump, generate_dump_xml, read_testdata)
+
+
+# Positions of nodes in dump_settings.xml
+FRAME, LIST, ROW0, WIFI, SWITCH0, ROW1, BLUETOOTH, SWITCH1 = range(8)
+DIALOG, DIALOG_OK, CANCEL, BOTTOM_OK = range(8, 12)
+
+
+@pytest.fixture
+def dump():
+    return create_dump(read_testdata('dump_settings.xml'))
+
+
+def test_parent_depth_and_sibling_position(dump):
+    index = dump.get_structure_index()
+    assert len(index) == len(dump)
+    assert index.parent(FRAME) is None
+    assert index.parent(SWITCH1) == ROW1
+    assert index.depth(FRAME) == 0
+    assert index.depth(SWITCH1) == 3
+    assert index.sibling_position(ROW1) == 1
+    assert index.sibling_position(BOTTOM_OK) == 2
+    assert dump.get_structure_index() is index
+
+
+def test_children_siblings_and_ancestors(dump):
+    index = dump.get_structure_index()
+    assert index.children(None) == [FRAME]
+    assert index.children(FRAME) == [LIST, DIALOG, BOTTOM_OK]
+    assert index.children(WIFI) == []
+    assert index.siblings(DIALOG) == [LIST, BOTTOM_OK]
+    assert index.ancestors(SWITCH0) == [ROW0, LIST, FRAME]
+    assert index.ancestors(FRAME) == []
+
+
+def test_descendants_and_ancestor_test(dump):
+    index = dump.get_structure_index()
+    assert list(index.descendants(LIST)) == list(range(ROW0, SWITCH1 + 1))
+    assert list(index.descendants(WIFI)) == []
+    assert list(index.descendants(None)) == list(range(len(dump)))
+    assert index.is_ancestor(FRAME, BOTTOM_OK)
+    assert index.is_ancestor(LIST, SWITCH1)
+    assert not index.is_ancestor(ROW0, SWITCH1)
+    assert not index.is_ancestor(SWITCH1, SWITCH1)
+    assert not index.is_ancestor(DIALOG, LIST)
+
+
+def test_ancestor_test_agrees_with_parent_pointers():
+    dump = create_dump(generate_dump_xml(300))
+    index = dump.get_structure_index()
+    for position in range(len(dump)):
+        ancestors = set(index.ancestors(position))
+        for other in range(len(dump)):
+            assert index.is_ancestor(other, position) == (other in ancestors)
+
+
+def test_find_related_objects(dump):
+    found = dump.find_related_objects(DIALOG, 'child', text='OK')
+    assert [dump.get_position(o) for o in found] == [DIALOG_OK]
+    found = dump.find_related_objects(
+        WIFI, 'sibling', className='android.widget.Switch')
+    assert [dump.get_position(o) for o in found] == [SWITCH0]
+    found = dump.find_related_objects(FRAME, 'sibling', text='OK')
+    assert [dump.get_position(o) for o in found] == [DIALOG_OK, BOTTOM_OK]
+    with pytest.raises(ValueError):
+        dump.find_related_objects(FRAME, 'parent', text='OK')
+
+
+def test_get_position(dump):
+    obj = dump.get_object(CANCEL)
+    assert dump.get_position(obj) == CANCEL
+    assert dump.get_position(dict(obj)) is None
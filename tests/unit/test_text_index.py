@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import xml.etree.ElementTree as ET
+
+from phoneauto.scriptgenerator.text_index import (
+    FuzzyTextIndex, SubstringIndex, ValueIndex, edit_distance, trigrams)
+
+
+def nodes(*attrs_list):
+    return [ET.Element('node', attrs) for attrs in attrs_list]
+
+
+def test_trigrams_are_padded_and_case_insensitive():
+    assert trigrams('Ab') == set([' ab', 'ab '])
+    assert trigrams('OK') == trigrams('ok')
+    assert trigrams('') == set()
+
+
+def test_edit_distance():
+    assert edit_distance('kitten', 'sitting', 5) == 3
+    assert edit_distance('abc', 'abc', 1) == 0
+    assert edit_distance('abc', 'abd', 1) == 1
+    assert edit_distance('abc', 'xyz', 1) == 2
+    assert edit_distance('a', 'abcdef', 2) == 3
+
+
+def test_search_ranks_by_similarity():
+    index = FuzzyTextIndex(nodes(
+        {'text': 'Bluetooth'}, {'text': 'Blue tooth settings'},
+        {'text': 'Display'}, {'content-desc': 'Bluetooth'}))
+    found = index.search('bluetoth')
+    assert [(f.position, f.name) for f in found[:2]] == [
+        (0, 'text'), (3, 'description')]
+    assert found[0].score == found[1].score
+    assert all(f.position != 2 for f in found)
+    assert found[0].score > found[2].score
+
+
+def test_search_by_names_and_limit():
+    index = FuzzyTextIndex(nodes(
+        {'text': 'Battery', 'resource-id': 'p:id/battery'},
+        {'text': 'Battery saver'}))
+    assert len(index) == 3
+    found = index.search('battery', names=('resourceId',))
+    assert [(f.name, f.value) for f in found] == [
+        ('resourceId', 'p:id/battery')]
+    assert len(index.search('battery', limit=1)) == 1
+
+
+def test_search_min_score():
+    index = FuzzyTextIndex(nodes({'text': 'Wi-Fi'}, {'text': 'Storage'}))
+    assert index.search('Wi-Fi', min_score=1.0)[0].value == 'Wi-Fi'
+    assert index.search('Sound', min_score=0.5) == []
+
+
+def test_substring_index_contains():
+    index = SubstringIndex(nodes(
+        {'text': 'Settings'}, {'text': 'settings'}, {'text': 'Set up'},
+        {}, {'text': 'Reset settings'}), 'text')
+    assert index.contains('ttings') == [0, 1, 4]
+    assert index.contains('Sett') == [0]
+    assert index.contains('xyz') == []
+    assert index.contains('Se') is None
+
+
+def test_substring_index_startswith():
+    index = SubstringIndex(nodes(
+        {'text': 'Settings'}, {'text': 'Set up'}, {}, {'text': 'Set'},
+        {'text': 'Reset'}), 'text')
+    assert index.startswith('Set') == [0, 1, 3]
+    assert index.startswith('Setx') == []
+    assert index.startswith('') is None
+
+
+def test_value_index_equals():
+    index = ValueIndex(nodes(
+        {'text': 'Set'}, {'text': 'Set up'}, {}, {'text': 'Set'}), 'text')
+    assert index.equals('Set') == [0, 3]
+    assert index.equals('') == [2]
+    assert index.equals('Reset') == []
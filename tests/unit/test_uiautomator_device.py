@@ -2,6 +2,8 @@
 
 from __future__ import unicode_literals
 from phoneauto.scriptgenerator import uiautomator_device
+from phoneauto.scriptgenerator.replay import PreresolvedLocator
+from phoneauto.scriptgenerator.uiobjectfinder import UiObjectLocator
 
 
 def test_device_name_is_uiautomator_device_serial(mocks):
@@ -10,3 +12,42 @@ def test_device_name_is_uiautomator_device_serial(mocks):
     assert d.device_name == 'abcde'
 
 
+
+
+def test_wait(mocks):
+    d = uiautomator_device.UiautomatorDevice()
+    mocks.device.wait.update.return_value = False
+    assert d.wait('update', 100) is False
+    mocks.device.wait.update.assert_called_once_with(timeout=100)
+    d.wait('idle', None)
+    mocks.device.wait.idle.assert_called_once_with()
+
+
+def test_wait_object(mocks):
+    d = uiautomator_device.UiautomatorDevice()
+    obj = mocks.device.return_value
+    obj.__len__ = lambda _: 1
+    locator = UiObjectLocator(filters={'text': 'OK'})
+    d.wait_object(locator, 'gone', 100)
+    mocks.device.assert_called_with(text='OK')
+    obj.__getitem__.return_value.wait.gone.assert_called_once_with(
+        timeout=100)
+
+
+def test_preresolved_locator_is_selected_by_instance(mocks):
+    d = uiautomator_device.UiautomatorDevice()
+    d.click_object(PreresolvedLocator({'text': 'OK'}, index=2), None)
+    mocks.device.assert_called_once_with(text='OK', instance=2)
+    mocks.device.return_value.click.assert_called_once_with()
+
+
+def test_relational_locator_is_selected_from_anchor(mocks):
+    d = uiautomator_device.UiautomatorDevice()
+    anchor = mocks.device.return_value
+    anchor.child.return_value.__len__ = lambda _: 1
+    locator = PreresolvedLocator(
+        {'text': 'OK'}, relation=('child', {'resourceId': 'id/dialog'}))
+    d.click_object(locator, None)
+    mocks.device.assert_called_once_with(resourceId='id/dialog')
+    anchor.child.assert_called_once_with(text='OK')
+    anchor.child.return_value.__getitem__.assert_called_once_with(0)
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import unicode_literals
+import os
+import subprocess
 
+from mock import Mock
 import pytest
+from uiautomator import param_to_property
 from phoneauto.helpers.uiautomator_device_wrapper import DeviceWrapper
+from phoneauto.helpers.wait_policy import AdaptiveWaitPolicy
 
 
 @pytest.fixture
@@ -38,6 +43,28 @@ def test_press_with_keycode(mocks, wdev):
     assert mocks.device.wait.update.called
 
 
+def test_input_text(mocks, wdev):
+    wdev.input_text("it's a (b)")
+    assert mocks.device.server.adb.cmd.call_args[0][:3] == (
+        'shell', 'input', 'text')
+    assert mocks.device.wait.idle.called
+    assert mocks.device.wait.update.called
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX host shell')
+@pytest.mark.parametrize('text', [
+    "it's a (b)", 'a&b;c|d', '\'"\'', '<x> $HOME `id`', '~!#?*[]{}^\\'])
+def test_input_text_survives_host_and_device_shells(mocks, wdev, text):
+    wdev.input_text(text)
+    arg = mocks.device.server.adb.cmd.call_args[0][3]
+
+    def shell_echo(command_line):
+        return subprocess.check_output(
+            ['sh', '-c', 'printf %s ' + command_line]).decode('utf-8')
+    # The host shell, then the device shell parse the argument
+    assert shell_echo(shell_echo(arg)) == text.replace(' ', '%s')
+
+
 def test_screen_eq(mocks, wdev):
     wdev.screen == 'on'
     assert mocks.device.screen.__eq__.called
@@ -64,3 +91,76 @@ def test_set_orientation(mocks, wdev):
 def test_get_orientation(mocks, wdev):
     mocks.device.orientation = 'right'
     assert wdev.orientation == 'right'
+
+
+def test_wait_policy_receives_action_names(mocks):
+    policy = Mock()
+    wdev = DeviceWrapper(mocks.device, wait_policy=policy)
+    wdev.click(1, 2)
+    wdev.press.home()
+    wdev.orientation = 'left'
+    actions = [c[0][1] for c in policy.pre_exec.call_args_list]
+    assert actions == ['click', 'press.home', 'orientation']
+    assert policy.post_exec.call_count == 3
+
+
+def test_selector_invalidates_wait_policy(mocks):
+    policy = Mock()
+    wdev = DeviceWrapper(mocks.device, wait_policy=policy)
+    wdev(text='abc')
+    assert policy.invalidate.called
+
+
+def test_adaptive_wait_policy(mocks):
+    policy = AdaptiveWaitPolicy()
+    wdev = DeviceWrapper(mocks.device, wait_policy=policy)
+    wdev.click(1, 2)
+    wdev.click(1, 2)
+    assert wdev.wait_policy is policy
+    assert mocks.device.wait.idle.call_count == 3
+    assert policy.stats.pre_idle_skipped == 1
+
+
+def test_wrapped_attributes_are_cached(mocks, wdev):
+    assert wdev.click is wdev.click
+    assert wdev.press is wdev.press
+
+
+class _StatefulPressDevice(object):
+    # press/open behave as uiautomator.AutomatorDevice's:
+    # a new stateful object is returned on every access
+
+    def __init__(self):
+        self.wait = Mock()
+        self.pressed = []
+        self.opened = []
+
+    @property
+    def press(self):
+        @param_to_property('home', 'back')
+        def _press(key, meta=None):
+            self.pressed.append(key)
+        return _press
+
+    @property
+    def open(self):
+        @param_to_property(action=['notification', 'quick_settings'])
+        def _open(action):
+            self.opened.append(action)
+        return _open
+
+
+def test_stateful_properties_are_got_on_every_access():
+    device = _StatefulPressDevice()
+    policy = Mock()
+    wdev = DeviceWrapper(device, wait_policy=policy)
+    wdev.press.home()
+    wdev.press.back()
+    wdev.press.home()
+    wdev.press(4)
+    wdev.open.notification()
+    wdev.open.quick_settings()
+    assert device.pressed == ['home', 'back', 'home', 4]
+    assert device.opened == ['notification', 'quick_settings']
+    assert policy.pre_exec.call_count == 6
+    assert policy.post_exec.call_count == 6
@@ -3,6 +3,7 @@
 from __future__ import unicode_literals
 
 from mock import call
+from uiautomator import JsonRPCError
 import pytest
 from tests.uiautomator_mock import uia_element_info
 from phoneauto.helpers.uiautomator_notfound_handlers import *
@@ -52,3 +53,82 @@ def test_handle_appcrash_appcrash_occured(mocks):
 def test_handle_appcrash_no_appcrash(mocks):
     mocks.device.return_value = uiobj(text='Good')
     handle_appcrash(mocks.device)
+
+
+class NotFoundObject(object):
+
+    @property
+    def info(self):
+        raise JsonRPCError(-32002, 'UiObjectNotFoundException')
+
+
+def test_watcher_no_message_found(mocks):
+    mocks.device.return_value = NotFoundObject()
+    watcher = UnexpectedUIStateWatcher()
+    assert watcher(mocks.device) is False
+
+
+def test_watcher_queries_message_once(mocks):
+    mocks.device.return_value = uiobj(text='Good')
+    watcher = UnexpectedUIStateWatcher()
+    watcher(mocks.device)
+    mocks.device.assert_called_once_with(
+        packageName='android', resourceId='android:id/message')
+
+
+def test_watcher_anr_occured(mocks):
+    mocks.device.return_value = uiobj(text='ABC isn\'t responding')
+    with pytest.raises(ANRException):
+        UnexpectedUIStateWatcher()(mocks.device)
+
+
+def test_watcher_appcrash_occured(mocks):
+    mocks.device.return_value = uiobj(text='Unfortunately, ')
+    with pytest.raises(AppCrashException):
+        UnexpectedUIStateWatcher()(mocks.device)
+
+
+class CustomException(UnexpectedUIStateException):
+    pass
+
+
+def test_watcher_user_pattern(mocks):
+    mocks.device.return_value = uiobj(text='Low battery')
+    watcher = UnexpectedUIStateWatcher()
+    watcher.register('battery', CustomException, 'battery warning')
+    with pytest.raises(CustomException) as excinfo:
+        watcher(mocks.device)
+    assert excinfo.value.message == 'battery warning'
+
+
+def test_install_watcher(mocks):
+    watcher = install_unexpected_ui_state_watcher(mocks.device)
+    mocks.device.handlers.on.assert_called_once_with(watcher)
+    assert not mocks.device.watcher.called
+
+
+def test_install_watcher_device_side(mocks):
+    watcher = UnexpectedUIStateWatcher()
+    watcher.install(mocks.device, device_side=True)
+    assert mocks.device.watcher.call_count == len(STANDARD_PATTERNS)
+    _, when_kwargs = mocks.device.watcher.return_value.when.call_args
+    assert when_kwargs['resourceId'] == 'android:id/message'
+
+
+def test_watcher_device_side_not_triggered(mocks):
+    watcher = UnexpectedUIStateWatcher()
+    watcher.install(mocks.device, device_side=True)
+    mocks.device.watchers.triggered = False
+    mocks.device.reset_mock()
+    watcher(mocks.device)
+    assert not mocks.device.called
+
+
+def test_watcher_device_side_triggered(mocks):
+    watcher = UnexpectedUIStateWatcher()
+    watcher.install(mocks.device, device_side=True)
+    mocks.device.watchers.triggered = True
+    mocks.device.watcher.return_value.triggered = True
+    with pytest.raises(ANRException):
+        watcher(mocks.device)
+    assert mocks.device.watchers.reset.called
@@ -3,8 +3,10 @@
 from __future__ import unicode_literals
 import os
 import pytest
+from mock import patch
 from phoneauto.scriptgenerator import uiobjectfinder
 from phoneauto.scriptgenerator import view_hierarchy_dump
+from phoneauto.scriptgenerator.exception import UiObjectNotFound
 
 
 DIRNAME = os.path.join(
@@ -152,3 +154,152 @@ def test_find_contains_has_non_unique():
         (x, y), False, className='android.widget.FrameLayout')
     assert locator.index is not None
 
+
+
+def test_find_contains_memoizes_locator():
+    finder = create_finder()
+    with patch.object(finder, '_determine_locator',
+                      wraps=finder._determine_locator) as determine:
+        loc0 = finder.find_object_contains((150, 1280), False, clickable=True)
+        loc1 = finder.find_object_contains((150, 1280), False, clickable=True)
+        loc2 = finder.find_object_contains((151, 1281), False, clickable=True)
+    assert loc0 is loc1 is loc2
+    assert determine.call_count == 1
+
+
+def test_find_contains_memo_distinguishes_criteria():
+    finder = create_finder()
+    loc0 = finder.find_object_contains((150, 1280), False, clickable=True)
+    loc1 = finder.find_object_contains((150, 1280), False, clickable='true')
+    loc2 = finder.find_object_contains((150, 1280), False)
+    assert loc0 is not loc1
+    assert loc0 is not loc2
+
+
+def test_find_contains_memoizes_not_found():
+    finder = create_finder()
+    with patch.object(finder, '_determine_locator') as determine:
+        for _ in range(2):
+            with pytest.raises(UiObjectNotFound):
+                finder.find_object_contains(
+                    (150, 1280), False, text='no such text')
+    assert not determine.called
+
+
+def test_find_contains_memo_is_per_finder():
+    loc0 = create_finder().find_object_contains((150, 1280), False)
+    loc1 = create_finder().find_object_contains((150, 1280), False)
+    assert loc0 is not loc1
+    assert loc0.filters == loc1.filters
+
+
+def test_find_contains_memo_clear():
+    finder = create_finder()
+    loc0 = finder.find_object_contains((150, 1280), False)
+    finder.clear_cache()
+    assert finder.find_object_contains((150, 1280), False) is not loc0
+
+
+def test_find_similar_objects_ranks_closest_text():
+    finder = create_finder()
+    results = finder.find_similar_objects('Gmai')
+    score, locator = results[0]
+    assert list(locator.filters.values()) == ['Gmail']
+    meta = locator.meta
+    assert 'Gmail' in (meta['text'], meta['contentDescription'])
+    assert 0 < score < 1
+    assert [s for s, _ in results] == sorted(
+        (s for s, _ in results), reverse=True)
+
+
+def test_find_similar_objects_exact_match_scores_one():
+    finder = create_finder()
+    score, locator = finder.find_similar_objects('play store')[0]
+    assert score == 1.0
+    assert list(locator.filters.values()) == ['Play Store']
+
+
+SIMILARTEXT_XML = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="Inbox (12)" resource-id="" class="android.view.View"
+    package="p" content-desc="" clickable="true" enabled="true"
+    bounds="[0,0][1080,100]" />
+  <node index="1" text="Inbox (13)" resource-id="" class="android.view.View"
+    package="p" content-desc="" clickable="true" enabled="true"
+    bounds="[0,100][1080,200]" />
+  <node index="2" text="Settings" resource-id="" class="android.view.View"
+    package="p" content-desc="" clickable="true" enabled="true"
+    bounds="[0,200][1080,300]" />
+</hierarchy>
+"""
+
+
+def test_determine_locator_warns_ambiguous_text(caplog):
+    hd = view_hierarchy_dump.ViewHierarchyDump(DEVICE_INFO, SIMILARTEXT_XML)
+    hd.get_fuzzy_index()
+    finder = uiobjectfinder.UiObjectFinder(hd, warn_ambiguous=True)
+    locator = finder.find_object_contains((500, 50), False)
+    assert locator.filters == {'text': 'Inbox (12)'}
+    assert "'Inbox (13)'" in caplog.text
+
+    caplog.clear()
+    locator = finder.find_object_contains((500, 250), False)
+    assert locator.filters == {'text': 'Settings'}
+    assert 'ambiguous' not in caplog.text
+
+
+def test_ambiguity_check_is_opt_in_and_never_builds_index(caplog):
+    hd = view_hierarchy_dump.ViewHierarchyDump(DEVICE_INFO, SIMILARTEXT_XML)
+    finder = uiobjectfinder.UiObjectFinder(hd, warn_ambiguous=True)
+    finder.find_object_contains((500, 50), False)
+    assert hd.get_fuzzy_index(build=False) is None
+    hd.get_fuzzy_index()
+    uiobjectfinder.UiObjectFinder(hd).find_object_contains((500, 50), False)
+    assert 'ambiguous' not in caplog.text
+
+
+def create_settings_finder():
+    xml = read_xml('dump_settings.xml')
+    hd = view_hierarchy_dump.ViewHierarchyDump(DEVICE_INFO, xml)
+    return uiobjectfinder.UiObjectFinder(hd)
+
+
+def test_find_contains_locates_by_sibling():
+    finder = create_settings_finder()
+    locator = finder.find_object_contains((900, 100), False)
+    assert locator.filters == {'resourceId': 'android:id/switch_widget'}
+    assert locator.relation == ('sibling', {'text': 'Wi-Fi'})
+    assert locator.index is None
+    assert locator.meta['checkable']
+
+
+def test_find_contains_without_relation_falls_back_to_index():
+    finder = create_settings_finder()
+    locator = finder.find_object_contains(
+        (900, 100), False, relational=False)
+    assert locator.relation is None
+    assert locator.index is not None
+    assert finder.find_object_contains(
+        (900, 100), False).relation is not None
+
+
+def test_find_contains_locates_by_child():
+    finder = create_settings_finder()
+    locator = finder.find_object_contains((200, 1200), False)
+    assert locator.filters == {'resourceId': 'android:id/button1'}
+    assert locator.relation == (
+        'child', {'resourceId': 'com.android.settings:id/dialog'})
+
+
+def test_find_contains_falls_back_to_index_without_anchor():
+    finder = create_settings_finder()
+    locator = finder.find_object_contains((500, 1700), False)
+    assert locator.relation is None
+    assert locator.index is not None
+
+
+def test_find_contains_prefers_unique_filters_to_relation():
+    finder = create_settings_finder()
+    locator = finder.find_object_contains((400, 300), False)
+    assert locator.filters == {'text': 'Bluetooth'}
+    assert locator.relation is None
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+from mock import patch
+import pytest
+from phoneauto.scriptgenerator import view_hierarchy_dump
+from phoneauto.scriptgenerator.view_hierarchy_dump import (
+    CompiledQuery, ViewHierarchyDump, compile_query)
+from tests.dump_generator import (
+    create_dump, generate_dump_xml, read_testdata)
+
+
+def create_home_dump():
+    return create_dump(read_testdata('dump_home.xml'))
+
+
+def test_compile_query_is_cached():
+    q0 = compile_query({'textMatches': '^Gm.+', 'enabled': True})
+    q1 = compile_query({'enabled': True, 'textMatches': '^Gm.+'})
+    assert q0 is q1
+
+
+def test_compile_query_distinguishes_values():
+    q0 = compile_query({'text': 'Gmail'})
+    q1 = compile_query({'text': 'Camera'})
+    assert q0 is not q1
+
+
+def test_cached_query_does_not_compile_regex():
+    compile_query({'textMatches': 'ail$'})
+    with patch.object(view_hierarchy_dump.re, 'compile') as re_compile:
+        compile_query({'textMatches': 'ail$'})
+        create_home_dump().find_objects(textMatches='ail$')
+        assert not re_compile.called
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = view_hierarchy_dump._QueryCache(maxsize=2)
+    q_a = cache.get({'text': 'a'})
+    cache.get({'text': 'b'})
+    cache.get({'text': 'a'})
+    cache.get({'text': 'c'})
+    assert cache.get({'text': 'a'}) is q_a
+    assert len(cache._queries) == 2
+
+
+def test_compile_query_notimplemented():
+    with pytest.raises(NotImplementedError):
+        CompiledQuery({'nosuchkey': True})
+
+
+def test_find_objects_by_query():
+    hd = create_home_dump()
+    query = compile_query({'text': 'Gmail'})
+    found = hd.find_objects_by_query(query)
+    assert [o['text'] for o in found] == ['Gmail']
+    assert found == hd.find_objects(text='Gmail')
+
+
+def test_bounds_attr():
+    out_attrs = {}
+    ViewHierarchyDump._get_bounds_attr(
+        {'bounds': '[-1,2][300,+400]'}, out_attrs)
+    assert out_attrs['bounds'] == {
+        'left': -1, 'top': 2, 'right': 300, 'bottom': 400}
+
+
+@pytest.mark.parametrize('criteria', [
+    {'textContains': 'ings 1'},
+    {'textContains': 'ings 1', 'clickable': True},
+    {'textStartsWith': 'Cam'},
+    {'text': 'Maps 7'},
+    {'text': ''},
+    {'descriptionContains': 'lock'},
+    {'resourceIdMatches': 'id/s'},
+    {'textContains': 'e'},
+])
+def test_find_objects_with_substring_index(criteria):
+    xml = generate_dump_xml(1000)
+    indexed = create_dump(xml)
+    scanned = create_dump(xml)
+    scanned._SUBSTRING_INDEX_MIN_NODES = len(scanned) + 1
+    expected = scanned.find_objects(**criteria)
+    for _ in range(indexed._SUBSTRING_INDEX_MIN_QUERIES):
+        assert indexed.find_objects(**criteria) == expected
+    num_indices = (
+        len(indexed._value_indices) + len(indexed._substring_indices))
+    assert (num_indices > 0) == ('resourceIdMatches' not in criteria)
+
+
+def test_equality_search_does_not_build_substring_index():
+    hd = create_dump(generate_dump_xml(1000))
+    text = hd.nodes[-1].get('text')
+    assert hd.find_objects(text=text)[-1] is hd.get_object(len(hd) - 1)
+    assert list(hd._value_indices) == ['text']
+    assert not hd._substring_indices
+
+
+def test_substring_index_is_built_on_repeated_searches():
+    hd = create_dump(generate_dump_xml(1000))
+    for _ in range(hd._SUBSTRING_INDEX_MIN_QUERIES - 1):
+        hd.find_objects(textContains='ings 1')
+        hd.find_objects(descriptionStartsWith='Cam')
+    assert not hd._substring_indices
+    hd.find_objects(textStartsWith='Cam')
+    assert list(hd._substring_indices) == ['text']
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from mock import Mock
+import pytest
+from phoneauto.helpers.wait_policy import (
+    AdaptiveWaitPolicy, FixedWaitPolicy)
+from tests.fake_clock import FakeClock
+
+
+def fake_wait(clock, update_ms=50, updated=True, idle_ms=500):
+    wait = Mock()
+
+    def update(timeout):
+        clock.advance(update_ms if updated else timeout)
+        return updated
+
+    def idle(timeout):
+        clock.advance(idle_ms)
+        return True
+
+    wait.update.side_effect = update
+    wait.idle.side_effect = idle
+    return wait
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_fixed_policy_waits_with_fixed_timeouts():
+    wait = Mock()
+    policy = FixedWaitPolicy(idle_timeout=123, update_timeout=45)
+    policy.pre_exec(wait, 'click')
+    policy.post_exec(wait, 'click')
+    wait.update.assert_called_once_with(timeout=45)
+    assert wait.idle.call_count == 2
+
+
+def test_adaptive_first_action_uses_full_timeout(clock):
+    wait = fake_wait(clock)
+    policy = AdaptiveWaitPolicy(update_timeout=1000, clock=clock)
+    policy.pre_exec(wait, 'click')
+    policy.post_exec(wait, 'click')
+    wait.update.assert_called_once_with(timeout=1000)
+    assert policy.settle_time('click') == pytest.approx(50)
+
+
+def test_adaptive_learns_settle_time_per_action(clock):
+    wait = fake_wait(clock, update_ms=150)
+    policy = AdaptiveWaitPolicy(update_timeout=1000, margin=2.0, clock=clock)
+    policy.pre_exec(wait, 'click')
+    policy.post_exec(wait, 'click')
+    assert policy.update_timeout_for('click') == 300
+    assert policy.update_timeout_for('press.home') == 1000
+
+
+def test_adaptive_timeout_is_bounded(clock):
+    policy = AdaptiveWaitPolicy(
+        update_timeout=1000, min_update_timeout=100, clock=clock)
+    policy.pre_exec(fake_wait(clock, update_ms=1), 'a')
+    policy.post_exec(fake_wait(clock, update_ms=1), 'a')
+    policy.pre_exec(fake_wait(clock, update_ms=5000), 'b')
+    policy.post_exec(fake_wait(clock, update_ms=5000), 'b')
+    assert policy.update_timeout_for('a') == 100
+    assert policy.update_timeout_for('b') == 1000
+
+
+def test_adaptive_skips_post_idle_when_not_updated(clock):
+    wait = fake_wait(clock, updated=False)
+    policy = AdaptiveWaitPolicy(clock=clock)
+    policy.post_exec(wait, 'press.volume_up')
+    assert not wait.idle.called
+    assert policy.stats.post_idle_skipped == 1
+
+
+def test_adaptive_skips_pre_idle_after_post_wait(clock):
+    wait = fake_wait(clock)
+    policy = AdaptiveWaitPolicy(idle_validity=1000, clock=clock)
+    policy.pre_exec(wait, 'click')
+    policy.post_exec(wait, 'click')
+    wait.idle.reset_mock()
+    policy.pre_exec(wait, 'click')
+    assert not wait.idle.called
+    assert policy.stats.pre_idle_skipped == 1
+
+
+def test_adaptive_does_not_trust_stale_idleness(clock):
+    wait = fake_wait(clock)
+    policy = AdaptiveWaitPolicy(idle_validity=1000, clock=clock)
+    policy.post_exec(wait, 'click')
+    clock.advance(1500)
+    wait.idle.reset_mock()
+    policy.pre_exec(wait, 'click')
+    assert wait.idle.called
+
+
+def test_adaptive_invalidate(clock):
+    wait = fake_wait(clock)
+    policy = AdaptiveWaitPolicy(clock=clock)
+    policy.post_exec(wait, 'click')
+    policy.invalidate()
+    wait.idle.reset_mock()
+    policy.pre_exec(wait, 'click')
+    assert wait.idle.called
+
+
+def test_adaptive_stats_time_saved(clock):
+    policy = AdaptiveWaitPolicy(
+        update_timeout=1000, margin=2.0, clock=clock)
+    policy.post_exec(fake_wait(clock, update_ms=50), 'press.back')
+    wait = fake_wait(clock, updated=False, idle_ms=500)
+    clock.advance(1500)
+    policy.pre_exec(wait, 'press.back')
+    policy.post_exec(wait, 'press.back')
+    policy.pre_exec(wait, 'press.back')
+    policy.post_exec(wait, 'press.back')
+    stats = policy.stats.as_dict()
+    assert stats['actions'] == 2
+    assert stats['pre_idle_skipped'] == 1
+    assert stats['post_idle_skipped'] == 2
+    # 3 skipped idle waits of 500ms, 2 update timeouts 900ms shorter
+    assert stats['estimated_saved_ms'] == pytest.approx(3 * 500 + 2 * 900)
+
+
+def test_adaptive_timeouts_do_not_shrink_settle_time(clock):
+    policy = AdaptiveWaitPolicy(
+        update_timeout=1000, margin=2.0, clock=clock)
+    policy.post_exec(fake_wait(clock, update_ms=200), 'click')
+    for _ in range(5):
+        policy.post_exec(fake_wait(clock, updated=False), 'click')
+    assert policy.update_timeout_for('click') == 400
+
+    wait = Mock()
+
+    def update(timeout):
+        # A slow transition which is reported only if waited long enough
+        clock.advance(min(timeout, 350))
+        return timeout >= 350
+    wait.update.side_effect = update
+    policy.post_exec(wait, 'click')
+    assert wait.idle.called